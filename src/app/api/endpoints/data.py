@@ -1,14 +1,23 @@
+import math
 import time
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.schemas import DataResponse, Metadata
-from app.services.api_service import ApiService
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from app.config.config import settings
+from app.models.schemas import DataBatchResponse, DataResponse, Metadata
+from app.services.api_service import ITEM_OK, ApiService
+from app.services.http_client import ExternalServiceError
+from app.utils.http_cache import etag_matches, make_etag, not_modified
+from app.utils.json_response import dumps
 from app.utils.logger import setup_logger
 from app.utils.newrelic_monitor import NewRelicMonitor
-from app.dependencies.dependencies import get_common_parameters
+from app.dependencies.dependencies import verify_token
 
 logger = setup_logger(__name__)
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
 @router.get(
     "/data",
     response_model=DataResponse,
@@ -16,7 +25,11 @@ router = APIRouter()
     description="Obtener datos procesados desde una API externa",
     tags=["data"]
 )
-async def get_data(common_params: dict = Depends(get_common_parameters)):
+async def get_data(
+    request: Request,
+    response: Response,
+    token_claims: dict = Depends(verify_token)
+):
     """Get processed data from external API"""
     try:
         # Configurar transacción y atributos
@@ -27,8 +40,8 @@ async def get_data(common_params: dict = Depends(get_common_parameters)):
         # Record custom metric
         NewRelicMonitor.record_custom_metric('Custom/DataRequest', 1)
 
-        # Get external data
-        external_data = await ApiService.get_external_data()
+        # Get external data (copia de respaldo si la API externa no responde)
+        external_data, stale = await ApiService.get_external_data()
 
         # Process data
         processed_data = await ApiService.process_data(external_data)
@@ -37,13 +50,22 @@ async def get_data(common_params: dict = Depends(get_common_parameters)):
         NewRelicMonitor.record_custom_metric('Custom/DataSuccess', 1)
         NewRelicMonitor.add_custom_attribute('data_processed', 'true')
         NewRelicMonitor.add_custom_attribute('data_source', 'jsonplaceholder')
+        NewRelicMonitor.add_custom_attribute('data_stale', str(stale).lower())
 
         logger.info("Data processed successfully")
 
+        # ETag débil: metadata.processed_at cambia en cada respuesta, los datos no
+        etag = make_etag(dumps(processed_data), weak=True)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            NewRelicMonitor.record_custom_metric('Custom/DataNotModified', 1)
+            return not_modified(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+
         # CORRECCIÓN: Crear metadata como diccionario en lugar de instancia
         metadata_dict = {
             "processed_at": time.time(),
-            "source": "external_api"
+            "source": "stale_cache" if stale else "external_api"
         }
 
         return DataResponse(
@@ -52,8 +74,22 @@ async def get_data(common_params: dict = Depends(get_common_parameters)):
             metadata=metadata_dict  # ✅ Pasar como diccionario, no como instancia Metadata
         )
 
+    except ExternalServiceError as e:
+        logger.error("External data unavailable: %s", e)
+        NewRelicMonitor.notice_error(e, {
+            'endpoint': 'get_data',
+            'operation': 'external_api_call',
+            'error_type': 'upstream_unavailable'
+        })
+        NewRelicMonitor.record_custom_metric('Custom/DataError', 1)
+        NewRelicMonitor.add_custom_attribute('data_processed', 'false')
+
+        # Con el circuito abierto se indica cuándo volverá a intentarse
+        headers = {"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        raise HTTPException(status_code=503, detail="External service unavailable", headers=headers)
+
     except Exception as e:
-        logger.error(f"Error in get_data: {e}")
+        logger.error("Error in get_data: %s", e)
 
         # Registrar error en NewRelic
         NewRelicMonitor.notice_error(e, {
@@ -65,3 +101,105 @@ async def get_data(common_params: dict = Depends(get_common_parameters)):
         NewRelicMonitor.add_custom_attribute('data_processed', 'false')
 
         raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def _parse_ids(values: List[str]) -> List[int]:
+    """Ids from repeated and/or comma-separated values, without duplicates"""
+    ids = {}
+    for value in values:
+        for part in filter(None, (part.strip() for part in value.split(","))):
+            try:
+                ids[int(part)] = None
+            except ValueError:
+                raise HTTPException(status_code=422, detail=f"Invalid id: {part!r}")
+    if not ids:
+        raise HTTPException(status_code=422, detail="At least one id is required")
+    if len(ids) > settings.data_batch_max_items:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {settings.data_batch_max_items} ids per request"
+        )
+    return list(ids)
+
+
+async def _stream_batch_ndjson(ids: List[int], concurrency: int, deadline: float):
+    # Una línea por elemento según van llegando y una línea final de resumen
+    start = time.perf_counter()
+    succeeded = 0
+    async for item in ApiService.iter_external_batch(ids, concurrency, deadline):
+        succeeded += item["status"] == ITEM_OK
+        yield dumps(item) + b"\n"
+    yield dumps({
+        "done": True,
+        "succeeded": succeeded,
+        "failed": len(ids) - succeeded,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 3)
+    }) + b"\n"
+
+
+@router.get(
+    "/data/batch",
+    response_model=DataBatchResponse,
+    summary="Get Processed Data Batch",
+    description=(
+        "Obtener y procesar varios recursos de la API externa en paralelo "
+        "(ids=1,2,3 o ids repetido), con concurrencia acotada y deadline por petición. "
+        "Los elementos que fallan o no llegan a tiempo se devuelven con su error; "
+        "con format=ndjson (o Accept: application/x-ndjson) se transmiten según llegan, "
+        "seguidos de una línea de resumen"
+    ),
+    tags=["data"]
+)
+async def get_data_batch(
+    request: Request,
+    ids: List[str] = Query(..., description="Ids de los recursos"),
+    concurrency: int = Query(settings.data_batch_concurrency, ge=1, le=settings.data_batch_max_concurrency),
+    deadline: float = Query(settings.data_batch_deadline, gt=0, le=settings.data_batch_max_deadline),
+    response_format: Optional[str] = Query(None, alias="format", pattern="^(json|ndjson)$"),
+    token_claims: dict = Depends(verify_token)
+):
+    """Fan out to the external API and return partial results with per-item errors"""
+    item_ids = _parse_ids(ids)
+    try:
+        NewRelicMonitor.set_transaction_name("DataBatch")
+        NewRelicMonitor.add_custom_attribute('endpoint', 'get_data_batch')
+        NewRelicMonitor.record_custom_metric('Custom/DataBatchRequest', 1)
+
+        wants_ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+        if response_format == "ndjson" or (response_format is None and wants_ndjson):
+            NewRelicMonitor.add_custom_attribute('batch_mode', 'ndjson_stream')
+            return StreamingResponse(
+                _stream_batch_ndjson(item_ids, concurrency, deadline),
+                media_type=NDJSON_MEDIA_TYPE,
+                headers={"Cache-Control": "no-cache"}
+            )
+
+        start = time.perf_counter()
+        items = {}
+        async for item in ApiService.iter_external_batch(item_ids, concurrency, deadline):
+            items[item["id"]] = item
+        # En JSON se respeta el orden de la petición
+        results = [items[item_id] for item_id in item_ids]
+        succeeded = sum(item["status"] == ITEM_OK for item in results)
+
+        return DataBatchResponse(
+            success=succeeded == len(results),
+            succeeded=succeeded,
+            failed=len(results) - succeeded,
+            results=results,
+            metadata={
+                "processed_at": time.time(),
+                "elapsed_ms": round((time.perf_counter() - start) * 1000, 3),
+                "concurrency": concurrency
+            }
+        )
+
+    except Exception as e:
+        logger.error("Error in get_data_batch: %s", e)
+        NewRelicMonitor.notice_error(e, {
+            'endpoint': 'get_data_batch',
+            'operation': 'external_api_batch',
+            'error_type': 'data_processing_error'
+        })
+        NewRelicMonitor.record_custom_metric('Custom/DataError', 1)
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -1,11 +1,13 @@
 import time
-from fastapi import APIRouter, Depends
-from app.models.schemas import HealthResponse
-from app.utils.newrelic_monitor import NewRelicMonitor
-from app.dependencies.dependencies import get_common_parameters
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.models.schemas import HealthResponse, LivenessResponse, ReadinessResponse
+from app.services.health_monitor import health_monitor
 
 router = APIRouter()
 
+# Las sondas no dependen de la sesión de BD ni del token: responden desde memoria
+
 @router.get(
     "/health",
     response_model=HealthResponse,
@@ -13,15 +15,36 @@ router = APIRouter()
     description="Endpoint para verificar el estado del servicio",
     tags=["health"]
 )
-async def health_check(common_params: dict = Depends(get_common_parameters)):
+async def health_check():
     """Health check endpoint"""
-    # Record health check metric
-    NewRelicMonitor.record_custom_metric('Custom/HealthCheck', 1)
-    NewRelicMonitor.add_custom_attribute('endpoint', 'health_check')
-    NewRelicMonitor.add_custom_attribute('health_status', 'healthy')
-
     return HealthResponse(
         status="healthy",
         timestamp=time.time(),
         service="fastapi-newrelic-demo"
     )
+
+@router.get(
+    "/health/live",
+    response_model=LivenessResponse,
+    summary="Liveness Probe",
+    description="El proceso está vivo y atendiendo peticiones",
+    tags=["health"]
+)
+async def liveness():
+    """Liveness probe"""
+    return LivenessResponse(status="alive")
+
+@router.get(
+    "/health/ready",
+    response_model=ReadinessResponse,
+    summary="Readiness Probe",
+    description="Estado de la BD y del servicio externo desde la última comprobación en segundo plano",
+    tags=["health"],
+    responses={503: {"model": ReadinessResponse}}
+)
+async def readiness():
+    """Readiness probe served from the cached snapshot"""
+    snapshot = health_monitor.readiness()
+    if snapshot["status"] != "ready":
+        return JSONResponse(status_code=503, content=snapshot)
+    return snapshot
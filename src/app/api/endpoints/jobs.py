@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from app.config.config import settings
+from app.models.schemas import JobResponse
+from app.services.job_service import FINISHED, Job, get_job_manager
+from app.utils.json_response import dumps
+from app.utils.newrelic_monitor import NewRelicMonitor
+from app.dependencies.dependencies import verify_token
+
+router = APIRouter()
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def _get_job(job_id: str, token_claims: dict) -> Job:
+    # Sólo el sujeto que creó el job puede consultarlo
+    job = get_job_manager().get(job_id, owner=token_claims.get("sub"))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: ".encode() + dumps(data) + b"\n\n"
+
+
+async def _job_events(job: Job, heartbeat: float):
+    manager = get_job_manager()
+    yield _sse("status", job.to_dict())
+    while not await manager.wait(job, heartbeat):
+        # Comentario SSE: mantiene viva la conexión frente a timeouts de inactividad
+        yield b": keepalive\n\n"
+    yield _sse("complete", job.to_dict())
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=JobResponse,
+    summary="Get Job",
+    description="Estado y resultado de un job; con wait=N espera hasta N segundos a que termine (long-poll)",
+    tags=["jobs"]
+)
+async def get_job(
+    job_id: str,
+    response: Response,
+    wait: float = Query(0, ge=0, le=settings.jobs_max_wait),
+    token_claims: dict = Depends(verify_token)
+):
+    """Poll (or long-poll) a job"""
+    NewRelicMonitor.set_transaction_name("JobStatus")
+    job = _get_job(job_id, token_claims)
+    if wait and job.status not in FINISHED:
+        await get_job_manager().wait(job, wait)
+    if job.status not in FINISHED:
+        response.headers["Retry-After"] = "1"
+    return JobResponse(**job.to_dict())
+
+
+@router.get(
+    "/jobs/{job_id}/events",
+    summary="Job Events",
+    description="Stream SSE: un evento 'status' al conectar y 'complete' al terminar el job",
+    tags=["jobs"],
+    response_class=StreamingResponse
+)
+async def job_events(job_id: str, token_claims: dict = Depends(verify_token)):
+    """Server-sent events until the job finishes"""
+    NewRelicMonitor.set_transaction_name("JobEvents")
+    job = _get_job(job_id, token_claims)
+    return StreamingResponse(
+        _job_events(job, settings.jobs_sse_heartbeat),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,18 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.services.metrics_exporter import render_metrics
+
+router = APIRouter()
+
+PROMETHEUS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    summary="Prometheus Metrics",
+    description="Histogramas de latencia por ruta y clase de estado, sumados entre workers",
+    tags=["monitoring"]
+)
+async def metrics():
+    """Prometheus text exposition of the latency histograms"""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_MEDIA_TYPE)
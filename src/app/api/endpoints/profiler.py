@@ -0,0 +1,30 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.utils.request_profiler import request_profiler
+from app.dependencies.dependencies import verify_token
+
+router = APIRouter()
+
+@router.get(
+    "/debug/profile",
+    response_class=PlainTextResponse,
+    summary="Request Profile",
+    description=(
+        "Pilas muestreadas de las peticiones lentas en formato collapsed "
+        "(flamegraph.pl, speedscope), con la ruta como frame raíz"
+    ),
+    tags=["monitoring"]
+)
+async def get_profile(
+    route: Optional[str] = Query(None, description="Ruta exacta, p. ej. 'GET /api/v1/data'"),
+    reset: bool = Query(False, description="Vaciar el perfil acumulado tras leerlo"),
+    token_claims: dict = Depends(verify_token)
+):
+    """Collapsed stacks aggregated per route by the request profiler"""
+    if not request_profiler.running:
+        raise HTTPException(status_code=404, detail="Profiler disabled (PROFILER_ENABLED=False)")
+    body = request_profiler.collapsed(route)
+    if reset:
+        request_profiler.reset()
+    return PlainTextResponse(body)
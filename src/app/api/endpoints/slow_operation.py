@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.models.schemas import SlowOperationResponse
+from fastapi import APIRouter, Depends, HTTPException, Response
+from app.config.config import settings
+from app.models.schemas import JobResponse, SlowOperationResponse
 from app.services.api_service import ApiService
+from app.services.executor import ExecutorSaturatedError
+from app.services.job_service import JobRejectedError, get_job_manager
 from app.utils.logger import setup_logger
 from app.utils.newrelic_monitor import NewRelicMonitor
-from app.dependencies.dependencies import get_common_parameters
+from app.dependencies.dependencies import verify_token
 
 logger = setup_logger(__name__)
 router = APIRouter()
@@ -15,7 +18,7 @@ router = APIRouter()
     description="Simular una operación lenta para monitoreo",
     tags=["monitoring"]
 )
-async def slow_operation(common_params: dict = Depends(get_common_parameters)):
+async def slow_operation(token_claims: dict = Depends(verify_token)):
     """Simulate a slow operation for monitoring"""
     try:
         NewRelicMonitor.set_transaction_name("SlowOperation")
@@ -29,7 +32,7 @@ async def slow_operation(common_params: dict = Depends(get_common_parameters)):
         NewRelicMonitor.record_custom_metric('Custom/SlowOperationCount', 1)
         NewRelicMonitor.add_custom_attribute('processing_time_seconds', str(round(processing_time, 3)))
 
-        logger.info(f"Slow operation completed in {processing_time:.3f}s")
+        logger.info("Slow operation completed in %.3fs", processing_time)
 
         return SlowOperationResponse(
             success=True,
@@ -37,8 +40,20 @@ async def slow_operation(common_params: dict = Depends(get_common_parameters)):
             processing_time=processing_time
         )
 
+    except ExecutorSaturatedError as e:
+        logger.warning("Slow operation rejected: %s", e)
+
+        NewRelicMonitor.record_custom_metric('Custom/SlowOperationRejected', 1)
+        NewRelicMonitor.add_custom_attribute('operation_status', 'rejected_saturated')
+
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
     except Exception as e:
-        logger.error(f"Error in slow operation: {e}")
+        logger.error("Error in slow operation: %s", e)
 
         NewRelicMonitor.notice_error(e, {
             'endpoint': 'slow_operation',
@@ -47,3 +62,42 @@ async def slow_operation(common_params: dict = Depends(get_common_parameters)):
         })
 
         raise HTTPException(status_code=500, detail="Internal server error")
+
+async def _slow_operation_job() -> dict:
+    processing_time = await ApiService.simulate_slow_operation()
+    NewRelicMonitor.record_custom_metric('Custom/SlowOperationTime', processing_time)
+    NewRelicMonitor.record_custom_metric('Custom/SlowOperationCount', 1)
+    return {"processing_time": processing_time}
+
+@router.post(
+    "/slow-operation/jobs",
+    response_model=JobResponse,
+    summary="Submit Slow Operation Job",
+    description=(
+        "Encolar la operación lenta y responder 202 al momento; "
+        "el resultado se consulta en /jobs/{job_id} (polling, long-poll o SSE)"
+    ),
+    tags=["monitoring"],
+    status_code=202
+)
+async def submit_slow_operation_job(
+    response: Response,
+    token_claims: dict = Depends(verify_token)
+):
+    """Run the slow operation as a background job"""
+    NewRelicMonitor.set_transaction_name("SlowOperationJobSubmit")
+    NewRelicMonitor.add_custom_attribute('endpoint', 'submit_slow_operation_job')
+    try:
+        job = get_job_manager().submit("slow_operation", _slow_operation_job, owner=token_claims.get("sub"))
+    except JobRejectedError as e:
+        logger.warning("Slow operation job rejected: %s", e)
+        NewRelicMonitor.add_custom_attribute('operation_status', 'rejected_saturated')
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    NewRelicMonitor.add_custom_attribute('job_id', job.id)
+    response.headers["Location"] = f"{settings.api_v1_prefix}/jobs/{job.id}"
+    return JobResponse(**job.to_dict())
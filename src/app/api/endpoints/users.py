@@ -1,7 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.models.database import User, get_db
-from app.models.schemas import UserCreate, UserResponse, UserOperationResponse
+import json
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+from app.config.config import settings
+from app.models.database import User
+from app.models.schemas import (
+    BulkUserCreateResponse,
+    BulkUserResult,
+    UserCreate,
+    UserResponse,
+    UserOperationResponse,
+)
+from app.services.user_cache import user_cache
+from app.services.user_service import UserService
+from app.services.write_queue import run_write
+from app.utils.http_cache import etag_matches, make_etag, not_modified
+from app.utils.json_response import FastJSONResponse
 from app.utils.logger import setup_logger
 from app.utils.newrelic_monitor import NewRelicMonitor
 from app.dependencies.dependencies import get_common_parameters
@@ -9,6 +26,9 @@ from app.dependencies.dependencies import get_common_parameters
 logger = setup_logger(__name__)
 router = APIRouter()
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+_INVALID_JSON = object()
+
 @router.post(
     "/users",
     response_model=UserOperationResponse,
@@ -29,48 +49,53 @@ async def create_user(
 
         db = common_params["db"]
 
-        # Check if user already exists
-        existing_user = db.query(User).filter(
-            (User.username == user.username) | (User.email == user.email)
-        ).first()
-
-        if existing_user:
-            error_msg = "Username or email already exists"
-            logger.warning(f"User creation failed: {error_msg}")
+        # Check if user already exists (el filtro Bloom evita la consulta para altas nuevas)
+        if user_cache.may_exist(user.username, user.email):
+            NewRelicMonitor.record_custom_metric('Custom/Users/DuplicateCheck/Queried', 1)
+            result = await db.execute(
+                select(User.id).where(
+                    or_(User.username == user.username, User.email == user.email)
+                ).limit(1)
+            )
+            if result.scalar_one_or_none() is not None:
+                _reject_duplicate_user()
+            user_cache.record_false_positive()
+        else:
+            NewRelicMonitor.record_custom_metric('Custom/Users/DuplicateCheck/Skipped', 1)
 
-            NewRelicMonitor.record_custom_metric('Custom/UserCreationFailed', 1)
-            NewRelicMonitor.add_custom_attribute('creation_status', 'failed_duplicate')
+        # Create new user: con SQLite la cola de escritura agrupa las altas concurrentes
+        # en un commit (UNIQUE cubre las altas concurrentes y las de otros workers)
+        try:
+            created_user = await run_write(
+                lambda session: UserService.insert_user(session, user)
+            )
+        except IntegrityError:
+            _reject_duplicate_user()
 
-            raise HTTPException(status_code=400, detail=error_msg)
-
-        # Create new user
-        db_user = User(username=user.username, email=user.email)
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        user_cache.store(created_user)
 
         # Record custom event y métricas
         NewRelicMonitor.record_custom_event('UserCreated', {
             'username': user.username,
             'email': user.email,
-            'user_id': db_user.id
+            'user_id': created_user.id
         })
         NewRelicMonitor.record_custom_metric('Custom/UserCreated', 1)
-        NewRelicMonitor.add_custom_attribute('user_id', str(db_user.id))
+        NewRelicMonitor.add_custom_attribute('user_id', str(created_user.id))
         NewRelicMonitor.add_custom_attribute('creation_status', 'success')
 
-        logger.info(f"User created successfully: {user.username} (ID: {db_user.id})")
+        logger.info("User created successfully: %s (ID: %s)", user.username, created_user.id)
 
         return UserOperationResponse(
             success=True,
-            user=db_user,
+            user=created_user,
             message="User created successfully"
         )
 
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error creating user: {e}")
+        logger.error("Error creating user: %s", e)
 
         # Registrar error en NewRelic
         NewRelicMonitor.notice_error(e, {
@@ -84,32 +109,77 @@ async def create_user(
 
         raise HTTPException(status_code=500, detail="Failed to create user")
 
+def _reject_duplicate_user():
+    error_msg = "Username or email already exists"
+    logger.warning("User creation failed: %s", error_msg)
+
+    NewRelicMonitor.record_custom_metric('Custom/UserCreationFailed', 1)
+    NewRelicMonitor.add_custom_attribute('creation_status', 'failed_duplicate')
+
+    raise HTTPException(status_code=400, detail=error_msg)
+
 @router.get(
     "/users",
     response_model=list[UserResponse],
     summary="Get Users",
-    description="Obtener lista de todos los usuarios",
+    description=(
+        "Obtener usuarios paginados por cursor (keyset sobre id). "
+        "Con format=ndjson (o Accept: application/x-ndjson) se transmiten en streaming"
+    ),
     tags=["users"]
 )
-async def get_users(common_params: dict = Depends(get_common_parameters)):
-    """Get all users"""
+async def get_users(
+    request: Request,
+    cursor: Optional[int] = Query(None, ge=0, description="Último id recibido (X-Next-Cursor)"),
+    limit: int = Query(settings.users_page_default_limit, ge=1, le=settings.users_page_max_limit),
+    response_format: Optional[str] = Query(None, alias="format", pattern="^(json|ndjson)$"),
+    common_params: dict = Depends(get_common_parameters)
+):
+    """Get a page of users (or stream all of them as NDJSON)"""
     try:
         NewRelicMonitor.add_custom_attribute('endpoint', 'get_users')
 
         db = common_params["db"]
-        users = db.query(User).all()
 
-        # Record metric
-        user_count = len(users)
+        # Validador a partir de la versión de la tabla: un 304 evita leer la página
+        wants_ndjson = NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+        stream = response_format == "ndjson" or (response_format is None and wants_ndjson)
+        max_id, max_created_at = await UserService.get_users_version(db)
+        etag = make_etag(
+            f"users:{cursor}:{limit}:{stream}:{max_id}:{max_created_at}".encode()
+        )
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            NewRelicMonitor.record_custom_metric('Custom/UsersNotModified', 1)
+            return not_modified(etag)
+
+        user_count = await UserService.estimate_user_count(db)
         NewRelicMonitor.record_custom_metric('Custom/UsersListed', user_count)
         NewRelicMonitor.add_custom_attribute('user_count', str(user_count))
 
-        logger.info(f"Retrieved {user_count} users from database")
+        if stream:
+            NewRelicMonitor.add_custom_attribute('list_mode', 'ndjson_stream')
+            return StreamingResponse(
+                UserService.stream_users_ndjson(cursor=cursor),
+                media_type=NDJSON_MEDIA_TYPE,
+                headers={"X-Total-Count-Estimate": str(user_count), "ETag": etag, "Cache-Control": "no-cache"}
+            )
+
+        users, next_cursor = await UserService.list_users(db, cursor=cursor, limit=limit)
+
+        NewRelicMonitor.record_custom_metric('Custom/UsersPageSize', len(users))
+        headers = {"X-Total-Count-Estimate": str(user_count), "ETag": etag, "Cache-Control": "no-cache"}
+        if next_cursor is not None:
+            headers["X-Next-Cursor"] = str(next_cursor)
+            next_url = request.url.include_query_params(cursor=next_cursor, limit=limit)
+            headers["Link"] = f'<{next_url}>; rel="next"'
+
+        logger.info("Retrieved %d users from database", len(users))
 
-        return users
+        # Las filas ya cumplen UserResponse: se serializan sin revalidarlas
+        return FastJSONResponse([UserService.to_response_row(user) for user in users], headers=headers)
 
     except Exception as e:
-        logger.error(f"Error getting users: {e}")
+        logger.error("Error getting users: %s", e)
 
         NewRelicMonitor.notice_error(e, {
             'endpoint': 'get_users',
@@ -118,3 +188,208 @@ async def get_users(common_params: dict = Depends(get_common_parameters)):
         })
 
         raise HTTPException(status_code=500, detail="Failed to get users")
+
+async def _get_cached_user(field: str, value, common_params: dict) -> UserResponse:
+    NewRelicMonitor.add_custom_attribute('endpoint', f'get_user_by_{field}')
+    try:
+        user = await user_cache.get(common_params["db"], field, value)
+    except Exception as e:
+        logger.error("Error getting user by %s: %s", field, e)
+
+        NewRelicMonitor.notice_error(e, {
+            'endpoint': f'get_user_by_{field}',
+            'operation': 'get_user',
+            'error_type': 'database_query_error'
+        })
+
+        raise HTTPException(status_code=500, detail="Failed to get user")
+
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    # Modelo ya validado al cachearlo
+    return FastJSONResponse(user)
+
+@router.get(
+    "/users/by-username/{username}",
+    response_model=UserResponse,
+    summary="Get User by Username",
+    description="Obtener un usuario por su username (servido desde caché en proceso)",
+    tags=["users"]
+)
+async def get_user_by_username(
+    username: str,
+    common_params: dict = Depends(get_common_parameters)
+):
+    """Get a single user by username"""
+    return await _get_cached_user("username", username, common_params)
+
+@router.get(
+    "/users/by-email/{email}",
+    response_model=UserResponse,
+    summary="Get User by Email",
+    description="Obtener un usuario por su email (servido desde caché en proceso)",
+    tags=["users"]
+)
+async def get_user_by_email(
+    email: str,
+    common_params: dict = Depends(get_common_parameters)
+):
+    """Get a single user by email"""
+    return await _get_cached_user("email", email, common_params)
+
+@router.get(
+    "/users/{user_id}",
+    response_model=UserResponse,
+    summary="Get User",
+    description="Obtener un usuario por id (servido desde caché en proceso)",
+    tags=["users"]
+)
+async def get_user(
+    user_id: int = Path(..., ge=1),
+    common_params: dict = Depends(get_common_parameters)
+):
+    """Get a single user by id"""
+    return await _get_cached_user("id", user_id, common_params)
+
+async def _read_bulk_payload(request: Request) -> list:
+    """Parse a JSON array or an NDJSON stream of user objects"""
+    max_items = settings.users_bulk_max_items
+    max_bytes = settings.users_bulk_max_bytes
+
+    # Rechazo antes de leer: el cuerpo JSON se parsea entero de una vez
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Body too large (max {max_bytes} bytes)")
+
+    received = 0
+    if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+        items = []
+        buffer = b""
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Body too large (max {max_bytes} bytes)")
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    items.append(_parse_ndjson_line(line))
+            if len(items) > max_items:
+                raise HTTPException(status_code=413, detail=f"Too many items (max {max_items})")
+        if buffer.strip():
+            items.append(_parse_ndjson_line(buffer))
+    else:
+        # Sin Content-Length (chunked) el presupuesto se comprueba mientras llega
+        chunks = []
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_bytes:
+                raise HTTPException(status_code=413, detail=f"Body too large (max {max_bytes} bytes)")
+            chunks.append(chunk)
+        try:
+            items = json.loads(b"".join(chunks))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=400, detail="Body must be a JSON array")
+
+    if len(items) > max_items:
+        raise HTTPException(status_code=413, detail=f"Too many items (max {max_items})")
+    return items
+
+def _parse_ndjson_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return _INVALID_JSON
+
+@router.post(
+    "/users/bulk",
+    response_model=BulkUserCreateResponse,
+    summary="Bulk Create Users",
+    description=(
+        "Crear usuarios en lote (array JSON o stream NDJSON) en una sola transacción, "
+        "con resultado por elemento"
+    ),
+    tags=["users"],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/UserCreate"}}
+                },
+                NDJSON_MEDIA_TYPE: {
+                    "schema": {"$ref": "#/components/schemas/UserCreate"}
+                },
+            },
+        }
+    }
+)
+async def bulk_create_users(
+    request: Request,
+    common_params: dict = Depends(get_common_parameters)
+):
+    """Create many users with batched queries"""
+    try:
+        NewRelicMonitor.set_transaction_name("UserBulkCreation")
+        NewRelicMonitor.add_custom_attribute('endpoint', 'bulk_create_users')
+
+        payload = await _read_bulk_payload(request)
+
+        results = []
+        valid_items = []
+        for index, item in enumerate(payload):
+            if item is _INVALID_JSON:
+                results.append(BulkUserResult(index=index, status="invalid", error="Invalid JSON"))
+                continue
+            try:
+                valid_items.append((index, UserCreate.model_validate(item)))
+            except ValidationError as e:
+                results.append(BulkUserResult(
+                    index=index, status="invalid", error=e.errors(include_url=False)[0]["msg"]
+                ))
+
+        if valid_items:
+            results.extend(await UserService.bulk_create_users(valid_items))
+        results.sort(key=lambda result: result.index)
+
+        created = [result.user for result in results if result.status == "created"]
+        failed = len(results) - len(created)
+        for created_user in created:
+            user_cache.store(created_user)
+
+        # Un único evento agregado en lugar de uno por usuario
+        if created:
+            NewRelicMonitor.record_custom_event('UserCreated', {
+                'batch': True,
+                'count': len(created),
+                'first_user_id': created[0].id,
+                'last_user_id': created[-1].id
+            })
+        NewRelicMonitor.record_custom_metric('Custom/UserCreated', len(created))
+        NewRelicMonitor.record_custom_metric('Custom/UserCreationFailed', failed)
+        NewRelicMonitor.add_custom_attribute('batch_size', str(len(results)))
+
+        logger.info("Bulk user creation: %d created, %d failed", len(created), failed)
+
+        return BulkUserCreateResponse(
+            success=failed == 0,
+            created=len(created),
+            failed=failed,
+            results=results
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error in bulk user creation: %s", e)
+
+        NewRelicMonitor.notice_error(e, {
+            'endpoint': 'bulk_create_users',
+            'operation': 'bulk_user_creation',
+            'error_type': 'database_error'
+        })
+        NewRelicMonitor.record_custom_metric('Custom/UserCreationError', 1)
+
+        raise HTTPException(status_code=500, detail="Failed to create users")
@@ -2,6 +2,9 @@ import os
 from pydantic_settings import BaseSettings
 from typing import Optional
 
+# Los valores por defecto de rutas (prioridades, exclusiones de métricas) derivan del prefijo
+API_V1_PREFIX = os.getenv("API_V1_PREFIX", "/api/v1")
+
 class Settings(BaseSettings):
     """Application settings"""
     # FastAPI Configuration
@@ -10,16 +13,171 @@ class Settings(BaseSettings):
     fastapi_host: str = os.getenv("FASTAPI_HOST", "0.0.0.0")
     fastapi_port: int = int(os.getenv("FASTAPI_PORT", "8000"))
 
+    # Production server Configuration (server.py)
+    web_concurrency: int = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+    server_timeout: int = int(os.getenv("SERVER_TIMEOUT", "60"))
+    server_graceful_timeout: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30"))
+    server_keepalive: int = int(os.getenv("SERVER_KEEPALIVE", "5"))
+    server_backlog: int = int(os.getenv("SERVER_BACKLOG", "2048"))
+    server_max_requests: int = int(os.getenv("SERVER_MAX_REQUESTS", "0"))
+    server_max_requests_jitter: int = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "0"))
+
     # NewRelic Configuration
+    newrelic_enabled: bool = os.getenv("NEWRELIC_ENABLED", "True").lower() == "true"
     new_relic_license_key: Optional[str] = os.getenv("NEW_RELIC_LICENSE_KEY")
     new_relic_app_name: str = os.getenv("NEW_RELIC_APP_NAME", "FastAPI Demo App")
+    telemetry_flush_interval: float = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "10"))
 
     # Database Configuration
     database_url: str = os.getenv("DATABASE_URL", "sqlite:///./app.db")
+    db_pool_size: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    db_max_overflow: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    db_pool_timeout: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    db_pool_recycle: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    db_pool_pre_ping: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    # Perfil SQLite (PRAGMAs por conexión) y cola de escritura con commit agrupado
+    db_sqlite_journal_mode: str = os.getenv("DB_SQLITE_JOURNAL_MODE", "WAL")
+    db_sqlite_synchronous: str = os.getenv("DB_SQLITE_SYNCHRONOUS", "NORMAL")
+    db_sqlite_cache_size: int = int(os.getenv("DB_SQLITE_CACHE_SIZE", "-65536"))  # KiB si es negativo
+    db_sqlite_mmap_size: int = int(os.getenv("DB_SQLITE_MMAP_SIZE", "268435456"))
+    db_sqlite_busy_timeout: int = int(os.getenv("DB_SQLITE_BUSY_TIMEOUT", "5000"))  # ms
+    db_write_queue_size: int = int(os.getenv("DB_WRITE_QUEUE_SIZE", "1000"))
+    db_write_batch_max: int = int(os.getenv("DB_WRITE_BATCH_MAX", "256"))
+    db_write_batch_window: float = float(os.getenv("DB_WRITE_BATCH_WINDOW", "0"))
+
+    # Logging Configuration (muestreo: "logger=fracción,..."; límite: mensajes/s por plantilla)
+    log_level: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    log_format: str = os.getenv("LOG_FORMAT", "json")
+    log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+    log_sample_rates: str = os.getenv("LOG_SAMPLE_RATES", "")
+    log_rate_limit: float = float(os.getenv("LOG_RATE_LIMIT", "50"))
+    log_rate_burst: int = int(os.getenv("LOG_RATE_BURST", "100"))
+
+    # Users listing Configuration
+    users_page_default_limit: int = int(os.getenv("USERS_PAGE_DEFAULT_LIMIT", "100"))
+    users_page_max_limit: int = int(os.getenv("USERS_PAGE_MAX_LIMIT", "1000"))
+    users_stream_batch_size: int = int(os.getenv("USERS_STREAM_BATCH_SIZE", "500"))
+    users_bulk_max_items: int = int(os.getenv("USERS_BULK_MAX_ITEMS", "10000"))
+    users_bulk_max_bytes: int = int(os.getenv("USERS_BULK_MAX_BYTES", str(5 * 1024 * 1024)))
+
+    # Users cache Configuration (lookups por id/username/email y filtro Bloom de duplicados)
+    user_cache_ttl: float = float(os.getenv("USER_CACHE_TTL", "300"))
+    user_cache_negative_ttl: float = float(os.getenv("USER_CACHE_NEGATIVE_TTL", "5"))
+    user_cache_maxsize: int = int(os.getenv("USER_CACHE_MAXSIZE", "10000"))
+    user_bloom_capacity: int = int(os.getenv("USER_BLOOM_CAPACITY", "1000000"))
+    user_bloom_error_rate: float = float(os.getenv("USER_BLOOM_ERROR_RATE", "0.01"))
+
+    # External API / HTTP client Configuration
+    external_api_base_url: str = os.getenv("EXTERNAL_API_BASE_URL", "https://jsonplaceholder.typicode.com")
+    http_timeout: float = float(os.getenv("HTTP_TIMEOUT", "5"))
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+    http_max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    http_keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+    http_cache_ttl: float = float(os.getenv("HTTP_CACHE_TTL", "30"))
+    http_cache_maxsize: int = int(os.getenv("HTTP_CACHE_MAXSIZE", "1024"))
+    # Resiliencia: presupuesto total por llamada, reintentos con jitter, hedging y circuito
+    http_deadline: float = float(os.getenv("HTTP_DEADLINE", "2.0"))
+    http_attempt_timeout: float = float(os.getenv("HTTP_ATTEMPT_TIMEOUT", "1.0"))
+    http_retry_attempts: int = int(os.getenv("HTTP_RETRY_ATTEMPTS", "3"))
+    http_retry_base_delay: float = float(os.getenv("HTTP_RETRY_BASE_DELAY", "0.05"))
+    http_retry_max_delay: float = float(os.getenv("HTTP_RETRY_MAX_DELAY", "0.5"))
+    http_hedge_delay: float = float(os.getenv("HTTP_HEDGE_DELAY", "0"))  # 0 = sin hedging
+    http_breaker_failure_threshold: int = int(os.getenv("HTTP_BREAKER_FAILURE_THRESHOLD", "5"))
+    http_breaker_recovery_time: float = float(os.getenv("HTTP_BREAKER_RECOVERY_TIME", "30"))
+    http_breaker_half_open_calls: int = int(os.getenv("HTTP_BREAKER_HALF_OPEN_CALLS", "1"))
+    http_stale_ttl: float = float(os.getenv("HTTP_STALE_TTL", "3600"))
+    # Lote de datos: fan-out a la API externa con concurrencia acotada y deadline por petición
+    data_batch_path: str = os.getenv("DATA_BATCH_PATH", "/posts/{id}")
+    data_batch_max_items: int = int(os.getenv("DATA_BATCH_MAX_ITEMS", "100"))
+    data_batch_concurrency: int = int(os.getenv("DATA_BATCH_CONCURRENCY", "10"))
+    data_batch_max_concurrency: int = int(os.getenv("DATA_BATCH_MAX_CONCURRENCY", "50"))
+    data_batch_deadline: float = float(os.getenv("DATA_BATCH_DEADLINE", "3.0"))
+    data_batch_max_deadline: float = float(os.getenv("DATA_BATCH_MAX_DEADLINE", "10.0"))
+
+    # Executor Configuration
+    executor_thread_workers: int = int(os.getenv("EXECUTOR_THREAD_WORKERS", "32"))
+    executor_process_workers: int = int(os.getenv("EXECUTOR_PROCESS_WORKERS", str(os.cpu_count() or 1)))
+    executor_max_queue: int = int(os.getenv("EXECUTOR_MAX_QUEUE", "64"))
+    executor_retry_after: int = int(os.getenv("EXECUTOR_RETRY_AFTER", "2"))
+    executor_routes: str = os.getenv("EXECUTOR_ROUTES", "slow_operation=thread")
+    slow_operation_duration: float = float(os.getenv("SLOW_OPERATION_DURATION", "2"))
+
+    # Lag del event loop y limitador de concurrencia adaptativo (AIMD) con prioridades
+    loop_lag_interval: float = float(os.getenv("LOOP_LAG_INTERVAL", "0.1"))
+    loop_lag_report_interval: float = float(os.getenv("LOOP_LAG_REPORT_INTERVAL", "10"))
+    limiter_enabled: bool = os.getenv("LIMITER_ENABLED", "True").lower() == "true"
+    limiter_initial_limit: int = int(os.getenv("LIMITER_INITIAL_LIMIT", "100"))
+    limiter_min_limit: int = int(os.getenv("LIMITER_MIN_LIMIT", "10"))
+    limiter_max_limit: int = int(os.getenv("LIMITER_MAX_LIMIT", "1000"))
+    limiter_backoff: float = float(os.getenv("LIMITER_BACKOFF", "0.9"))
+    limiter_max_lag_ms: float = float(os.getenv("LIMITER_MAX_LAG_MS", "50"))
+    limiter_latency_tolerance: float = float(os.getenv("LIMITER_LATENCY_TOLERANCE", "2.0"))
+    limiter_decrease_interval: float = float(os.getenv("LIMITER_DECREASE_INTERVAL", "0.5"))
+    limiter_retry_after: int = int(os.getenv("LIMITER_RETRY_AFTER", "1"))
+    limiter_priorities: str = os.getenv(
+        "LIMITER_PRIORITIES",
+        f"{API_V1_PREFIX}/health=exempt,/metrics=exempt,GET {API_V1_PREFIX}/jobs=exempt,"
+        f"POST {API_V1_PREFIX}/users=critical,{API_V1_PREFIX}/slow-operation=low,/debug=low"
+    )
+    limiter_priority_shares: str = os.getenv("LIMITER_PRIORITY_SHARES", "critical=1.0,normal=0.8,low=0.5")
+
+    # Profiler por muestreo de peticiones lentas (opt-in)
+    profiler_enabled: bool = os.getenv("PROFILER_ENABLED", "False").lower() == "true"
+    profiler_hz: float = float(os.getenv("PROFILER_HZ", "100"))
+    profiler_threshold_ms: float = float(os.getenv("PROFILER_THRESHOLD_MS", "500"))
+    profiler_debug_header: str = os.getenv("PROFILER_DEBUG_HEADER", "X-Debug-Profile")
+    profiler_max_active: int = int(os.getenv("PROFILER_MAX_ACTIVE", "64"))
+    profiler_max_stacks: int = int(os.getenv("PROFILER_MAX_STACKS", "2000"))
+    profiler_top_frames: int = int(os.getenv("PROFILER_TOP_FRAMES", "5"))
+
+    # Jobs asíncronos (POST .../jobs -> 202, resultado por polling, long-poll o SSE)
+    jobs_max_jobs: int = int(os.getenv("JOBS_MAX_JOBS", "10000"))
+    jobs_result_ttl: float = float(os.getenv("JOBS_RESULT_TTL", "300"))
+    jobs_concurrency: str = os.getenv("JOBS_CONCURRENCY", "slow_operation=8")
+    jobs_default_concurrency: int = int(os.getenv("JOBS_DEFAULT_CONCURRENCY", "4"))
+    jobs_max_pending: int = int(os.getenv("JOBS_MAX_PENDING", "1000"))
+    jobs_max_wait: float = float(os.getenv("JOBS_MAX_WAIT", "30"))
+    jobs_sse_heartbeat: float = float(os.getenv("JOBS_SSE_HEARTBEAT", "15"))
+    # Estado compartido entre workers (server.py lo crea en /dev/shm si está vacío)
+    jobs_dir: str = os.getenv("JOBS_DIR", "")
+    jobs_poll_interval: float = float(os.getenv("JOBS_POLL_INTERVAL", "0.25"))
+
+    # Compression Configuration (gzip/brotli negociado; los cuerpos grandes se comprimen en un hilo)
+    compression_enabled: bool = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+    compression_minimum_size: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    compression_offload_size: int = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", "65536"))
+    compression_gzip_level: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    compression_brotli_quality: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    # Health checks Configuration
+    health_refresh_interval: float = float(os.getenv("HEALTH_REFRESH_INTERVAL", "5"))
+    health_check_timeout: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", "2"))
+    health_stale_after: float = float(os.getenv("HEALTH_STALE_AFTER", "30"))
+    health_upstream_required: bool = os.getenv("HEALTH_UPSTREAM_REQUIRED", "False").lower() == "true"
+    health_upstream_path: str = os.getenv("HEALTH_UPSTREAM_PATH", "/posts/1")
+    metrics_excluded_paths: str = os.getenv(
+        "METRICS_EXCLUDED_PATHS",
+        f"/health,{API_V1_PREFIX}/health,{API_V1_PREFIX}/health/live,{API_V1_PREFIX}/health/ready,/metrics"
+    )
+
+    # Latency histograms / Prometheus Configuration (METRICS_DIR: snapshots compartidos entre workers)
+    metrics_dir: str = os.getenv("METRICS_DIR", "")
+    metrics_write_interval: float = float(os.getenv("METRICS_WRITE_INTERVAL", "5"))
+    metrics_max_series: int = int(os.getenv("METRICS_MAX_SERIES", "1000"))
+
+    # Auth Configuration (tokens JWT HS256 firmados con SECRET_KEY en la cabecera X-Token)
+    auth_token_ttl: int = int(os.getenv("AUTH_TOKEN_TTL", "3600"))
+    auth_token_leeway: int = int(os.getenv("AUTH_TOKEN_LEEWAY", "30"))
+    auth_cache_maxsize: int = int(os.getenv("AUTH_CACHE_MAXSIZE", "10000"))
+    auth_cache_ttl: float = float(os.getenv("AUTH_CACHE_TTL", "300"))
+    auth_max_failures: int = int(os.getenv("AUTH_MAX_FAILURES", "20"))
+    auth_failure_window: float = float(os.getenv("AUTH_FAILURE_WINDOW", "60"))
+    # Proxies/balanceadores cuyo X-Forwarded-For identifica al cliente (IPs separadas por comas)
+    auth_trusted_proxies: str = os.getenv("AUTH_TRUSTED_PROXIES", "")
 
     # Application Configuration
     secret_key: str = os.getenv("SECRET_KEY", "dev-secret-key")
-    api_v1_prefix: str = os.getenv("API_V1_PREFIX", "/api/v1")
+    api_v1_prefix: str = API_V1_PREFIX
     project_name: str = os.getenv("PROJECT_NAME", "FastAPI NewRelic Demo")
     project_version: str = os.getenv("PROJECT_VERSION", "1.0.0")
 
@@ -2,7 +2,8 @@
 Configuración centralizada para NewRelic
 """
 import os
-import newrelic.agent
+import sys
+from types import MappingProxyType
 from app.config.config import settings
 from app.utils.logger import setup_logger
 
@@ -11,6 +12,14 @@ logger = setup_logger(__name__)
 class NewRelicConfig:
     """Clase para manejar la configuración e inicialización de NewRelic"""
 
+    # Snapshot inmutable del estado (se calcula una vez y en cada recarga explícita)
+    _config_status = None
+    # Estado propio (el de newrelic.config es privado): se marca al inicializar el
+    # agente, en el lifespan o en el post_fork de cada worker de server.py
+    _initialized = False
+    # True si el agente lo inicializó la propia aplicación (no newrelic-admin)
+    _initialized_by_application = False
+
     @staticmethod
     def setup_environment():
         """Configurar variables de entorno para NewRelic"""
@@ -42,29 +51,31 @@ class NewRelicConfig:
             return False
         return True
 
+    @staticmethod
+    def started_by_admin_script():
+        """Proceso lanzado con `newrelic-admin run-program` (su bootstrap inicializa el agente)"""
+        return "NEW_RELIC_ADMIN_COMMAND" in os.environ and "newrelic.agent" in sys.modules
+
     @staticmethod
     def is_newrelic_already_initialized():
-        """Verificar si NewRelic ya fue inicializado por el entrypoint"""
-        # Verificar si estamos corriendo bajo newrelic-admin run-program
-        import sys
-        if 'newrelic' in sys.modules:
-            try:
-                # Intentar acceder a la configuración global
-                config = newrelic.agent.global_settings()
-                return config is not None
-            except:
-                return False
-        return False
+        """Verificar si NewRelic ya fue inicializado (por la app o por newrelic-admin run-program)"""
+        return NewRelicConfig._initialized or NewRelicConfig.started_by_admin_script()
 
     @staticmethod
     def initialize_newrelic():
         """Inicializar NewRelic solo si no está ya inicializado"""
+        if not settings.newrelic_enabled:
+            logger.info("⚠️ NewRelic disabled by NEWRELIC_ENABLED")
+            return False
+
         # Configurar entorno primero
         NewRelicConfig.setup_environment()
 
         # Verificar si NewRelic ya está inicializado por el entrypoint
         if NewRelicConfig.is_newrelic_already_initialized():
-            logger.info("✅ NewRelic already initialized by entrypoint")
+            if not NewRelicConfig._initialized_by_application:
+                logger.info("✅ NewRelic already initialized by entrypoint")
+            NewRelicConfig._initialized = True
             return True
 
         # Verificar license key
@@ -74,10 +85,13 @@ class NewRelicConfig:
 
         try:
             # Inicializar NewRelic solo si no está ya inicializado
+            import newrelic.agent
             newrelic.agent.initialize(
                 config_file='newrelic.ini',
                 environment=settings.fastapi_env
             )
+            NewRelicConfig._initialized = True
+            NewRelicConfig._initialized_by_application = True
 
             logger.info(f"✅ NewRelic initialized successfully for app: {settings.new_relic_app_name}")
             logger.info(f"✅ NewRelic environment: {settings.fastapi_env}")
@@ -90,14 +104,24 @@ class NewRelicConfig:
 
     @staticmethod
     def get_config_status():
-        """Obtener estado de la configuración de NewRelic"""
-        return {
-            'license_configured': NewRelicConfig.is_license_valid(),
+        """Obtener estado de la configuración de NewRelic (snapshot cacheado)"""
+        if NewRelicConfig._config_status is None:
+            return NewRelicConfig.reload_config_status()
+        return NewRelicConfig._config_status
+
+    @staticmethod
+    def reload_config_status():
+        """Recalcular el snapshot del estado de la configuración"""
+        license_valid = NewRelicConfig.is_license_valid()
+        license_key = settings.new_relic_license_key
+        NewRelicConfig._config_status = MappingProxyType({
+            'license_configured': license_valid,
             'app_name': settings.new_relic_app_name,
             'environment': settings.fastapi_env,
-            'initialized_by_entrypoint': NewRelicConfig.is_newrelic_already_initialized(),
-            'license_key_preview': f"{settings.new_relic_license_key[:8]}...{settings.new_relic_license_key[-8:]}" if settings.new_relic_license_key and NewRelicConfig.is_license_valid() else 'Not configured'
-        }
-
-# Inicializar NewRelic al importar el módulo - PERO solo si no está ya inicializado
-NEWRELIC_ENABLED = NewRelicConfig.initialize_newrelic()
+            'initialized_by_entrypoint': (
+                NewRelicConfig.is_newrelic_already_initialized()
+                and not NewRelicConfig._initialized_by_application
+            ),
+            'license_key_preview': f"{license_key[:8]}...{license_key[-8:]}" if license_valid else 'Not configured'
+        })
+        return NewRelicConfig._config_status
@@ -1,19 +1,85 @@
-from fastapi import Header, HTTPException, Depends
-from sqlalchemy.orm import Session
-from app.models.database import get_db
+import math
+import time
+from fastapi import Header, HTTPException, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config.config import settings
+from app.middleware.newrelic_middleware import get_route_template
+from app.models.database import LazySession, current_db_route, get_sessionmaker
+from app.services.auth_service import InvalidTokenError, auth_failure_limiter, token_verifier
+from app.utils.newrelic_monitor import NewRelicMonitor
 
 
-async def verify_token(x_token: str = Header(...)):
-    """Dependency for token verification"""
-    # Use best way to confirm token
-    # if x_token != "fake-super-secret-token":
-    #     raise HTTPException(status_code=400, detail="X-Token header invalid")
-    return x_token
+TRUSTED_PROXIES = frozenset(filter(None, (ip.strip() for ip in settings.auth_trusted_proxies.split(","))))
+
+
+def client_address(request: Request) -> str:
+    """Client IP, taken from X-Forwarded-For when the peer is a trusted proxy"""
+    peer = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for")
+    if peer not in TRUSTED_PROXIES or not forwarded:
+        return peer
+    # De derecha a izquierda: la primera dirección que no es de un proxy de confianza
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if hop not in TRUSTED_PROXIES:
+            return hop
+    return hops[0] if hops else peer
+
+
+async def verify_token(request: Request, x_token: str = Header(...)):
+    """Dependency for token verification (HS256 JWT in X-Token)"""
+    start = time.perf_counter()
+    try:
+        try:
+            claims, outcome = token_verifier.verify(x_token)
+        except InvalidTokenError as e:
+            # El límite sólo se aplica a los fallos: un token válido nunca recibe 429
+            client = client_address(request)
+            retry_after = auth_failure_limiter.retry_after(client)
+            if retry_after is not None:
+                NewRelicMonitor.record_custom_metric('Custom/Auth/RateLimited', 1)
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many authentication failures",
+                    headers={"Retry-After": str(math.ceil(retry_after))}
+                )
+            auth_failure_limiter.record_failure(client)
+            NewRelicMonitor.record_custom_metric('Custom/Auth/Failed', 1)
+            NewRelicMonitor.add_custom_attribute('auth_failure', str(e))
+            raise HTTPException(status_code=401, detail="Invalid or expired token")
+
+        NewRelicMonitor.record_cache_event('AuthTokens', outcome)
+        return claims
+    finally:
+        # Coste de la autenticación por petición, separado del resto del endpoint
+        NewRelicMonitor.record_custom_metric('Custom/Auth/Time', time.perf_counter() - start)
+
+
+def _tag_db_route(request: Request):
+    # Los checkouts del pool se cuentan por plantilla de ruta
+    current_db_route.set(get_route_template(request.scope))
+
+
+async def get_db_session(request: Request):
+    """DB-only dependency: a session for routes that always query"""
+    _tag_db_route(request)
+    async with get_sessionmaker()() as db:
+        yield db
+
+
+async def get_lazy_db_session(request: Request):
+    """DB-only dependency whose session is created on first use"""
+    _tag_db_route(request)
+    db = LazySession(get_sessionmaker())
+    try:
+        yield db
+    finally:
+        await db.close()
 
 
 async def get_common_parameters(
-    db: Session = Depends(get_db),
-    x_token: str = Depends(verify_token)
+    db: AsyncSession = Depends(get_lazy_db_session),
+    token_claims: dict = Depends(verify_token)
 ):
-    """Common dependencies for endpoints"""
-    return {"db": db, "x_token": x_token}
+    """Auth plus a lazy DB session (routes without DB access use verify_token)"""
+    return {"db": db, "token_claims": token_claims}
@@ -0,0 +1,183 @@
+import asyncio
+import time
+import zlib
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config.config import settings
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depende del entorno
+    brotli = None
+
+# Preferencia en caso de empate de q-values
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript")
+# SSE: cada evento debe llegar en cuanto se envía, sin pasar por el compresor
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported encoding of an Accept-Encoding header, or None"""
+    if not accept_encoding:
+        return None
+    qvalues = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qvalues[token] = quality
+
+    wildcard = qvalues.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = qvalues.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Encoder:
+    """Incremental gzip/brotli compressor that also tracks sizes and CPU time"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+            self._process = self._compressor.process
+            self._flush = self._compressor.flush
+            self._finish = self._compressor.finish
+        else:
+            # wbits=31: formato gzip (cabecera + CRC) con mtime=0, salida determinista
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._process = self._compressor.compress
+            self._flush = lambda: self._compressor.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._compressor.flush
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_time = 0.0
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        start = time.thread_time()
+        # Sin flush intermedio el cliente de NDJSON no recibiría nada hasta el final
+        output = self._process(data) + (self._finish() if final else self._flush())
+        self.cpu_time += time.thread_time() - start
+        self.bytes_in += len(data)
+        self.bytes_out += len(output)
+        return output
+
+
+class CompressionMiddleware:
+    """Pure ASGI gzip/brotli compression negotiated from Accept-Encoding.
+
+    Bodies under `minimum_size` are sent as is; chunks of `offload_size`
+    bytes or more are compressed in a worker thread so the event loop keeps
+    serving other requests. Streaming responses are compressed chunk by chunk.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = settings.compression_minimum_size,
+        offload_size: int = settings.compression_offload_size,
+        gzip_level: int = settings.compression_gzip_level,
+        brotli_quality: int = settings.compression_brotli_quality
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        encoder: Optional[_Encoder] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message):
+            nonlocal start_message, encoder, passthrough
+            if message["type"] == "http.response.start":
+                # Se retiene hasta ver el primer fragmento del cuerpo
+                start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if encoder is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not self._is_compressible(start_message["status"], headers) or (
+                    not more_body and len(body) < self.minimum_size
+                ):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                encoder = _Encoder(encoding, self.gzip_level, self.brotli_quality)
+                del headers["content-length"]
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag and not etag.startswith("W/"):
+                    # La representación comprimida no es idéntica byte a byte
+                    headers["ETag"] = f"W/{etag}"
+
+                compressed = await self._compress(encoder, body, final=not more_body)
+                if not more_body:
+                    headers["Content-Length"] = str(len(compressed))
+                await send(start_message)
+            else:
+                compressed = await self._compress(encoder, body, final=not more_body)
+
+            await send({"type": "http.response.body", "body": compressed, "more_body": more_body})
+            if not more_body:
+                self._record_metrics(encoder)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _is_compressible(status: int, headers: MutableHeaders) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(UNCOMPRESSED_TYPES)
+
+    async def _compress(self, encoder: _Encoder, data: bytes, final: bool) -> bytes:
+        if len(data) >= self.offload_size:
+            return await asyncio.to_thread(encoder.compress, data, final)
+        return encoder.compress(data, final)
+
+    @staticmethod
+    def _record_metrics(encoder: _Encoder):
+        if not encoder.bytes_in:
+            return
+        prefix = f'Custom/Compression/{encoder.encoding}'
+        NewRelicMonitor.record_custom_metric(f'{prefix}/Ratio', encoder.bytes_out / encoder.bytes_in)
+        NewRelicMonitor.record_custom_metric(f'{prefix}/CpuTime', encoder.cpu_time)
+        NewRelicMonitor.record_custom_metric(f'{prefix}/BytesSaved', encoder.bytes_in - encoder.bytes_out)
@@ -0,0 +1,189 @@
+"""
+Limitador de concurrencia adaptativo (AIMD) con prioridades por ruta.
+
+El límite de peticiones simultáneas crece en 1/límite por cada respuesta sin
+congestión (aumento aditivo) y se multiplica por LIMITER_BACKOFF cuando hay
+congestión (disminución multiplicativa, como mucho una vez por intervalo).
+Ambos ajustes sólo se aplican con al menos la mitad del límite en uso.
+Hay congestión si el event loop va con retraso o si una respuesta tarda más de
+LIMITER_LATENCY_TOLERANCE veces la latencia habitual de su ruta.
+
+Cada prioridad puede ocupar una fracción del límite; lo que la supera se
+rechaza al momento con 503 (sin cola), así que las rutas de baja prioridad se
+descartan antes y queda hueco para las críticas. Las exentas (health, métricas,
+consulta de jobs) ni se rechazan ni cuentan para el límite.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config.config import settings
+from app.middleware.newrelic_middleware import get_route_template
+from app.utils.loop_monitor import loop_lag_monitor
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+EXEMPT = "exempt"
+DEFAULT_PRIORITY = "normal"
+
+# Peso de cada nueva muestra en la latencia habitual de la ruta
+BASELINE_ALPHA = 0.05
+BASELINE_WARMUP = 20
+
+PriorityRule = Tuple[Optional[str], str, str]
+
+
+def parse_priorities(value: str) -> List[PriorityRule]:
+    """Parse '[METHOD ]/path/prefix=priority,...'; longest prefix first"""
+    rules = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        target, _, priority = item.rpartition("=")
+        method, _, prefix = target.strip().rpartition(" ")
+        rules.append((method.upper() or None, prefix, priority.strip()))
+    # Reglas con método antes que sin método, y prefijos largos antes que cortos
+    return sorted(rules, key=lambda rule: (rule[0] is None, -len(rule[1])))
+
+
+def parse_shares(value: str) -> Dict[str, float]:
+    """Parse 'priority=fraction,...' (share of the limit each priority may use)"""
+    shares = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        priority, _, share = item.partition("=")
+        shares[priority.strip()] = float(share)
+    return shares
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit with per-priority admission"""
+
+    def __init__(
+        self,
+        initial_limit: int = settings.limiter_initial_limit,
+        min_limit: int = settings.limiter_min_limit,
+        max_limit: int = settings.limiter_max_limit,
+        backoff: float = settings.limiter_backoff,
+        max_lag: float = settings.limiter_max_lag_ms / 1000,
+        latency_tolerance: float = settings.limiter_latency_tolerance,
+        decrease_interval: float = settings.limiter_decrease_interval,
+        shares: Optional[Dict[str, float]] = None
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.max_lag = max_lag
+        self.latency_tolerance = latency_tolerance
+        self.decrease_interval = decrease_interval
+        self.shares = parse_shares(settings.limiter_priority_shares) if shares is None else shares
+        self.inflight = 0
+        self.shed: Dict[str, int] = {}
+        self._baselines: Dict[str, Tuple[float, int]] = {}
+        self._last_decrease = 0.0
+        self._last_report = 0.0
+
+    def try_acquire(self, priority: str) -> bool:
+        """Admit a request of `priority` or return False to shed it"""
+        capacity = self.limit * self.shares.get(priority, 1.0)
+        if self.inflight >= capacity:
+            self.shed[priority] = self.shed.get(priority, 0) + 1
+            NewRelicMonitor.record_custom_metric(f'Custom/ConcurrencyLimit/Shed/{priority}', 1)
+            return False
+        self.inflight += 1
+        return True
+
+    def release(self, route_key: str, latency: float, lag: float):
+        """Account a finished request and adapt the limit"""
+        self.inflight -= 1
+        now = time.monotonic()
+        # Sólo se adapta si el límite se está usando: con poca carga una respuesta
+        # lenta (fallo de caché, GC) no es congestión y bajar el límite no la evita
+        in_use = self.inflight + 1 >= self.limit / 2
+        if self._congested(route_key, latency, lag):
+            if in_use and now - self._last_decrease >= self.decrease_interval:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit * self.backoff)
+                NewRelicMonitor.record_custom_metric('Custom/ConcurrencyLimit/Decrease', 1)
+        elif in_use:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+        if now - self._last_report >= 1:
+            self._last_report = now
+            NewRelicMonitor.record_custom_metric('Custom/ConcurrencyLimit/Limit', self.limit)
+            NewRelicMonitor.record_custom_metric('Custom/ConcurrencyLimit/InFlight', self.inflight)
+
+    def _congested(self, route_key: str, latency: float, lag: float) -> bool:
+        if lag > self.max_lag:
+            return True
+        baseline, samples = self._baselines.get(route_key, (latency, 0))
+        slow = samples >= BASELINE_WARMUP and latency > baseline * self.latency_tolerance
+        if not slow:
+            # Las respuestas lentas no suben la latencia de referencia
+            self._baselines[route_key] = (baseline + BASELINE_ALPHA * (latency - baseline), samples + 1)
+        return slow
+
+    def stats(self) -> dict:
+        return {"limit": round(self.limit, 2), "inflight": self.inflight, "shed": dict(self.shed)}
+
+
+class ConcurrencyLimitMiddleware:
+    """Pure ASGI middleware that sheds requests beyond the adaptive limit"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+        priorities: Optional[str] = None,
+        retry_after: int = settings.limiter_retry_after
+    ):
+        self.app = app
+        self.limiter = limiter or AdaptiveConcurrencyLimiter()
+        self.rules = parse_priorities(settings.limiter_priorities if priorities is None else priorities)
+        self.retry_after = retry_after
+        self._priority_cache: Dict[Tuple[str, str], str] = {}
+
+    def classify(self, method: str, path: str) -> str:
+        """Priority of a request (before routing, by method and path prefix)"""
+        key = (method, path)
+        priority = self._priority_cache.get(key)
+        if priority is not None:
+            return priority
+        priority = DEFAULT_PRIORITY
+        for rule_method, prefix, rule_priority in self.rules:
+            if (rule_method is None or rule_method == method) and path.startswith(prefix):
+                priority = rule_priority
+                break
+        # Caché acotada: los paths con ids (/users/123) no deben hacerla crecer sin fin
+        if len(self._priority_cache) < 10000:
+            self._priority_cache[key] = priority
+        return priority
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        priority = self.classify(scope["method"], scope["path"])
+        if priority == EXEMPT:
+            # Sondas, métricas y long-poll/SSE: ni se rechazan ni cuentan para el límite
+            await self.app(scope, receive, send)
+            return
+        if not self.limiter.try_acquire(priority):
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Server overloaded, retry later"},
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # Tras el routing el scope ya tiene la ruta: latencia de referencia por plantilla
+            self.limiter.release(
+                f"{scope['method']} {get_route_template(scope)}",
+                time.perf_counter() - start,
+                loop_lag_monitor.lag
+            )
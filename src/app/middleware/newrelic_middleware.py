@@ -0,0 +1,144 @@
+import logging
+import time
+from typing import Dict, Iterable, Optional
+
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config.config import settings
+from app.services.metrics_exporter import route_latency
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+from app.utils.request_profiler import profile_attributes, request_profiler
+
+logger = setup_logger(__name__)
+
+UNMATCHED_ROUTE = "unmatched"
+
+# Caché endpoint -> plantilla de ruta (acotada por el número de rutas)
+_templates_by_endpoint: Dict = {}
+
+
+def get_route_template(scope: Scope) -> str:
+    """Path template of the matched route (e.g. /api/v1/users/{user_id}).
+
+    Falls back to `UNMATCHED_ROUTE` so unknown paths never create new metric names.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+
+    router = getattr(scope.get("app"), "router", None)
+    if router is None:
+        return UNMATCHED_ROUTE
+
+    # El router deja el endpoint en el scope: resolverlo sin volver a comparar paths
+    endpoint = scope.get("endpoint")
+    if endpoint is not None and endpoint in _templates_by_endpoint:
+        return _templates_by_endpoint[endpoint]
+
+    for candidate in router.routes:
+        match, _ = candidate.matches(scope)
+        if match == Match.FULL:
+            template = getattr(candidate, "path", UNMATCHED_ROUTE)
+            if endpoint is not None:
+                _templates_by_endpoint[endpoint] = template
+            return template
+    return UNMATCHED_ROUTE
+
+
+class NewRelicMiddleware:
+    """Pure ASGI middleware para monitoreo de NewRelic.
+
+    No envuelve la respuesta en streams (a diferencia de BaseHTTPMiddleware)
+    y registra la latencia por plantilla de ruta con un reloj monotónico.
+    """
+
+    def __init__(self, app: ASGIApp, excluded_paths: Optional[Iterable[str]] = None):
+        self.app = app
+        if excluded_paths is None:
+            excluded_paths = settings.metrics_excluded_paths.split(",")
+        # Sondas de health: sin métricas personalizadas
+        self.excluded_paths = frozenset(path.strip() for path in excluded_paths if path.strip())
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start_ns = time.perf_counter_ns()
+        attributes_token = NewRelicMonitor.begin_attribute_batch()
+        profile = request_profiler.begin(scope)
+        status_code = 500
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+
+        except Exception as e:
+            process_time = (time.perf_counter_ns() - start_ns) / 1e9
+            logger.error("Request failed: %s %s - Error: %s", scope["method"], scope["path"], e)
+            route_latency.observe(scope['method'], get_route_template(scope), 500, process_time)
+            if profile is not None:
+                self._attach_profile(profile, scope['method'], get_route_template(scope), process_time)
+
+            # Registrar error solo si NewRelic está activo
+            if NewRelicMonitor.is_enabled():
+                NewRelicMonitor.notice_error(e, {
+                    'request_path': scope['path'],
+                    'request_route': get_route_template(scope),
+                    'request_method': scope['method'],
+                    'processing_time': str(process_time)
+                })
+                NewRelicMonitor.record_custom_metric('Custom/RequestError', 1)
+                NewRelicMonitor.flush_attribute_batch(attributes_token)
+
+            if response_started:
+                raise
+            response = JSONResponse(
+                status_code=500,
+                content={"detail": "Internal server error"}
+            )
+            await response(scope, receive, send)
+            return
+
+        process_time = (time.perf_counter_ns() - start_ns) / 1e9
+        route = get_route_template(scope)
+        method = scope['method']
+        # Histograma en proceso siempre, con o sin NewRelic
+        route_latency.observe(method, route, status_code, process_time)
+        if profile is not None:
+            self._attach_profile(profile, method, route, process_time)
+
+        # Solo registrar métricas si NewRelic está activo
+        if NewRelicMonitor.is_enabled():
+            NewRelicMonitor.record_custom_metric('Custom/RequestCount', 1)
+            NewRelicMonitor.record_custom_metric('Custom/ResponseTime', process_time)
+            NewRelicMonitor.record_custom_metric(f'Custom/ResponseTime/{method}{route}', process_time)
+            NewRelicMonitor.add_custom_attribute('response_status', str(status_code))
+            NewRelicMonitor.add_custom_attribute('request_path', scope['path'])
+            NewRelicMonitor.add_custom_attribute('request_route', route)
+            NewRelicMonitor.add_custom_attribute('request_method', method)
+            NewRelicMonitor.flush_attribute_batch(attributes_token)
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Request processed: %s %s - %s - %.3fs",
+                scope['method'], scope['path'], status_code, process_time
+            )
+
+    @staticmethod
+    def _attach_profile(profile, method: str, route: str, process_time: float):
+        # Sólo se conservan (y se adjuntan) los perfiles de peticiones lentas o marcadas
+        top_frames = request_profiler.finish(profile, f"{method} {route}", process_time)
+        if top_frames:
+            for key, value in profile_attributes(top_frames, profile.forced).items():
+                NewRelicMonitor.add_custom_attribute(key, value)
@@ -1,14 +1,168 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, func
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from contextvars import ContextVar
+from typing import Dict, Optional
+from sqlalchemy import Column, Integer, String, DateTime, event, func
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from app.config.config import settings
+from app.utils.newrelic_monitor import NewRelicMonitor
 
-# Database configuration
-engine = create_engine(
-    settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+# Drivers async para cada backend soportado
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def get_async_database_url(database_url: str) -> str:
+    """Translate a sync database URL into its async driver equivalent"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"Unsupported database backend for async mode: {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def uses_read_pool(database_url: str) -> bool:
+    """SQLite file databases get a single writer plus a read-only pool"""
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (None, "", ":memory:")
+
+
+def get_engine_options(database_url: str, read_only: bool = False) -> dict:
+    """Pool options tuned from settings for the given URL"""
+    url = make_url(database_url)
+    options = {"pool_pre_ping": settings.db_pool_pre_ping}
+
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # Una única conexión compartida para que la BD en memoria persista
+            options["poolclass"] = StaticPool
+            return options
+        # aiosqlite usa NullPool por defecto: reutilizar conexiones (y sus hilos)
+        options["poolclass"] = AsyncAdaptedQueuePool
+        if not read_only:
+            # SQLite admite un único escritor: una conexión, el resto espera en la cola
+            options.update(pool_size=1, max_overflow=0, pool_timeout=settings.db_pool_timeout)
+            return options
+
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
+
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """PRAGMA statements of the SQLite performance profile"""
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.db_sqlite_busy_timeout}",
+        f"PRAGMA synchronous = {settings.db_sqlite_synchronous}",
+        f"PRAGMA cache_size = {settings.db_sqlite_cache_size}",
+        f"PRAGMA mmap_size = {settings.db_sqlite_mmap_size}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # journal_mode es persistente en el fichero: basta con fijarlo al escribir
+        pragmas.insert(0, f"PRAGMA journal_mode = {settings.db_sqlite_journal_mode}")
+    return pragmas
+
+
+def _install_sqlite_profile(engine: AsyncEngine, read_only: bool):
+    pragmas = sqlite_pragmas(read_only)
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        if not read_only:
+            # Transacciones explícitas (SAVEPOINT correctos) y BEGIN IMMEDIATE abajo
+            dbapi_connection.isolation_level = None
+
+    event.listen(engine.sync_engine, "connect", on_connect)
+    if not read_only:
+        # Tomar el bloqueo de escritura al empezar: sin SQLITE_BUSY al promocionar
+        event.listen(engine.sync_engine, "begin", lambda conn: conn.exec_driver_sql("BEGIN IMMEDIATE"))
+
+
+# Ruta que origina cada checkout del pool (la fijan las dependencias de BD)
+current_db_route: ContextVar[str] = ContextVar("current_db_route", default="background")
+pool_checkouts: Dict[str, int] = {}
+
+
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    route = current_db_route.get()
+    pool_checkouts[route] = pool_checkouts.get(route, 0) + 1
+    NewRelicMonitor.record_custom_metric(f'Custom/Database/Checkouts/{route.lstrip("/")}', 1)
+
+
+def get_pool_checkout_counts() -> Dict[str, int]:
+    """Pool checkouts per route since the worker started"""
+    return dict(pool_checkouts)
+
+
+# Database configuration: los engines (driver, dialecto y pool) se crean en el
+# primer uso o en el lifespan, no al importar el módulo. `_engine` es el de
+# escritura (y DDL); con SQLite en fichero las lecturas usan `_read_engine`.
+_engine: Optional[AsyncEngine] = None
+_read_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+WriteSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+def _create_engine(read_only: bool) -> AsyncEngine:
+    engine = create_async_engine(
+        get_async_database_url(settings.database_url),
+        **get_engine_options(settings.database_url, read_only=read_only)
+    )
+    if uses_read_pool(settings.database_url):
+        _install_sqlite_profile(engine, read_only)
+    event.listen(engine.sync_engine, "checkout", _count_checkout)
+    return engine
+
+def get_engine() -> AsyncEngine:
+    """Return the write engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        _engine = _create_engine(read_only=False)
+        WriteSessionLocal.configure(bind=_engine)
+        if not uses_read_pool(settings.database_url):
+            AsyncSessionLocal.configure(bind=_engine)
+    return _engine
+
+def get_read_engine() -> AsyncEngine:
+    """Return the read-only engine (the write engine when there is no split)"""
+    global _read_engine
+    if not uses_read_pool(settings.database_url):
+        return get_engine()
+    if _read_engine is None:
+        _read_engine = _create_engine(read_only=True)
+        AsyncSessionLocal.configure(bind=_read_engine)
+    return _read_engine
+
+def get_sessionmaker() -> async_sessionmaker:
+    """Session factory for reads, bound to the (lazily created) read engine"""
+    get_read_engine()
+    return AsyncSessionLocal
+
+def get_write_sessionmaker() -> async_sessionmaker:
+    """Session factory bound to the write engine (write queue and `run_write`)"""
+    get_engine()
+    return WriteSessionLocal
 
 Base = declarative_base()
 
@@ -20,14 +174,42 @@ class User(Base):
     email = Column(String(120), unique=True, index=True, nullable=False)
     created_at = Column(DateTime, server_default=func.now())
 
+class LazySession:
+    """AsyncSession proxy that creates the session on first use"""
+
+    def __init__(self, factory: async_sessionmaker):
+        self._factory = factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def created(self) -> bool:
+        return self._session is not None
+
+    def __getattr__(self, name):
+        if self._session is None:
+            self._session = self._factory()
+        return getattr(self._session, name)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with get_sessionmaker()() as db:
         yield db
-    finally:
-        db.close()
 
-def init_db():
+async def init_db():
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    async with get_engine().begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+async def close_db():
+    """Dispose the connection pools (the engines are recreated on next use)"""
+    global _engine, _read_engine
+    if _read_engine is not None:
+        await _read_engine.dispose()
+        _read_engine = None
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
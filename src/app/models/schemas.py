@@ -8,6 +8,20 @@ class HealthResponse(BaseModel):
     timestamp: float
     service: str
 
+class LivenessResponse(BaseModel):
+    status: str
+
+class HealthCheckResult(BaseModel):
+    status: str
+    latency_ms: float
+    detail: Optional[str] = None
+    pool: Optional[dict] = None
+
+class ReadinessResponse(BaseModel):
+    status: str
+    checked_at: float
+    checks: dict[str, HealthCheckResult]
+
 # Data Schemas
 class DataResponse(BaseModel):
     success: bool
@@ -18,6 +32,21 @@ class Metadata(BaseModel):
     processed_at: float
     source: str
 
+class DataBatchItem(BaseModel):
+    id: int
+    status: str  # ok | error | timeout
+    stale: Optional[bool] = None
+    data: Optional[Any] = None
+    error: Optional[str] = None
+    latency_ms: Optional[float] = None
+
+class DataBatchResponse(BaseModel):
+    success: bool
+    succeeded: int
+    failed: int
+    results: list[DataBatchItem]
+    metadata: Optional[dict] = None
+
 # User Schemas
 class UserBase(BaseModel):
     username: str
@@ -38,12 +67,35 @@ class UserOperationResponse(BaseModel):
     user: UserResponse
     message: str
 
+class BulkUserResult(BaseModel):
+    index: int
+    status: str  # created | duplicate | conflict | invalid
+    user: Optional[UserResponse] = None
+    error: Optional[str] = None
+
+class BulkUserCreateResponse(BaseModel):
+    success: bool
+    created: int
+    failed: int
+    results: list[BulkUserResult]
+
 # Slow Operation Schemas
 class SlowOperationResponse(BaseModel):
     success: bool
     message: str
     processing_time: float
 
+# Job Schemas
+class JobResponse(BaseModel):
+    job_id: str
+    type: str
+    status: str  # queued | running | succeeded | failed
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+
 # Error Schemas
 class ErrorResponse(BaseModel):
     success: bool
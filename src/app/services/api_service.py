@@ -1,32 +1,146 @@
-import requests
+import asyncio
 import time
+from collections import Counter
+from typing import Any, AsyncIterator, Sequence, Tuple
+from app.config.config import settings
+from app.services.executor import get_executor_manager
+from app.services.http_client import ExternalServiceError, get_http_client
+from app.utils.histogram import LatencyHistogram
 from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
 
 logger = setup_logger(__name__)
 
+# Estado de cada elemento de un lote
+ITEM_OK = "ok"
+ITEM_ERROR = "error"
+ITEM_TIMEOUT = "timeout"
+
+REPORTED_PERCENTILES = (50, 95, 99)
+
+
+def _retrieve_exception(task: asyncio.Future):
+    # Fetch abandonado al agotar el deadline: su error no lo espera nadie
+    if not task.cancelled():
+        task.exception()
+
+
+def _report_batch(width: int, concurrency: int, counts: Counter, latencies: LatencyHistogram,
+                  max_latency: float, elapsed: float):
+    NewRelicMonitor.record_custom_metric('Custom/DataBatch/FanOut', width)
+    NewRelicMonitor.record_custom_metric('Custom/DataBatch/Concurrency', min(width, concurrency))
+    NewRelicMonitor.record_custom_metric('Custom/DataBatch/Time', elapsed)
+    for status, count in counts.items():
+        NewRelicMonitor.record_custom_metric(f'Custom/DataBatch/Items/{status}', count)
+    if latencies.count:
+        # Latencia de cola del lote: la del elemento más lento marca la respuesta
+        for percent in REPORTED_PERCENTILES:
+            NewRelicMonitor.record_custom_metric(
+                f'Custom/DataBatch/ItemLatency/p{percent}', latencies.percentile(percent)
+            )
+        NewRelicMonitor.record_custom_metric('Custom/DataBatch/ItemLatency/max', max_latency)
+    NewRelicMonitor.add_custom_attribute('batch_size', str(width))
+    NewRelicMonitor.add_custom_attribute('batch_failed', str(counts[ITEM_ERROR] + counts[ITEM_TIMEOUT]))
+
+
+def _slow_work(duration: float) -> float:
+    """Blocking work executed inside the executor pools"""
+    start_time = time.time()
+    time.sleep(duration)  # Simulate processing
+    return time.time() - start_time
+
 class ApiService:
     """Service layer for API operations"""
 
     @staticmethod
-    async def get_external_data():
-        """Simulate external API call"""
-        try:
-            # Simulate API call
-            response = requests.get('https://jsonplaceholder.typicode.com/posts/1', timeout=5)
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as e:
-            logger.error(f"External API call failed: {e}")
-            return {"error": "External service unavailable"}
+    async def get_external_data(path: str = '/posts/1') -> Tuple[Any, bool]:
+        """External API call; returns `(data, stale)`.
+
+        Raises ExternalServiceError if the call fails and there is no stale copy.
+        """
+        # Cliente compartido: pool, caché con coalescencia, circuito y reintentos
+        return await get_http_client().fetch_json(path)
 
     @staticmethod
     async def process_data(data):
         """Process data with business logic"""
         if isinstance(data, dict) and 'title' in data:
-            data['processed'] = True
-            data['title_upper'] = data['title'].upper()
+            # Copiar: el dict original puede estar compartido en la caché
+            data = {**data, 'processed': True, 'title_upper': data['title'].upper()}
         return data
 
+    @staticmethod
+    async def fetch_batch_item(item_id: int) -> dict:
+        """Fetch and process one batch item; failures become an error entry"""
+        start = time.perf_counter()
+        # Shield: si el lote se cancela, la llamada (acotada por HTTP_DEADLINE) termina
+        # y rellena la caché sin cancelar a otras peticiones que esperan la misma clave
+        fetch = asyncio.ensure_future(ApiService.get_external_data(settings.data_batch_path.format(id=item_id)))
+        fetch.add_done_callback(_retrieve_exception)
+        try:
+            data, stale = await asyncio.shield(fetch)
+            processed = await ApiService.process_data(data)
+            item = {"id": item_id, "status": ITEM_OK, "stale": stale, "data": processed}
+        except ExternalServiceError as e:
+            logger.warning("Batch item %s unavailable: %s", item_id, e)
+            item = {"id": item_id, "status": ITEM_ERROR, "error": "External service unavailable"}
+        except Exception as e:
+            logger.error("Error processing batch item %s: %s", item_id, e)
+            NewRelicMonitor.notice_error(e, {'operation': 'data_batch_item', 'item_id': item_id})
+            item = {"id": item_id, "status": ITEM_ERROR, "error": "Internal error"}
+        item["latency_ms"] = round((time.perf_counter() - start) * 1000, 3)
+        return item
+
+    @staticmethod
+    async def iter_external_batch(
+        ids: Sequence[int],
+        concurrency: int = settings.data_batch_concurrency,
+        deadline: float = settings.data_batch_deadline
+    ) -> AsyncIterator[dict]:
+        """Fetch `ids` concurrently and yield each item as soon as it completes.
+
+        At most `concurrency` upstream calls are in flight. Items still pending
+        when `deadline` expires are cancelled and yielded with status "timeout".
+        """
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = LatencyHistogram()
+        counts: Counter = Counter()
+        max_latency = 0.0
+
+        async def run(item_id: int) -> dict:
+            async with semaphore:
+                return await ApiService.fetch_batch_item(item_id)
+
+        pending = {asyncio.ensure_future(run(item_id)): item_id for item_id in ids}
+        try:
+            while pending:
+                remaining = start + deadline - loop.time()
+                if remaining <= 0:
+                    break
+                done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    del pending[task]
+                    item = task.result()
+                    counts[item["status"]] += 1
+                    latency = item["latency_ms"] / 1000
+                    latencies.observe(latency)
+                    max_latency = max(max_latency, latency)
+                    yield item
+
+            expired, pending = list(pending.items()), {}
+            for task, item_id in expired:
+                task.cancel()
+            for _, item_id in expired:
+                counts[ITEM_TIMEOUT] += 1
+                yield {"id": item_id, "status": ITEM_TIMEOUT, "error": "Batch deadline exceeded"}
+        finally:
+            # También si el cliente se desconecta a mitad del stream
+            for task in pending:
+                task.cancel()
+            _report_batch(len(ids), concurrency, counts, latencies, max_latency, loop.time() - start)
+
     @staticmethod
     async def create_user_data(username: str, email: str):
         """Create user data structure"""
@@ -38,7 +152,7 @@ class ApiService:
 
     @staticmethod
     async def simulate_slow_operation():
-        """Simulate slow operation"""
-        start_time = time.time()
-        time.sleep(2)  # Simulate processing
-        return time.time() - start_time
+        """Simulate slow operation without blocking the event loop"""
+        return await get_executor_manager().run(
+            'slow_operation', _slow_work, settings.slow_operation_duration
+        )
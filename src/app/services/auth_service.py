@@ -0,0 +1,144 @@
+"""
+Verificación de tokens JWT HS256 firmados con `settings.secret_key`.
+
+La clave HMAC se procesa una sola vez (estado ipad/opad precalculado) y cada
+firma copia ese estado. Los tokens verificados se guardan por hash hasta su
+`exp` (como mucho AUTH_CACHE_TTL), así que la firma sólo se comprueba en la
+primera petición de cada token. Los fallos se limitan por cliente.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from typing import Optional, Tuple
+
+from app.config.config import settings
+from app.utils.cache import TTLCache
+
+ALGORITHM = "HS256"
+
+
+class InvalidTokenError(Exception):
+    """The token is malformed, badly signed or outside its validity period"""
+
+
+def _b64url_encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + "=" * (-len(segment) % 4))
+
+
+class TokenVerifier:
+    """HS256 token issuing/verification with a cache of verified tokens"""
+
+    def __init__(
+        self,
+        secret: str = settings.secret_key,
+        leeway: int = settings.auth_token_leeway,
+        cache_maxsize: int = settings.auth_cache_maxsize,
+        cache_ttl: float = settings.auth_cache_ttl
+    ):
+        self._mac = hmac.new(secret.encode(), digestmod=hashlib.sha256)
+        self._header = _b64url_encode(
+            json.dumps({"alg": ALGORITHM, "typ": "JWT"}, separators=(",", ":")).encode()
+        )
+        self.leeway = leeway
+        self.cache = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        mac = self._mac.copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def issue(self, subject: str, ttl: int = settings.auth_token_ttl, **claims) -> str:
+        """Create a signed token for `subject` valid for `ttl` seconds"""
+        now = int(time.time())
+        payload = {"sub": subject, "iat": now, "exp": now + ttl, **claims}
+        payload_b64 = _b64url_encode(json.dumps(payload, separators=(",", ":")).encode())
+        signing_input = f"{self._header}.{payload_b64}"
+        return f"{signing_input}.{_b64url_encode(self._sign(signing_input.encode()))}"
+
+    def verify(self, token: str) -> Tuple[dict, str]:
+        """Return `(claims, outcome)` where outcome is the cache hit or miss.
+
+        Raises InvalidTokenError when the token is not acceptable.
+        """
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        claims = self.cache.get(key)
+        if claims is not None:
+            return claims, "hit"
+
+        claims = self._verify_signed(token)
+        now = time.time()
+        expires_in = claims["exp"] + self.leeway - now
+        # Nunca más allá de exp: un token cacheado no sobrevive a su caducidad
+        self.cache.set(key, claims, ttl=min(self.cache.ttl, expires_in))
+        return claims, "miss"
+
+    def _verify_signed(self, token: str) -> dict:
+        try:
+            header_b64, payload_b64, signature_b64 = token.split(".")
+            header = json.loads(_b64url_decode(header_b64))
+            signature = _b64url_decode(signature_b64)
+        except (ValueError, binascii.Error):
+            raise InvalidTokenError("malformed token")
+
+        if not isinstance(header, dict) or header.get("alg") != ALGORITHM:
+            raise InvalidTokenError("unsupported algorithm")
+        expected = self._sign(f"{header_b64}.{payload_b64}".encode())
+        if not hmac.compare_digest(expected, signature):
+            raise InvalidTokenError("invalid signature")
+
+        try:
+            claims = json.loads(_b64url_decode(payload_b64))
+        except (ValueError, binascii.Error):
+            raise InvalidTokenError("malformed payload")
+        if not isinstance(claims, dict) or not isinstance(claims.get("exp"), (int, float)):
+            raise InvalidTokenError("missing exp claim")
+
+        now = time.time()
+        if now > claims["exp"] + self.leeway:
+            raise InvalidTokenError("token expired")
+        nbf = claims.get("nbf")
+        if isinstance(nbf, (int, float)) and now + self.leeway < nbf:
+            raise InvalidTokenError("token not yet valid")
+        return claims
+
+
+class FailureLimiter:
+    """Fixed-window count of authentication failures per client"""
+
+    def __init__(
+        self,
+        max_failures: int = settings.auth_max_failures,
+        window: float = settings.auth_failure_window,
+        maxsize: int = settings.auth_cache_maxsize
+    ):
+        self.max_failures = max_failures
+        self.window = window
+        # (fallos, fin de la ventana) por cliente; la entrada caduca con la ventana
+        self._failures = TTLCache(maxsize=maxsize, ttl=window)
+
+    def retry_after(self, client: str) -> Optional[float]:
+        """Seconds the client must wait, or None if it may try again"""
+        entry = self._failures.get(client)
+        if entry is None or entry[0] < self.max_failures:
+            return None
+        return max(0.0, entry[1] - time.monotonic())
+
+    def record_failure(self, client: str):
+        now = time.monotonic()
+        entry = self._failures.get(client)
+        if entry is None:
+            self._failures.set(client, (1, now + self.window))
+        else:
+            count, window_end = entry
+            self._failures.set(client, (count + 1, window_end), ttl=window_end - now)
+
+
+token_verifier = TokenVerifier()
+auth_failure_limiter = FailureLimiter()
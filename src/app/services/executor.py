@@ -0,0 +1,162 @@
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from app.config.config import settings
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+logger = setup_logger(__name__)
+
+THREAD_POOL = "thread"
+PROCESS_POOL = "process"
+
+
+class ExecutorSaturatedError(Exception):
+    """Raised when a pool has no free worker nor queue slot"""
+
+    def __init__(self, pool: str, retry_after: int):
+        super().__init__(f"Executor pool '{pool}' is saturated")
+        self.pool = pool
+        self.retry_after = retry_after
+
+
+class BoundedPool:
+    """Executor wrapper that admits at most `max_workers + max_queue` tasks"""
+
+    def __init__(
+        self,
+        name: str,
+        executor_factory: Callable[[], Executor],
+        max_workers: int,
+        max_queue: int,
+        retry_after: int
+    ):
+        self.name = name
+        self.capacity = max_workers + max_queue
+        self.retry_after = retry_after
+        self._executor_factory = executor_factory
+        self._executor: Optional[Executor] = None
+        self._inflight = 0
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run `fn` in the pool or fail fast when it is saturated"""
+        if self._inflight >= self.capacity:
+            NewRelicMonitor.record_custom_metric(f'Custom/Executor/{self.name}/Rejected', 1)
+            raise ExecutorSaturatedError(self.name, self.retry_after)
+
+        if self._executor is None:
+            # Crear el pool en el primer uso (el de procesos es costoso)
+            self._executor = self._executor_factory()
+
+        loop = asyncio.get_running_loop()
+        future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        self._inflight += 1
+        NewRelicMonitor.record_custom_metric(f'Custom/Executor/{self.name}/InFlight', self._inflight)
+        # El hueco se libera cuando termina el trabajo, no cuando deja de esperarlo
+        # quien lo lanzó: un llamador cancelado no detiene el hilo que ya corre
+        future.add_done_callback(lambda _: self._release_from_any_thread(loop))
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        self._inflight -= 1
+
+    def _release_from_any_thread(self, loop: asyncio.AbstractEventLoop):
+        # El callback corre en el hilo que completa el future (worker o el propio loop)
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # Loop ya cerrado: nadie más usará este contador desde él
+            self._inflight -= 1
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+
+class ExecutorManager:
+    """Thread pool for I/O-bound work and process pool for CPU-bound work,
+    with per-operation routing"""
+
+    def __init__(
+        self,
+        thread_workers: int = settings.executor_thread_workers,
+        process_workers: int = settings.executor_process_workers,
+        max_queue: int = settings.executor_max_queue,
+        retry_after: int = settings.executor_retry_after,
+        routes: Optional[Dict[str, str]] = None
+    ):
+        self.routes = parse_routes(settings.executor_routes) if routes is None else routes
+        self.pools: Dict[str, BoundedPool] = {
+            THREAD_POOL: BoundedPool(
+                THREAD_POOL,
+                lambda: ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="app-io"),
+                thread_workers, max_queue, retry_after
+            ),
+            PROCESS_POOL: BoundedPool(
+                PROCESS_POOL,
+                lambda: ProcessPoolExecutor(
+                    max_workers=process_workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                ),
+                process_workers, max_queue, retry_after
+            ),
+        }
+
+    def pool_for(self, operation: str) -> BoundedPool:
+        return self.pools[self.routes.get(operation, THREAD_POOL)]
+
+    async def run(self, operation: str, fn: Callable, *args, **kwargs) -> Any:
+        """Run `fn` in the pool routed for `operation`"""
+        return await self.pool_for(operation).run(fn, *args, **kwargs)
+
+    def shutdown(self, wait: bool = True):
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
+
+
+def parse_routes(value: str) -> Dict[str, str]:
+    """Parse 'operation=pool,operation2=pool' into a routing table"""
+    routes = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        operation, _, pool = item.partition("=")
+        pool = pool.strip()
+        if pool not in (THREAD_POOL, PROCESS_POOL):
+            raise ValueError(f"Unknown executor pool '{pool}' for operation '{operation}'")
+        routes[operation.strip()] = pool
+    return routes
+
+
+_executor_manager: Optional[ExecutorManager] = None
+
+
+def start_executors(**kwargs) -> ExecutorManager:
+    """Create the executor pools (called from the application lifespan)"""
+    global _executor_manager
+    if _executor_manager is None:
+        _executor_manager = ExecutorManager(**kwargs)
+        logger.info(f"Executor pools started with routes: {_executor_manager.routes}")
+    return _executor_manager
+
+
+async def shutdown_executors(wait: bool = True):
+    """Stop the executor pools; draining running work happens off the event loop"""
+    global _executor_manager
+    if _executor_manager is not None:
+        manager, _executor_manager = _executor_manager, None
+        await asyncio.to_thread(manager.shutdown, wait)
+        logger.info("Executor pools stopped")
+
+
+def get_executor_manager() -> ExecutorManager:
+    """Return the executor pools; the lifespan must have started them"""
+    if _executor_manager is None:
+        raise RuntimeError("Executor pools not started; is the application lifespan running?")
+    return _executor_manager
@@ -0,0 +1,117 @@
+import asyncio
+import time
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.config.config import settings
+from app.models.database import get_read_engine
+from app.services.http_client import get_http_client
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class HealthMonitor:
+    """Readiness checks refreshed in the background.
+
+    Probes only read `snapshot`, so they never open a DB session nor call the
+    upstream service themselves.
+    """
+
+    def __init__(
+        self,
+        interval: float = settings.health_refresh_interval,
+        timeout: float = settings.health_check_timeout,
+        stale_after: float = settings.health_stale_after,
+        upstream_required: bool = settings.health_upstream_required
+    ):
+        self.interval = interval
+        self.timeout = timeout
+        self.stale_after = stale_after
+        self.upstream_required = upstream_required
+        self.snapshot = {"status": "starting", "checked_at": 0.0, "checks": {}}
+        self._task: Optional[asyncio.Task] = None
+
+    def readiness(self) -> dict:
+        """Cached readiness; stale snapshots are reported as not ready"""
+        snapshot = self.snapshot
+        if snapshot["status"] == "ready" and time.time() - snapshot["checked_at"] > self.stale_after:
+            return {**snapshot, "status": "stale"}
+        return snapshot
+
+    async def refresh(self) -> dict:
+        """Run every check once and publish a new snapshot"""
+        database, upstream = await asyncio.gather(self._check_database(), self._check_upstream())
+        ready = database["status"] == "ok" and (upstream["status"] == "ok" or not self.upstream_required)
+        # Se reemplaza el dict completo: los lectores nunca ven un estado a medias
+        self.snapshot = {
+            "status": "ready" if ready else "not_ready",
+            "checked_at": time.time(),
+            "checks": {"database": database, "upstream": upstream},
+        }
+        return self.snapshot
+
+    async def _check_database(self) -> dict:
+        engine = get_read_engine()
+
+        async def ping():
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        result = await self._timed(ping)
+        pool = engine.pool
+        if hasattr(pool, "checkedout"):
+            result["pool"] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow(),
+            }
+        return result
+
+    async def _check_upstream(self) -> dict:
+        return await self._timed(
+            lambda: get_http_client().get_json(
+                settings.health_upstream_path, use_cache=False, allow_stale=False
+            )
+        )
+
+    async def _timed(self, check) -> dict:
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(check(), timeout=self.timeout)
+            status, detail = "ok", None
+        except asyncio.TimeoutError:
+            status, detail = "error", "timeout"
+        except Exception as e:
+            status, detail = "error", type(e).__name__
+        return {
+            "status": status,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+            "detail": detail,
+        }
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Health refresh failed: {e}")
+
+    async def start(self):
+        if self._task is None:
+            await self.refresh()
+            self._task = asyncio.create_task(self._run(), name="health-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+health_monitor = HealthMonitor()
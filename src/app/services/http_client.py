@@ -0,0 +1,222 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+from app.config.config import settings
+from app.utils.cache import TTLCache
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+from app.utils.resilience import CircuitBreaker, backoff_delay, hedged
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = setup_logger(__name__)
+
+_NO_STALE = object()
+
+
+class ExternalServiceError(Exception):
+    """The external API failed and there is no stale copy to fall back on"""
+
+    def __init__(self, message: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _is_retryable(error: Exception) -> bool:
+    # Timeouts, errores de transporte, 5xx y 429; el resto de 4xx no mejora reintentando
+    import httpx
+
+    if isinstance(error, httpx.HTTPStatusError):
+        status = error.response.status_code
+        return status >= 500 or status == 429
+    return True
+
+
+class HttpClient:
+    """Shared async HTTP client with connection pooling and a response cache.
+
+    Outbound calls go through a circuit breaker, a deadline budget shared by
+    bounded retries with jitter and optional hedging. Every good response is
+    also kept in a long-lived stale cache used when the upstream is down.
+    """
+
+    def __init__(
+        self,
+        base_url: str = settings.external_api_base_url,
+        timeout: float = settings.http_timeout,
+        max_connections: int = settings.http_max_connections,
+        max_keepalive_connections: int = settings.http_max_keepalive_connections,
+        keepalive_expiry: float = settings.http_keepalive_expiry,
+        cache_ttl: float = settings.http_cache_ttl,
+        cache_maxsize: int = settings.http_cache_maxsize,
+        deadline: float = settings.http_deadline,
+        attempt_timeout: float = settings.http_attempt_timeout,
+        retry_attempts: int = settings.http_retry_attempts,
+        retry_base_delay: float = settings.http_retry_base_delay,
+        retry_max_delay: float = settings.http_retry_max_delay,
+        hedge_delay: float = settings.http_hedge_delay,
+        breaker_failure_threshold: int = settings.http_breaker_failure_threshold,
+        breaker_recovery_time: float = settings.http_breaker_recovery_time,
+        breaker_half_open_calls: int = settings.http_breaker_half_open_calls,
+        stale_ttl: float = settings.http_stale_ttl,
+        transport: Optional["httpx.AsyncBaseTransport"] = None
+    ):
+        # httpx se importa al crear el cliente (lifespan), no al importar la app
+        import httpx
+
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=timeout,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry
+            ),
+            transport=transport
+        )
+        self.cache = TTLCache(maxsize=cache_maxsize, ttl=cache_ttl)
+        self.stale = TTLCache(maxsize=cache_maxsize, ttl=stale_ttl)
+        self.breaker = CircuitBreaker(
+            "ExternalApi",
+            failure_threshold=breaker_failure_threshold,
+            recovery_time=breaker_recovery_time,
+            half_open_max_calls=breaker_half_open_calls
+        )
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.retry_attempts = max(1, retry_attempts)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.hedge_delay = hedge_delay
+
+    async def get_json(self, path: str, use_cache: bool = True, allow_stale: bool = True) -> Any:
+        """GET `path` and return the decoded JSON body"""
+        value, _ = await self.fetch_json(path, use_cache, allow_stale)
+        return value
+
+    async def fetch_json(
+        self,
+        path: str,
+        use_cache: bool = True,
+        allow_stale: bool = True
+    ) -> Tuple[Any, bool]:
+        """Return `(body, stale)`; stale is True when served from the fallback copy.
+
+        Raises ExternalServiceError when the call fails and nothing is cached.
+        """
+        try:
+            if not use_cache:
+                return await self._fetch_resilient(path), False
+            value, outcome = await self.cache.lookup(path, lambda: self._fetch_resilient(path))
+            NewRelicMonitor.record_cache_event('ExternalApi', outcome)
+            return value, False
+        except ExternalServiceError as e:
+            value = self.stale.get(path, _NO_STALE) if allow_stale else _NO_STALE
+            if value is _NO_STALE:
+                NewRelicMonitor.record_custom_metric('Custom/ExternalApi/Unavailable', 1)
+                raise
+            logger.warning("Serving stale copy of %s: %s", path, e)
+            NewRelicMonitor.record_custom_metric('Custom/ExternalApi/StaleServed', 1)
+            return value, True
+
+    async def _fetch_resilient(self, path: str) -> Any:
+        """Breaker check, then attempts within the deadline budget"""
+        if not self.breaker.allow():
+            raise ExternalServiceError(f"circuit open for {path}", self.breaker.retry_after())
+
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + self.deadline
+        attempt = 0
+        # Todo resultado se anota en el circuito: si no, una sonda half-open quedaría reservada
+        settled = False
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                try:
+                    value = await asyncio.wait_for(
+                        hedged(lambda: self._fetch_json(path), self.hedge_delay, self._on_hedge),
+                        timeout=min(self.attempt_timeout, remaining)
+                    )
+                except (httpx.HTTPError, asyncio.TimeoutError, ValueError) as e:
+                    # ValueError: cuerpo que no es JSON (p. ej. página de error de un proxy)
+                    error = e
+                    if isinstance(e, asyncio.TimeoutError):
+                        NewRelicMonitor.record_custom_metric('Custom/ExternalApi/Timeouts', 1)
+                    if not _is_retryable(e):
+                        # El servicio respondió: no cuenta para el circuito
+                        settled = True
+                        self.breaker.record_success()
+                        raise ExternalServiceError(f"{path} failed: {e}") from e
+                else:
+                    settled = True
+                    self.breaker.record_success()
+                    self.stale.set(path, value)
+                    return value
+
+                attempt += 1
+                delay = backoff_delay(attempt - 1, self.retry_base_delay, self.retry_max_delay)
+                if attempt >= self.retry_attempts or loop.time() + delay >= deadline:
+                    break
+                NewRelicMonitor.record_custom_metric('Custom/ExternalApi/Retries', 1)
+                await asyncio.sleep(delay)
+
+            settled = True
+            self.breaker.record_failure()
+            NewRelicMonitor.record_custom_metric('Custom/ExternalApi/Failures', 1)
+            raise ExternalServiceError(
+                f"{path} failed after {attempt} attempt(s): {error!r}", self.breaker.retry_after()
+            ) from error
+        finally:
+            if not settled:
+                # Cancelación (cliente desconectado, deadline externo) o error inesperado
+                self.breaker.record_failure()
+            NewRelicMonitor.record_custom_metric('Custom/ExternalApi/Time', loop.time() - start)
+
+    @staticmethod
+    def _on_hedge():
+        NewRelicMonitor.record_custom_metric('Custom/ExternalApi/Hedged', 1)
+
+    async def _fetch_json(self, path: str) -> Any:
+        response = await self._client.get(path)
+        response.raise_for_status()
+        return response.json()
+
+    def stats(self) -> dict:
+        """Counters of the response cache"""
+        return self.cache.stats()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_http_client: Optional[HttpClient] = None
+
+
+async def start_http_client(**kwargs) -> HttpClient:
+    """Create the shared client (called from the application lifespan)"""
+    global _http_client
+    if _http_client is None:
+        _http_client = HttpClient(**kwargs)
+        logger.info(f"HTTP client started for {settings.external_api_base_url}")
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared client and its pooled connections"""
+    global _http_client
+    if _http_client is not None:
+        NewRelicMonitor.record_cache_stats('ExternalApi', _http_client.stats())
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("HTTP client closed")
+
+
+def get_http_client() -> HttpClient:
+    """Return the shared client; the lifespan must have started it"""
+    if _http_client is None:
+        raise RuntimeError("HTTP client not started; is the application lifespan running?")
+    return _http_client
@@ -0,0 +1,359 @@
+"""
+Jobs en proceso para operaciones largas.
+
+`submit()` devuelve el job al instante (202) y lo ejecuta en una tarea del
+event loop; cada tipo de job tiene su propio límite de concurrencia y los
+demás esperan en cola. El store está acotado: los jobs terminados caducan a
+los JOBS_RESULT_TTL segundos y, si se llena, se descartan los terminados más
+antiguos antes de rechazar nuevos.
+
+Los jobs se ejecutan en el worker que los creó. Con JOBS_DIR configurado
+(server.py lo crea en /dev/shm) cada cambio de estado se escribe en
+`<job_id>.json`, así que cualquier worker responde al polling, al long-poll
+(consultando el fichero cada JOBS_POLL_INTERVAL) y al SSE. Sin JOBS_DIR el
+estado sólo está en memoria: con varios workers la consulta puede caer en otro
+y devolver 404.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.config.config import settings
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+logger = setup_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED = (SUCCEEDED, FAILED)
+
+JOB_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+RECORD_FIELDS = ("type", "owner", "status", "created_at", "started_at", "finished_at", "result", "error")
+
+
+class JobRejectedError(Exception):
+    """The store or the job type queue is full"""
+
+    def __init__(self, reason: str, retry_after: int = 1):
+        super().__init__(reason)
+        self.retry_after = retry_after
+
+
+class Job:
+    """State of one submitted operation"""
+
+    __slots__ = (
+        "id", "type", "owner", "status", "created_at", "started_at",
+        "finished_at", "result", "error", "done", "task",
+    )
+
+    def __init__(self, job_type: str, owner: Optional[str]):
+        self.id = uuid.uuid4().hex
+        self.type = job_type
+        self.owner = owner
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.done = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+    def to_record(self) -> dict:
+        """State shared with the other workers (includes the owner)"""
+        return {"id": self.id, **{field: getattr(self, field) for field in RECORD_FIELDS}}
+
+    def update_from_record(self, record: dict):
+        for field in RECORD_FIELDS:
+            setattr(self, field, record.get(field))
+
+    @classmethod
+    def from_record(cls, record: dict) -> "Job":
+        """Read-only copy of a job owned by another worker"""
+        job = cls(record["type"], record.get("owner"))
+        job.id = record["id"]
+        job.update_from_record(record)
+        return job
+
+
+def prepare_jobs_dir(path: str):
+    """Create the directory and drop jobs left by a previous run"""
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.json"):
+        stale.unlink(missing_ok=True)
+
+
+def parse_limits(value: str) -> Dict[str, int]:
+    """Parse 'job_type=4,other=2' into concurrency limits"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        job_type, _, limit = item.partition("=")
+        if not limit.strip().isdigit() or int(limit) < 1:
+            raise ValueError(f"Invalid concurrency limit '{limit}' for job type '{job_type}'")
+        limits[job_type.strip()] = int(limit)
+    return limits
+
+
+class JobManager:
+    """Bounded in-process job store with per-type concurrency limits"""
+
+    def __init__(
+        self,
+        max_jobs: int = settings.jobs_max_jobs,
+        result_ttl: float = settings.jobs_result_ttl,
+        limits: Optional[Dict[str, int]] = None,
+        default_concurrency: int = settings.jobs_default_concurrency,
+        max_pending: int = settings.jobs_max_pending,
+        directory: Optional[str] = None,
+        poll_interval: float = settings.jobs_poll_interval
+    ):
+        self.max_jobs = max_jobs
+        self.result_ttl = result_ttl
+        self.limits = parse_limits(settings.jobs_concurrency) if limits is None else limits
+        self.default_concurrency = default_concurrency
+        self.max_pending = max_pending
+        # Se lee al crear el manager: server.py configura JOBS_DIR después de importar
+        directory = settings.jobs_dir if directory is None else directory
+        self.directory = Path(directory) if directory else None
+        self.poll_interval = poll_interval
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._pending: Dict[str, int] = {}
+        self._next_sweep = 0.0
+        self._next_dir_sweep = time.time() + result_ttl
+
+    def submit(
+        self,
+        job_type: str,
+        operation: Callable[[], Awaitable[Any]],
+        owner: Optional[str] = None
+    ) -> Job:
+        """Register a job and schedule `operation()`; raises JobRejectedError"""
+        if self._pending.get(job_type, 0) >= self.max_pending:
+            NewRelicMonitor.record_custom_metric(f'Custom/Jobs/{job_type}/Rejected', 1)
+            raise JobRejectedError(f"too many queued '{job_type}' jobs")
+        self._evict_expired()
+        if len(self._jobs) >= self.max_jobs and not self._evict_oldest_finished():
+            NewRelicMonitor.record_custom_metric(f'Custom/Jobs/{job_type}/Rejected', 1)
+            raise JobRejectedError("job store is full")
+
+        job = Job(job_type, owner)
+        self._jobs[job.id] = job
+        self._persist(job)
+        self._pending[job_type] = self._pending.get(job_type, 0) + 1
+        job.task = asyncio.create_task(self._run(job, operation), name=f"job-{job_type}-{job.id}")
+        NewRelicMonitor.record_custom_metric(f'Custom/Jobs/{job_type}/Submitted', 1)
+        NewRelicMonitor.record_custom_metric(f'Custom/Jobs/{job_type}/QueueDepth', self._pending[job_type])
+        return job
+
+    def get(self, job_id: str, owner: Optional[str] = None) -> Optional[Job]:
+        """Return the job if it exists, has not expired and belongs to `owner`.
+
+        Jobs created by other workers are read from JOBS_DIR.
+        """
+        job = self._jobs.get(job_id) or self._load(job_id)
+        if job is None or (owner is not None and job.owner != owner):
+            return None
+        if self._expired(job, time.time()):
+            self._forget(job_id)
+            return None
+        return job
+
+    async def wait(self, job: Job, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for the job to finish"""
+        if self._jobs.get(job.id) is not job:
+            return await self._wait_remote(job, timeout)
+        try:
+            await asyncio.wait_for(job.done.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def _wait_remote(self, job: Job, timeout: float) -> bool:
+        # Job de otro worker: sin evento compartido, se relee su fichero
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while job.status not in FINISHED:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(self.poll_interval, remaining))
+            record = self._read_record(job.id)
+            if record is None:
+                # Caducado o borrado (p. ej. reinicio del servidor)
+                job.status = FAILED
+                job.error = "job state lost"
+                return True
+            job.update_from_record(record)
+        return True
+
+    async def _run(self, job: Job, operation: Callable[[], Awaitable[Any]]):
+        semaphore = self._semaphores.get(job.type)
+        if semaphore is None:
+            semaphore = self._semaphores[job.type] = asyncio.Semaphore(
+                self.limits.get(job.type, self.default_concurrency)
+            )
+        prefix = f'Custom/Jobs/{job.type}'
+        try:
+            async with semaphore:
+                self._pending[job.type] -= 1
+                job.status = RUNNING
+                job.started_at = time.time()
+                self._persist(job)
+                NewRelicMonitor.record_custom_metric(f'{prefix}/WaitTime', job.started_at - job.created_at)
+                try:
+                    job.result = await operation()
+                    job.status = SUCCEEDED
+                except Exception as e:
+                    logger.error("Job %s (%s) failed: %s", job.id, job.type, e)
+                    job.error = str(e) or type(e).__name__
+                    job.status = FAILED
+                    NewRelicMonitor.record_custom_metric(f'{prefix}/Failed', 1)
+                job.finished_at = time.time()
+                NewRelicMonitor.record_custom_metric(f'{prefix}/RunTime', job.finished_at - job.started_at)
+        except asyncio.CancelledError:
+            # Cancelado en cola (apagado del worker)
+            if job.status == QUEUED:
+                self._pending[job.type] -= 1
+            job.status = FAILED
+            job.error = "cancelled"
+            job.finished_at = time.time()
+            raise
+        finally:
+            job.task = None
+            self._persist(job)
+            job.done.set()
+
+    def _expired(self, job: Job, now: float) -> bool:
+        return job.finished_at is not None and job.finished_at + self.result_ttl < now
+
+    def _evict_expired(self):
+        # Barrido completo como mucho una vez por segundo
+        now = time.time()
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + 1
+        for job_id in [job_id for job_id, job in self._jobs.items() if self._expired(job, now)]:
+            self._forget(job_id)
+        if self.directory is not None and now >= self._next_dir_sweep:
+            self._next_dir_sweep = now + self.result_ttl
+            self._sweep_directory(now)
+
+    def _evict_oldest_finished(self) -> bool:
+        for job_id, job in self._jobs.items():
+            if job.status in FINISHED:
+                self._forget(job_id)
+                return True
+        return False
+
+    def _forget(self, job_id: str):
+        self._jobs.pop(job_id, None)
+        if self.directory is not None:
+            (self.directory / f"{job_id}.json").unlink(missing_ok=True)
+
+    def _persist(self, job: Job):
+        if self.directory is None:
+            return
+        path = self.directory / f"{job.id}.json"
+        # Reemplazo atómico: los otros workers nunca leen un fichero a medias
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            tmp_path.write_text(json.dumps(job.to_record(), default=str))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not persist job %s: %s", job.id, e)
+
+    def _read_record(self, job_id: str) -> Optional[dict]:
+        if self.directory is None or not JOB_ID_PATTERN.match(job_id):
+            return None
+        try:
+            return json.loads((self.directory / f"{job_id}.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        record = self._read_record(job_id)
+        return Job.from_record(record) if record is not None else None
+
+    def _sweep_directory(self, now: float):
+        # Jobs de workers que ya no existen; sólo se leen los ficheros antiguos
+        for path in self.directory.glob("*.json"):
+            try:
+                if path.stat().st_mtime + self.result_ttl >= now:
+                    continue
+            except OSError:
+                continue
+            record = self._read_record(path.stem)
+            if record is not None and self._expired(Job.from_record(record), now):
+                path.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self._jobs),
+            "pending": dict(self._pending),
+            "running": sum(1 for job in self._jobs.values() if job.status == RUNNING),
+        }
+
+    async def shutdown(self):
+        """Cancel queued and running jobs"""
+        tasks = [job.task for job in self._jobs.values() if job.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+_job_manager: Optional[JobManager] = None
+
+
+def start_job_manager(**kwargs) -> JobManager:
+    """Create the job store (called from the application lifespan)"""
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager(**kwargs)
+        logger.info("Job manager started with limits: %s", _job_manager.limits)
+        if _job_manager.directory is None and settings.web_concurrency > 1:
+            logger.warning(
+                "JOBS_DIR is not set: with %s workers a job can only be polled on the worker "
+                "that created it (server.py sets JOBS_DIR automatically)",
+                settings.web_concurrency
+            )
+    return _job_manager
+
+
+async def close_job_manager():
+    """Cancel outstanding jobs"""
+    global _job_manager
+    if _job_manager is not None:
+        await _job_manager.shutdown()
+        _job_manager = None
+        logger.info("Job manager stopped")
+
+
+def get_job_manager() -> JobManager:
+    """Return the job store; the lifespan must have started it"""
+    if _job_manager is None:
+        raise RuntimeError("Job manager not started; is the application lifespan running?")
+    return _job_manager
@@ -0,0 +1,155 @@
+"""
+Exportación de los histogramas de latencia de todos los workers.
+
+Con METRICS_DIR configurado (server.py lo crea en /dev/shm) cada worker
+escribe periódicamente su snapshot en `worker-<pid>.json`; `/metrics` suma
+los ficheros de los demás workers a los contadores vivos del actual. Cuando
+un worker termina, el master acumula su fichero en `retired.json` para que
+los contadores no retrocedan.
+
+Si NewRelic está activo, en cada intervalo se envían al agregador (y de ahí
+en bloque al agente) los percentiles del intervalo de cada serie.
+"""
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.config.config import settings
+from app.utils.histogram import (
+    LatencyHistogram,
+    RouteLatencyRegistry,
+    SeriesKey,
+    merge_snapshots,
+    render_prometheus,
+)
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+logger = setup_logger(__name__)
+
+RETIRED_FILE = "retired.json"
+FORWARDED_PERCENTILES = (50, 95, 99)
+
+route_latency = RouteLatencyRegistry(max_series=settings.metrics_max_series)
+
+
+def _metrics_dir() -> Optional[Path]:
+    return Path(settings.metrics_dir) if settings.metrics_dir else None
+
+
+def _write_json(path: Path, data: dict):
+    # Reemplazo atómico: los lectores nunca ven un fichero a medias
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(json.dumps(data))
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def write_worker_snapshot():
+    directory = _metrics_dir()
+    if directory is not None:
+        _write_json(directory / f"worker-{os.getpid()}.json", route_latency.snapshot())
+
+
+def collect_metrics() -> Dict[SeriesKey, LatencyHistogram]:
+    """Live series of this worker merged with the other workers' snapshots"""
+    snapshots = [route_latency.snapshot()]
+    directory = _metrics_dir()
+    if directory is not None:
+        own_file = f"worker-{os.getpid()}.json"
+        for path in directory.glob("*.json"):
+            if path.name != own_file:
+                snapshots.append(_read_json(path))
+    return merge_snapshots(snapshots)
+
+
+def render_metrics() -> str:
+    return render_prometheus(collect_metrics())
+
+
+def retire_worker_snapshot(pid: int):
+    """Fold a finished worker's snapshot into retired.json (master only)"""
+    directory = _metrics_dir()
+    if directory is None:
+        return
+    worker_file = directory / f"worker-{pid}.json"
+    if not worker_file.exists():
+        return
+    retired_file = directory / RETIRED_FILE
+    merged = merge_snapshots([_read_json(retired_file), _read_json(worker_file)])
+    _write_json(retired_file, {" ".join(key): histogram.to_list() for key, histogram in merged.items()})
+    worker_file.unlink(missing_ok=True)
+
+
+def prepare_metrics_dir(path: str):
+    """Create the directory and drop snapshots left by a previous run"""
+    directory = Path(path)
+    directory.mkdir(parents=True, exist_ok=True)
+    for stale in directory.glob("*.json"):
+        stale.unlink(missing_ok=True)
+
+
+class _Forwarder:
+    """Interval percentiles per series for NewRelic"""
+
+    def __init__(self):
+        self._previous: Dict[SeriesKey, LatencyHistogram] = {}
+
+    def forward(self):
+        current = route_latency.copy()
+        for (method, route, status), histogram in current.items():
+            interval = histogram.minus(self._previous.get((method, route, status)))
+            if not interval.count:
+                continue
+            prefix = f'Custom/Latency/{method}{route}/{status}'
+            NewRelicMonitor.record_custom_metric(f'{prefix}/Count', interval.count)
+            for percent in FORWARDED_PERCENTILES:
+                NewRelicMonitor.record_custom_metric(f'{prefix}/p{percent}', interval.percentile(percent))
+        self._previous = current
+
+
+_forwarder = _Forwarder()
+_export_task: Optional[asyncio.Task] = None
+
+
+def export_once():
+    write_worker_snapshot()
+    if NewRelicMonitor.is_enabled():
+        _forwarder.forward()
+
+
+async def _export_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            export_once()
+        except Exception as e:
+            logger.warning("Metrics export failed: %s", e)
+
+
+def start_metrics_exporter(interval: float = settings.metrics_write_interval):
+    """Start the periodic snapshot/forwarding task (called from the lifespan)"""
+    global _export_task
+    if _export_task is None:
+        _export_task = asyncio.create_task(_export_loop(interval), name="metrics-export")
+
+
+async def stop_metrics_exporter():
+    """Stop the task and write the final snapshot"""
+    global _export_task
+    if _export_task is not None:
+        _export_task.cancel()
+        try:
+            await _export_task
+        except asyncio.CancelledError:
+            pass
+        _export_task = None
+    export_once()
@@ -0,0 +1,132 @@
+"""
+Caché en proceso de usuarios (por id, username y email) y filtro Bloom de
+los usernames/emails existentes para el chequeo de duplicados.
+
+Cada worker tiene su propia copia. Los usuarios no se modifican ni se borran,
+así que las entradas positivas no quedan obsoletas (`invalidate` existe para
+cuando haya escrituras de ese tipo); las negativas ("no existe") viven
+`negative_ttl` segundos y se reemplazan al crear el usuario en este worker. El filtro Bloom no ve las altas de otros workers:
+la restricción UNIQUE de la BD sigue siendo la garantía final.
+"""
+from typing import Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.models.database import User, get_sessionmaker
+from app.models.schemas import UserResponse
+from app.utils.bloom import BloomFilter
+from app.utils.cache import TTLCache
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+logger = setup_logger(__name__)
+
+LOOKUP_FIELDS = ("id", "username", "email")
+
+
+class UserCache:
+    """LRU/TTL cache of `UserResponse` objects plus a duplicate-check filter"""
+
+    def __init__(
+        self,
+        maxsize: int = settings.user_cache_maxsize,
+        ttl: float = settings.user_cache_ttl,
+        negative_ttl: float = settings.user_cache_negative_ttl,
+        bloom_capacity: int = settings.user_bloom_capacity,
+        bloom_error_rate: float = settings.user_bloom_error_rate
+    ):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.negative_ttl = negative_ttl
+        self.bloom_capacity = bloom_capacity
+        self.bloom_error_rate = bloom_error_rate
+        # El filtro se crea al precargarlo; hasta entonces se consulta siempre la BD
+        self.bloom: Optional[BloomFilter] = None
+        self.duplicate_checks_skipped = 0
+        self.duplicate_checks_queried = 0
+        self.bloom_false_positives = 0
+
+    async def warm(self, batch_size: int = settings.users_stream_batch_size):
+        """Build the Bloom filter from the usernames/emails already stored"""
+        bloom = BloomFilter(self.bloom_capacity, self.bloom_error_rate)
+        query = select(User.username, User.email).execution_options(yield_per=batch_size)
+        async with get_sessionmaker()() as db:
+            result = await db.stream(query)
+            async for partition in result.partitions():
+                for username, email in partition:
+                    bloom.add(f"u:{username}")
+                    bloom.add(f"e:{email}")
+        self.bloom = bloom
+        logger.info(f"User Bloom filter loaded with {bloom.count} values")
+
+    async def get(self, db: AsyncSession, field: str, value) -> Optional[UserResponse]:
+        """Return the user whose `field` equals `value`, or None"""
+        key = (field, value)
+
+        async def load():
+            result = await db.execute(select(User).where(getattr(User, field) == value))
+            user = result.scalar_one_or_none()
+            return UserResponse.model_validate(user) if user is not None else None
+
+        user, outcome = await self.cache.lookup(key, load)
+        if user is None and outcome == "miss":
+            # Las respuestas negativas caducan antes
+            self.cache.set(key, None, self.negative_ttl)
+        NewRelicMonitor.record_cache_event('Users', outcome)
+        return user
+
+    def store(self, user: UserResponse):
+        """Cache a newly written user, replacing any negative entries"""
+        for field in LOOKUP_FIELDS:
+            self.cache.set((field, getattr(user, field)), user)
+        if self.bloom is not None:
+            self.bloom.add(f"u:{user.username}")
+            self.bloom.add(f"e:{user.email}")
+
+    def invalidate(self, user: UserResponse):
+        """Drop every entry of a user (to be called on updates/deletes)"""
+        for field in LOOKUP_FIELDS:
+            self.cache.invalidate((field, getattr(user, field)))
+
+    def may_exist(self, username: str, email: str) -> bool:
+        """False only when neither value is stored yet (no DB query needed)"""
+        if self.bloom is None:
+            return True
+        maybe = f"u:{username}" in self.bloom or f"e:{email}" in self.bloom
+        if maybe:
+            self.duplicate_checks_queried += 1
+        else:
+            self.duplicate_checks_skipped += 1
+        return maybe
+
+    def record_false_positive(self):
+        """The filter answered "maybe" but the database had neither value"""
+        if self.bloom is not None:
+            self.bloom_false_positives += 1
+
+    def stats(self) -> dict:
+        """Cache counters plus the duplicate-check counters"""
+        return {
+            **self.cache.stats(),
+            "duplicate_checks_skipped": self.duplicate_checks_skipped,
+            "duplicate_checks_queried": self.duplicate_checks_queried,
+            "bloom_false_positives": self.bloom_false_positives,
+        }
+
+
+user_cache = UserCache()
+
+
+async def start_user_cache():
+    """Load the Bloom filter (called from the application lifespan)"""
+    try:
+        await user_cache.warm()
+    except Exception as e:
+        # Sin filtro el chequeo de duplicados consulta siempre la BD
+        logger.warning(f"User Bloom filter not loaded: {e}")
+
+
+def close_user_cache():
+    """Report the accumulated counters"""
+    NewRelicMonitor.record_cache_stats('Users', user_cache.stats())
@@ -0,0 +1,187 @@
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, or_, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.models.database import User, get_sessionmaker
+from app.models.schemas import BulkUserResult, UserCreate, UserResponse
+from app.services.write_queue import run_write
+from app.utils.json_response import dumps
+
+# Tamaño de los lotes de parámetros IN (límite de variables de SQLite)
+IN_CLAUSE_CHUNK = 500
+
+# Campos expuestos de cada usuario (los de UserResponse)
+RESPONSE_FIELDS = tuple(UserResponse.model_fields)
+
+
+class UserService:
+    """Service layer for user queries"""
+
+    @staticmethod
+    async def list_users(
+        db: AsyncSession,
+        cursor: Optional[int] = None,
+        limit: int = settings.users_page_default_limit
+    ) -> Tuple[List[User], Optional[int]]:
+        """Keyset page of users ordered by id; returns (users, next_cursor)"""
+        query = select(User).order_by(User.id).limit(limit + 1)
+        if cursor is not None:
+            query = query.where(User.id > cursor)
+
+        result = await db.execute(query)
+        users = list(result.scalars().all())
+
+        next_cursor = None
+        if len(users) > limit:
+            users = users[:limit]
+            next_cursor = users[-1].id
+        return users, next_cursor
+
+    @staticmethod
+    def to_response_row(user: User) -> dict:
+        """UserResponse fields of a stored user, without model validation"""
+        return {field: getattr(user, field) for field in RESPONSE_FIELDS}
+
+    @staticmethod
+    async def stream_users_ndjson(
+        cursor: Optional[int] = None,
+        batch_size: int = settings.users_stream_batch_size
+    ) -> AsyncIterator[bytes]:
+        """Yield users as NDJSON, one server-side batch per chunk.
+
+        Opens its own session so it outlives the request dependencies.
+        """
+        query = select(User).order_by(User.id).execution_options(yield_per=batch_size)
+        if cursor is not None:
+            query = query.where(User.id > cursor)
+
+        async with get_sessionmaker()() as db:
+            result = await db.stream(query)
+            async for partition in result.scalars().partitions():
+                yield b"".join(
+                    dumps(UserService.to_response_row(user)) + b"\n"
+                    for user in partition
+                )
+
+    @staticmethod
+    async def estimate_user_count(db: AsyncSession) -> int:
+        """Cheap row count estimate that avoids scanning the table"""
+        if db.get_bind().dialect.name == "postgresql":
+            result = await db.execute(
+                text("SELECT reltuples::bigint FROM pg_class WHERE relname = :table"),
+                {"table": User.__tablename__}
+            )
+            estimate = result.scalar()
+            if estimate is not None and estimate >= 0:
+                return int(estimate)
+
+        # Sin estadísticas: el máximo id se resuelve con el índice de la PK
+        result = await db.execute(select(func.max(User.id)))
+        return result.scalar() or 0
+
+    @staticmethod
+    async def get_users_version(db: AsyncSession) -> Tuple[int, Optional[datetime]]:
+        """(max id, its created_at): changes whenever a user is added.
+
+        Users are never updated or deleted, so this identifies the table
+        contents; the newest row is read through the primary key index.
+        """
+        result = await db.execute(
+            select(User.id, User.created_at).order_by(User.id.desc()).limit(1)
+        )
+        row = result.first()
+        return (row.id, row.created_at) if row is not None else (0, None)
+
+    @staticmethod
+    async def insert_user(db: AsyncSession, user: UserCreate) -> UserResponse:
+        """Insert one user (write operation; `run_write` commits)"""
+        db_user = User(username=user.username, email=user.email)
+        db.add(db_user)
+        await db.flush()
+        # created_at (default del servidor) con la misma conexión, antes del commit
+        await db.refresh(db_user)
+        return UserResponse.model_validate(db_user)
+
+    @staticmethod
+    async def bulk_create_users(items: List[Tuple[int, UserCreate]]) -> List[BulkUserResult]:
+        """Create many users in a single write operation.
+
+        `items` are `(index, user)` pairs; one result is returned per item.
+        """
+        results = []
+        unique = []
+        seen_usernames, seen_emails = set(), set()
+        for index, user in items:
+            if user.username in seen_usernames or user.email in seen_emails:
+                results.append(BulkUserResult(
+                    index=index, status="duplicate", error="Duplicated username or email in batch"
+                ))
+                continue
+            seen_usernames.add(user.username)
+            seen_emails.add(user.email)
+            unique.append((index, user))
+
+        # Un reintento si otro worker inserta los mismos valores entre medias
+        for attempt in range(2):
+            try:
+                created, conflicts = await run_write(
+                    lambda db: UserService._insert_new_users(db, unique)
+                )
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+
+        results.extend(created)
+        results.extend(conflicts)
+        results.sort(key=lambda result: result.index)
+        return results
+
+    @staticmethod
+    async def _insert_new_users(
+        db: AsyncSession,
+        items: List[Tuple[int, UserCreate]]
+    ) -> Tuple[List[BulkUserResult], List[BulkUserResult]]:
+        existing_usernames, existing_emails = set(), set()
+        for start in range(0, len(items), IN_CLAUSE_CHUNK):
+            chunk = [user for _, user in items[start:start + IN_CLAUSE_CHUNK]]
+            result = await db.execute(
+                select(User.username, User.email).where(or_(
+                    User.username.in_([user.username for user in chunk]),
+                    User.email.in_([user.email for user in chunk])
+                ))
+            )
+            for username, email in result:
+                existing_usernames.add(username)
+                existing_emails.add(email)
+
+        conflicts, pending = [], []
+        for index, user in items:
+            if user.username in existing_usernames or user.email in existing_emails:
+                conflicts.append(BulkUserResult(
+                    index=index, status="conflict", error="Username or email already exists"
+                ))
+            else:
+                pending.append((index, user))
+
+        if not pending:
+            return [], conflicts
+
+        rows = await db.execute(
+            insert(User).returning(User.id, User.username, User.email, User.created_at),
+            [{"username": user.username, "email": user.email} for _, user in pending]
+        )
+        created_by_username = {row.username: row for row in rows}
+        created = [
+            BulkUserResult(
+                index=index,
+                status="created",
+                user=UserResponse.model_validate(created_by_username[user.username])
+            )
+            for index, user in pending
+        ]
+        return created, conflicts
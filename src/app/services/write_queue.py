@@ -0,0 +1,177 @@
+"""
+Cola de escritura con un único escritor por worker y commit agrupado.
+
+Las operaciones se encolan como `op(session)`; el escritor toma todas las
+pendientes (hasta DB_WRITE_BATCH_MAX), ejecuta cada una en su propio SAVEPOINT
+sobre la conexión de escritura y hace un solo COMMIT (un solo fsync) para el
+lote. Si una operación falla sólo se deshace su SAVEPOINT y su llamador recibe
+la excepción; los resultados se entregan cuando el commit ha terminado.
+
+Sólo se usa con SQLite en fichero (un único escritor). Con Postgres y demás
+`run_write()` ejecuta cada operación en su propia sesión y transacción, con
+el pool completo, en lugar de serializar las escrituras del worker.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.config import settings
+from app.models.database import current_db_route, get_write_sessionmaker, uses_read_pool
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+logger = setup_logger(__name__)
+
+WriteOperation = Callable[[AsyncSession], Awaitable[Any]]
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Serialized writes that share one commit per batch"""
+
+    def __init__(
+        self,
+        maxsize: int = settings.db_write_queue_size,
+        max_batch: int = settings.db_write_batch_max,
+        batch_window: float = settings.db_write_batch_window
+    ):
+        self.max_batch = max(1, max_batch)
+        self.batch_window = batch_window
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.operations = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="db-writer")
+
+    async def stop(self):
+        """Run what is already queued, then stop the writer"""
+        if self._task is not None:
+            await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+
+    async def submit(self, operation: WriteOperation) -> Any:
+        """Queue `operation(session)` and return its result once committed"""
+        future = asyncio.get_running_loop().create_future()
+        # Cola llena: el llamador espera (backpressure) en lugar de acumular
+        await self._queue.put((operation, future))
+        return await future
+
+    async def _run(self):
+        # Los checkouts del escritor se cuentan aparte de los de cada ruta
+        current_db_route.set("writer")
+        while True:
+            item = await self._queue.get()
+            if item is _STOP:
+                return
+            if self.batch_window > 0:
+                await asyncio.sleep(self.batch_window)
+
+            batch = [item]
+            stop = False
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._commit_batch(batch)
+            if stop:
+                return
+
+    async def _commit_batch(self, batch: List[Tuple[WriteOperation, asyncio.Future]]):
+        # Los llamadores cancelados antes de empezar no se ejecutan
+        batch = [(operation, future) for operation, future in batch if not future.done()]
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        outcomes = []
+        try:
+            async with get_write_sessionmaker()() as session:
+                async with session.begin():
+                    for operation, future in batch:
+                        try:
+                            async with session.begin_nested():
+                                outcomes.append((future, await operation(session), None))
+                        except Exception as e:
+                            outcomes.append((future, None, e))
+        except Exception as e:
+            logger.error("Write batch of %s operation(s) failed: %s", len(batch), e)
+            NewRelicMonitor.record_custom_metric('Custom/Database/WriteQueue/FailedBatches', 1)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in outcomes:
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        self.batches += 1
+        self.operations += len(batch)
+        NewRelicMonitor.record_custom_metric('Custom/Database/WriteQueue/BatchSize', len(batch))
+        NewRelicMonitor.record_custom_metric('Custom/Database/WriteQueue/CommitTime', time.perf_counter() - start)
+        NewRelicMonitor.record_custom_metric('Custom/Database/WriteQueue/Depth', self._queue.qsize())
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "operations": self.operations,
+            "pending": self._queue.qsize(),
+        }
+
+
+_write_queue: Optional[WriteQueue] = None
+
+
+def start_write_queue(**kwargs) -> Optional[WriteQueue]:
+    """Create and start the writer for SQLite (called from the application lifespan)"""
+    global _write_queue
+    if _write_queue is None and uses_read_pool(settings.database_url):
+        _write_queue = WriteQueue(**kwargs)
+        _write_queue.start()
+    return _write_queue
+
+
+async def close_write_queue():
+    """Drain pending writes and stop the writer"""
+    global _write_queue
+    if _write_queue is not None:
+        await _write_queue.stop()
+        logger.info("Write queue stopped: %s", _write_queue.stats())
+        _write_queue = None
+
+
+def get_write_queue() -> WriteQueue:
+    """Return the shared write queue; the lifespan must have started it"""
+    if _write_queue is None:
+        raise RuntimeError("Write queue not started; is the application lifespan running?")
+    return _write_queue
+
+
+async def run_write(operation: WriteOperation) -> Any:
+    """Run `operation(session)` and commit it; raises the operation's exception.
+
+    Goes through the write queue when it is running (SQLite), otherwise uses
+    a session of its own so concurrent writes are not serialized.
+    """
+    if _write_queue is not None:
+        return await _write_queue.submit(operation)
+    async with get_write_sessionmaker()() as session:
+        async with session.begin():
+            return await operation(session)
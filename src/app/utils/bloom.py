@@ -0,0 +1,41 @@
+import hashlib
+import math
+from typing import Iterable
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    `in` may return false positives (bounded by `error_rate` up to `capacity`
+    items) but never false negatives, so a miss proves the value is new.
+    """
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value: str):
+        # Doble hashing (Kirsch-Mitzenmacher) a partir de un único digest
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, value: str):
+        for position in self._positions(value):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, values: Iterable[str]):
+        for value in values:
+            self.add(value)
+
+    def __contains__(self, value: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(value)
+        )
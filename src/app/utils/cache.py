@@ -0,0 +1,125 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU cache with per-entry TTL and coalescing of concurrent loads.
+
+    Not thread-safe: meant to be used from the event loop of a single worker.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value or `default`, counting the hit/miss"""
+        value = self._get(key)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store a value, evicting the least recently used entry if full"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        """Remove a single entry"""
+        self._data.pop(key, None)
+
+    def clear(self):
+        """Remove every entry"""
+        self._data.clear()
+
+    async def lookup(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Tuple[Any, str]:
+        """Return `(value, outcome)` where outcome is hit, miss or coalesced.
+
+        Concurrent misses for the same key share a single `loader()` call.
+        """
+        value = self._get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value, "hit"
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending), "coalesced"
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Evitar el aviso "exception was never retrieved" si nadie esperaba
+            future.exception()
+            raise
+        else:
+            self.set(key, value, ttl)
+            future.set_result(value)
+        finally:
+            self._inflight.pop(key, None)
+        return value, "miss"
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None
+    ) -> Any:
+        """Return the cached value, loading it with `loader()` on a miss"""
+        value, _ = await self.lookup(key, loader, ttl)
+        return value
+
+    def stats(self) -> dict:
+        """Current counters of the cache"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
+
+    def _get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
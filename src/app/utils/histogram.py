@@ -0,0 +1,147 @@
+"""
+Histogramas de latencia por ruta con buckets logarítmicos fijos.
+
+Cada serie (método, plantilla de ruta, clase de estado) ocupa una lista de
+contadores de tamaño fijo y el número de series está acotado, así que la
+memoria no crece con el tráfico. Sin locks: cada worker actualiza sus
+contadores desde su event loop y los demás procesos sólo leen snapshots.
+"""
+import math
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Límites superiores (segundos): factor √2 desde 0.25 ms hasta ~60 s
+LATENCY_BUCKETS: Tuple[float, ...] = tuple(
+    round(0.00025 * math.sqrt(2) ** i, 6) for i in range(37)
+)
+
+# Series de reserva cuando se alcanza el máximo (rutas nuevas se agrupan)
+OVERFLOW_ROUTE = "other"
+
+SeriesKey = Tuple[str, str, str]
+
+
+def status_class(status_code: int) -> str:
+    return f"{status_code // 100}xx"
+
+
+class LatencyHistogram:
+    """Counts per bucket (plus +Inf), total count and sum of observations"""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self, counts: Optional[List[int]] = None, count: int = 0, total: float = 0.0):
+        self.counts = counts if counts is not None else [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = count
+        self.sum = total
+
+    def observe(self, seconds: float):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        self.count += other.count
+        self.sum += other.sum
+
+    def minus(self, previous: Optional["LatencyHistogram"]) -> "LatencyHistogram":
+        """Observations made since `previous` (a copy taken earlier)"""
+        if previous is None:
+            return self.copy()
+        return LatencyHistogram(
+            [now - before for now, before in zip(self.counts, previous.counts)],
+            self.count - previous.count,
+            self.sum - previous.sum
+        )
+
+    def copy(self) -> "LatencyHistogram":
+        return LatencyHistogram(list(self.counts), self.count, self.sum)
+
+    def percentile(self, percent: float) -> float:
+        """Upper bound of the bucket holding the given percentile.
+
+        Observations beyond the last bucket report the last bound.
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(percent / 100 * self.count))
+        cumulative = 0
+        for index, value in enumerate(self.counts[:-1]):
+            cumulative += value
+            if cumulative >= rank:
+                return LATENCY_BUCKETS[index]
+        return LATENCY_BUCKETS[-1]
+
+    def to_list(self) -> list:
+        return [self.counts, self.count, self.sum]
+
+    @classmethod
+    def from_list(cls, data: list) -> "LatencyHistogram":
+        counts, count, total = data
+        return cls(list(counts), count, total)
+
+
+class RouteLatencyRegistry:
+    """Bounded set of latency histograms keyed by (method, route, status class)"""
+
+    def __init__(self, max_series: int = 1000):
+        self.max_series = max_series
+        self.series: Dict[SeriesKey, LatencyHistogram] = {}
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float):
+        key = (method, route, status_class(status_code))
+        histogram = self.series.get(key)
+        if histogram is None:
+            if len(self.series) >= self.max_series:
+                key = ("OTHER", OVERFLOW_ROUTE, key[2])
+                histogram = self.series.get(key)
+            if histogram is None:
+                histogram = self.series[key] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def snapshot(self) -> Dict[str, list]:
+        """Serializable copy of every series ("method route status" -> data)"""
+        return {" ".join(key): histogram.to_list() for key, histogram in self.series.items()}
+
+    def copy(self) -> Dict[SeriesKey, LatencyHistogram]:
+        return {key: histogram.copy() for key, histogram in self.series.items()}
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, list]]) -> Dict[SeriesKey, LatencyHistogram]:
+    merged: Dict[SeriesKey, LatencyHistogram] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            key = tuple(name.split(" ", 2))
+            histogram = LatencyHistogram.from_list(data)
+            if key in merged:
+                merged[key].merge(histogram)
+            else:
+                merged[key] = histogram
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_prometheus(
+    series: Dict[SeriesKey, LatencyHistogram],
+    name: str = "http_request_duration_seconds"
+) -> str:
+    """Prometheus text exposition format (cumulative buckets)"""
+    lines = [
+        f"# HELP {name} Request latency by route template and status class",
+        f"# TYPE {name} histogram",
+    ]
+    for (method, route, status), histogram in sorted(series.items()):
+        labels = f'method="{_escape(method)}",route="{_escape(route)}",status="{status}"'
+        cumulative = 0
+        for bound, value in zip(LATENCY_BUCKETS, histogram.counts):
+            cumulative += value
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
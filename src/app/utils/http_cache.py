@@ -0,0 +1,61 @@
+import hashlib
+import json
+from typing import Any, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+def make_etag(body: bytes, weak: bool = False) -> str:
+    """ETag from the content hash (weak for semantically equivalent bodies)"""
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return f"W/{etag}" if weak else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluate an If-None-Match header (weak comparison, RFC 9110)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str, cache_control: str = "no-cache") -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+class PrecomputedResponse:
+    """Body serialized once, served as bytes with ETag / 304 support"""
+
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str = "application/json",
+        cache_control: str = "no-cache"
+    ):
+        self.body = body
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = make_etag(body)
+
+    @classmethod
+    def from_json(cls, content: Any, **kwargs) -> "PrecomputedResponse":
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        return cls(body, media_type="application/json", **kwargs)
+
+    def response(self, request: Request) -> Response:
+        if etag_matches(request.headers.get("if-none-match"), self.etag):
+            return not_modified(self.etag, self.cache_control)
+        return Response(
+            content=self.body,
+            media_type=self.media_type,
+            headers={"ETag": self.etag, "Cache-Control": self.cache_control}
+        )
@@ -0,0 +1,72 @@
+"""
+Serialización JSON rápida para las respuestas de la API.
+
+Usa orjson si está instalado (datetime, UUID y dataclasses nativos) y si no
+json de la stdlib con los mismos tipos soportados. Los modelos pydantic se
+vuelcan con `model_dump()` sin volver a validarse.
+"""
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - depende del entorno
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def _default(obj: Any) -> Any:
+    """Types orjson does not serialize natively"""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, Decimal):
+        return str(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _stdlib_default(obj: Any) -> Any:
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, UUID):
+        return str(obj)
+    return _default(obj)
+
+
+def stdlib_dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes with the standard library"""
+    return json.dumps(
+        obj,
+        default=_stdlib_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def orjson_dumps(obj: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON bytes with orjson"""
+    return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+dumps = orjson_dumps if orjson is not None else stdlib_dumps
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`.
+
+    Used app-wide as the default response class. Endpoints that already hold
+    validated models (or rows with the response schema fields) can return it
+    directly to skip FastAPI's response-model validation and encoding.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,17 +1,248 @@
+"""
+Logging estructurado y no bloqueante.
+
+Todos los loggers de la aplicación comparten un `QueueHandler`: el hilo que
+registra sólo resuelve el mensaje (`msg % args`) y el traceback, para no
+retener objetos mutables ni frames, y encola el `LogRecord`; un hilo en
+segundo plano le da formato (JSON con trace.id/span.id de NewRelic, o texto)
+y lo escribe en stdout. Si la cola se llena el mensaje se descarta en lugar de
+bloquear el event loop.
+
+Los mensajes por debajo de WARNING pueden muestrearse por logger
+(LOG_SAMPLE_RATES) y se limitan por plantilla de mensaje (LOG_RATE_LIMIT /
+LOG_RATE_BURST). Usar argumentos `%s` en lugar de f-strings para que el
+formateo ocurra sólo si el mensaje llega a escribirse.
+"""
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from app.config.config import settings
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Atributos estándar de LogRecord (el resto son `extra=` del usuario)
+_RECORD_ATTRIBUTES = frozenset(
+    logging.LogRecord("", 0, "", 0, "", (), None).__dict__
+) | {"message", "asctime", "trace.id", "span.id"}
+
+_stats = {"dropped": 0, "sampled_out": 0, "rate_limited": 0}
+
+# Tope de plantillas con cubo propio (los mensajes con f-string crean una cada uno)
+MAX_RATE_BUCKETS = 4096
+
+
+def parse_sample_rates(value: str) -> Dict[str, float]:
+    """Parse "logger=fraction,..." into {logger: fraction}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, rate = item.partition("=")
+        rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with NewRelic logs-in-context keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "timestamp": int(record.created * 1000),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key in ("trace.id", "span.id"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["error.class"] = record.exc_info[0].__name__
+            entry["error.message"] = str(record.exc_info[1])
+            entry["error.stack"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            # Traceback ya renderizado por NonBlockingQueueHandler.prepare
+            entry["error.stack"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class HotPathFilter(logging.Filter):
+    """Sampling per logger and token-bucket rate limiting per message template.
+
+    WARNING and above always pass. Counters are approximate when several
+    threads log at once (no lock on the hot path).
+    """
+
+    def __init__(
+        self,
+        sample_rates: Optional[Dict[str, float]] = None,
+        rate_limit: float = settings.log_rate_limit,
+        burst: int = settings.log_rate_burst
+    ):
+        super().__init__()
+        self.sample_rates = sample_rates or {}
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self._rate_by_logger: Dict[str, float] = {}
+        self._buckets: Dict[Tuple[str, str], list] = {}
+
+    def _sample_rate(self, name: str) -> float:
+        rate = self._rate_by_logger.get(name)
+        if rate is None:
+            # La regla más específica (prefijo más largo) gana
+            rate = 1.0
+            matches = [
+                prefix for prefix in self.sample_rates
+                if name == prefix or name.startswith(prefix + ".")
+            ]
+            if matches:
+                rate = self.sample_rates[max(matches, key=len)]
+            self._rate_by_logger[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self._sample_rate(record.name)
+        if rate < 1.0 and random.random() >= rate:
+            _stats["sampled_out"] += 1
+            return False
+
+        if self.rate_limit <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.name, str(record.msg))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= MAX_RATE_BUCKETS:
+                self._buckets.clear()
+            bucket = self._buckets[key] = [float(self.burst), now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate_limit)
+        bucket[1] = now
+        if tokens < 1:
+            bucket[0] = tokens
+            _stats["rate_limited"] += 1
+            return False
+        bucket[0] = tokens - 1
+        return True
+
+
+class TraceContextFilter(logging.Filter):
+    """Attach the current NewRelic trace/span ids (runs in the caller, before enqueuing)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        # Sólo si el agente ya está cargado: no forzar su importación
+        agent = sys.modules.get("newrelic.agent")
+        if agent is not None:
+            try:
+                setattr(record, "trace.id", agent.current_trace_id())
+                setattr(record, "span.id", agent.current_span_id())
+            except Exception:
+                pass
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks; only the final formatting is deferred"""
+
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Como QueueHandler.prepare: args mutables y tracebacks (que mantienen vivos
+        # los frames) se resuelven aquí, no cuando el hilo escritor llegue a leerlos
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            exc_type, exc_value, _ = record.exc_info
+            if exc_type is not None:
+                setattr(record, "error.class", exc_type.__name__)
+                setattr(record, "error.message", str(exc_value))
+                record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _stats["dropped"] += 1
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def _build_output_handler() -> logging.Handler:
+    output = logging.StreamHandler(sys.stdout)
+    if settings.log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+    return output
+
+
+def _start_listener():
+    global _listener
+    _listener = QueueListener(_handler.queue, _build_output_handler())
+    _listener.start()
+
+
+def _get_handler() -> NonBlockingQueueHandler:
+    global _handler
+    if _handler is None:
+        _handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+        _handler.addFilter(HotPathFilter(parse_sample_rates(settings.log_sample_rates)))
+        _handler.addFilter(TraceContextFilter())
+        _start_listener()
+        atexit.register(stop_logging)
+    return _handler
+
+
+def _restart_after_fork():
+    # El hilo escritor no sobrevive al fork: cola y listener nuevos en el hijo
+    if _handler is not None:
+        _handler.queue = queue.Queue(maxsize=settings.log_queue_size)
+        _start_listener()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def stop_logging():
+    """Write the pending records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        # Bloqueante a propósito: el centinela no puede perderse con la cola llena
+        listener.queue.put(listener._sentinel)
+        listener._thread.join()
+        listener._thread = None
+
+
+def get_log_stats() -> dict:
+    """Records dropped (queue full), sampled out and rate limited so far"""
+    return dict(_stats)
+
 
 def setup_logger(name: str) -> logging.Logger:
     """Setup logger with consistent formatting"""
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
+    logger.setLevel(settings.log_level)
 
     if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+        logger.addHandler(_get_handler())
 
     return logger
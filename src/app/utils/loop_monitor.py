@@ -0,0 +1,93 @@
+"""
+Medición del retraso (lag) del event loop.
+
+Una tarea duerme LOOP_LAG_INTERVAL segundos y mide cuánto tarda de más en
+despertar: cualquier trabajo bloqueante en el loop (E/S síncrona, CPU) aparece
+como lag para todas las peticiones del worker. Los percentiles se envían como
+Custom/EventLoopLag/* cada LOOP_LAG_REPORT_INTERVAL segundos y el último valor
+lo consulta el limitador de concurrencia como señal de sobrecarga.
+"""
+import asyncio
+from typing import Optional
+
+from app.config.config import settings
+from app.utils.histogram import LATENCY_BUCKETS, LatencyHistogram
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+logger = setup_logger(__name__)
+
+REPORTED_PERCENTILES = (50, 95, 99)
+
+
+class EventLoopLagMonitor:
+    """Periodic sleep that measures how late the event loop wakes up"""
+
+    def __init__(
+        self,
+        interval: float = settings.loop_lag_interval,
+        report_interval: float = settings.loop_lag_report_interval
+    ):
+        self.interval = interval
+        self.report_interval = report_interval
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._histogram = LatencyHistogram()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="event-loop-lag")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.report()
+
+    def observe(self, lag: float):
+        self.lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        self._histogram.observe(lag)
+
+    def report(self) -> dict:
+        """Send the percentiles of the last interval and start a new one"""
+        histogram, self._histogram = self._histogram, LatencyHistogram()
+        if not histogram.count:
+            return {}
+        summary = {f"p{percent}": histogram.percentile(percent) for percent in REPORTED_PERCENTILES}
+        # El bucket inferior es un límite superior: por debajo de él el lag es despreciable
+        summary = {name: 0.0 if value <= LATENCY_BUCKETS[0] else value for name, value in summary.items()}
+        summary["max"] = self.max_lag
+        self.max_lag = 0.0
+        for name, value in summary.items():
+            NewRelicMonitor.record_custom_metric(f'Custom/EventLoopLag/{name}', value)
+        return summary
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_report = loop.time() + self.report_interval
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            now = loop.time()
+            self.observe(max(0.0, now - expected))
+            if now >= next_report:
+                next_report = now + self.report_interval
+                self.report()
+
+
+loop_lag_monitor = EventLoopLagMonitor()
+
+
+def start_loop_lag_monitor():
+    """Start the lag sampler (called from the application lifespan)"""
+    loop_lag_monitor.start()
+
+
+async def stop_loop_lag_monitor():
+    await loop_lag_monitor.stop()
@@ -1,8 +1,23 @@
-import newrelic.agent
+from contextvars import ContextVar
+from typing import Optional
 from app.utils.logger import setup_logger
+from app.utils.telemetry import metric_aggregator
 
 logger = setup_logger(__name__)
 
+# Atributos pendientes de la transacción en curso (se envían en un solo lote)
+_pending_attributes: ContextVar[Optional[dict]] = ContextVar('newrelic_pending_attributes', default=None)
+
+_newrelic_agent = None
+
+def _agent():
+    """Importar el agente solo cuando NewRelic está activo (ya cargado en ese caso)"""
+    global _newrelic_agent
+    if _newrelic_agent is None:
+        import newrelic.agent
+        _newrelic_agent = newrelic.agent
+    return _newrelic_agent
+
 # Variable global para controlar si NewRelic está activo
 NEWRELIC_ENABLED = False
 
@@ -16,16 +31,15 @@ class NewRelicMonitor:
     """Wrapper para monitoreo con NewRelic usando API actual"""
 
     @staticmethod
-    def record_custom_metric(name: str, value: float):
-        """Registrar métrica personalizada"""
-        if not NEWRELIC_ENABLED:
-            return
+    def is_enabled() -> bool:
+        """Indicar si NewRelic está activo"""
+        return NEWRELIC_ENABLED
 
-        try:
-            newrelic.agent.record_custom_metric(name, value)
-            logger.debug(f"Metric recorded: {name} = {value}")
-        except Exception as e:
-            logger.warning(f"Failed to record metric {name}: {e}")
+    @staticmethod
+    def record_custom_metric(name: str, value: float):
+        """Registrar métrica personalizada (agregada en proceso, enviada por lotes)"""
+        if NEWRELIC_ENABLED:
+            metric_aggregator.record(name, value)
 
     @staticmethod
     def record_custom_event(event_type: str, params: dict):
@@ -34,10 +48,10 @@ class NewRelicMonitor:
             return
 
         try:
-            newrelic.agent.record_custom_event(event_type, params)
-            logger.debug(f"Event recorded: {event_type}")
+            _agent().record_custom_event(event_type, params)
+            logger.debug("Event recorded: %s", event_type)
         except Exception as e:
-            logger.warning(f"Failed to record event {event_type}: {e}")
+            logger.warning("Failed to record event %s: %s", event_type, e)
 
     @staticmethod
     def notice_error(exception: Exception, params: dict = None):
@@ -49,15 +63,15 @@ class NewRelicMonitor:
             # Para la versión actual de NewRelic
             if params:
                 # Agregar atributos al error
-                transaction = newrelic.agent.current_transaction()
+                transaction = _agent().current_transaction()
                 if transaction:
                     for key, value in params.items():
                         transaction.add_custom_attribute(key, value)
 
-            newrelic.agent.notice_error(exception)
-            logger.debug(f"Error recorded: {type(exception).__name__}")
+            _agent().notice_error(exception)
+            logger.debug("Error recorded: %s", type(exception).__name__)
         except Exception as e:
-            logger.warning(f"Failed to record error: {e}")
+            logger.warning("Failed to record error: %s", e)
 
     @staticmethod
     def add_custom_attribute(key: str, value: str):
@@ -65,15 +79,40 @@ class NewRelicMonitor:
         if not NEWRELIC_ENABLED:
             return
 
+        pending = _pending_attributes.get()
+        if pending is not None:
+            pending[key] = value
+            return
+
         try:
-            transaction = newrelic.agent.current_transaction()
+            transaction = _agent().current_transaction()
             if transaction:
                 transaction.add_custom_attribute(key, value)
-                logger.debug(f"Attribute added: {key} = {value}")
-            else:
-                logger.debug("No active transaction for attribute")
         except Exception as e:
-            logger.warning(f"Failed to add attribute {key}: {e}")
+            logger.warning("Failed to add attribute %s: %s", key, e)
+
+    @staticmethod
+    def begin_attribute_batch():
+        """Acumular los atributos de la petición actual hasta `flush_attribute_batch`"""
+        if NEWRELIC_ENABLED:
+            return _pending_attributes.set({})
+        return None
+
+    @staticmethod
+    def flush_attribute_batch(token=None):
+        """Enviar los atributos acumulados en una sola llamada a la transacción"""
+        pending = _pending_attributes.get()
+        if token is not None:
+            _pending_attributes.reset(token)
+        if not pending:
+            return
+
+        try:
+            transaction = _agent().current_transaction()
+            if transaction:
+                transaction.add_custom_attributes(pending.items())
+        except Exception as e:
+            logger.warning("Failed to add %d attributes: %s", len(pending), e)
 
     @staticmethod
     def set_transaction_name(name: str):
@@ -82,9 +121,28 @@ class NewRelicMonitor:
             return
 
         try:
-            transaction = newrelic.agent.current_transaction()
+            transaction = _agent().current_transaction()
             if transaction:
                 transaction.name = name
-                logger.debug(f"Transaction name set: {name}")
         except Exception as e:
-            logger.warning(f"Failed to set transaction name: {e}")
+            logger.warning("Failed to set transaction name: %s", e)
+
+    @staticmethod
+    def record_cache_event(cache_name: str, outcome: str):
+        """Registrar un acceso a caché (hit, miss o coalesced)"""
+        NewRelicMonitor.record_custom_metric(f'Custom/Cache/{cache_name}/{outcome.capitalize()}', 1)
+        # 1 por acierto y 0 por fallo: la media del intervalo es el hit ratio
+        NewRelicMonitor.record_custom_metric(
+            f'Custom/Cache/{cache_name}/HitRatio', 1 if outcome == "hit" else 0
+        )
+
+    @staticmethod
+    def record_cache_stats(cache_name: str, stats: dict):
+        """Registrar los contadores acumulados de una caché"""
+        for key, value in stats.items():
+            NewRelicMonitor.record_custom_metric(f'Custom/Cache/{cache_name}/Total/{key.capitalize()}', value)
+        lookups = stats.get("hits", 0) + stats.get("misses", 0) + stats.get("coalesced", 0)
+        if lookups:
+            NewRelicMonitor.record_custom_metric(
+                f'Custom/Cache/{cache_name}/Total/HitRatio', stats.get("hits", 0) / lookups
+            )
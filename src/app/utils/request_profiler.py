@@ -0,0 +1,230 @@
+"""
+Profiler por muestreo para peticiones lentas (opt-in con PROFILER_ENABLED).
+
+Un hilo en segundo plano toma, PROFILER_HZ veces por segundo, la pila de cada
+petición en curso: la del hilo del event loop si su tarea es la que se está
+ejecutando, o la cadena de corrutinas suspendidas (terminada en `[awaiting]`)
+si está esperando E/S. Así el perfil es de tiempo real, no sólo de CPU.
+
+Al terminar la petición las muestras se descartan salvo que haya superado
+PROFILER_THRESHOLD_MS o traiga la cabecera de depuración; en ese caso se
+acumulan por ruta en formato "collapsed" (flamegraph.pl, speedscope) y las
+funciones con más muestras se devuelven para adjuntarlas a la transacción.
+"""
+import asyncio
+import sys
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from app.config.config import settings
+from app.utils.logger import setup_logger
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+logger = setup_logger(__name__)
+
+AWAITING_FRAME = "[awaiting]"
+TRUNCATED_STACK = ("[truncated]",)
+MAX_STACK_DEPTH = 64
+
+Stack = Tuple[str, ...]
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', '?')}.{code.co_qualname}".replace(";", ",")
+
+
+def _running_stack(frame, root_frame) -> Optional[Stack]:
+    """Frames of the running task, from its coroutine down to the current one"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_frame_label(frame))
+        if frame is root_frame:
+            return tuple(reversed(labels))
+        frame = frame.f_back
+    return None
+
+
+def _suspended_stack(coro) -> Stack:
+    """Chain of awaiting coroutines of a suspended task"""
+    labels = []
+    while coro is not None and len(labels) < MAX_STACK_DEPTH:
+        frame = (
+            getattr(coro, "cr_frame", None)
+            or getattr(coro, "gi_frame", None)
+            or getattr(coro, "ag_frame", None)
+        )
+        if frame is None:
+            break
+        labels.append(_frame_label(frame))
+        coro = (
+            getattr(coro, "cr_await", None)
+            or getattr(coro, "gi_yieldfrom", None)
+            or getattr(coro, "ag_await", None)
+        )
+    labels.append(AWAITING_FRAME)
+    return tuple(labels)
+
+
+class RequestSamples:
+    """Stacks sampled for one in-flight request"""
+
+    __slots__ = ("task", "forced", "stacks", "count")
+
+    def __init__(self, task: asyncio.Task, forced: bool):
+        self.task = task
+        self.forced = forced
+        self.stacks: Counter = Counter()
+        self.count = 0
+
+    def top_frames(self, limit: int) -> List[Tuple[str, float]]:
+        """Leaf functions with the most samples, as (label, share)"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            # En una espera se atribuye a la función que espera, no al marcador
+            leaf = stack[-2] if stack[-1] == AWAITING_FRAME and len(stack) > 1 else stack[-1]
+            leaves[leaf] += count
+        return [(label, count / self.count) for label, count in leaves.most_common(limit)]
+
+
+class RequestProfiler:
+    """Background stack sampler for slow or explicitly flagged requests"""
+
+    def __init__(
+        self,
+        hz: float = settings.profiler_hz,
+        threshold: float = settings.profiler_threshold_ms / 1000,
+        debug_header: str = settings.profiler_debug_header,
+        max_active: int = settings.profiler_max_active,
+        max_stacks: int = settings.profiler_max_stacks,
+        top_frames: int = settings.profiler_top_frames
+    ):
+        self.interval = 1 / hz
+        self.threshold = threshold
+        self.debug_header = debug_header.lower().encode("latin-1")
+        self.max_active = max_active
+        self.max_stacks = max_stacks
+        self.top_frames = top_frames
+        self.routes: Dict[str, Counter] = {}
+        self.profiled_requests: Counter = Counter()
+        self._active: Dict[asyncio.Task, RequestSamples] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        """Start sampling the current event loop (called from the lifespan)"""
+        if self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._active.clear()
+
+    def begin(self, scope) -> Optional[RequestSamples]:
+        """Start collecting samples for the current request task"""
+        if self._thread is None or len(self._active) >= self.max_active:
+            return None
+        task = asyncio.current_task()
+        if task is None:
+            return None
+        forced = any(name == self.debug_header for name, _ in scope.get("headers", ()))
+        samples = self._active[task] = RequestSamples(task, forced)
+        return samples
+
+    def finish(self, samples: RequestSamples, route: str, seconds: float) -> List[Tuple[str, float]]:
+        """Keep the samples of a slow/flagged request; returns its top frames"""
+        self._active.pop(samples.task, None)
+        if not samples.count or not (samples.forced or seconds >= self.threshold):
+            return []
+
+        stacks = self.routes.get(route)
+        if stacks is None:
+            stacks = self.routes[route] = Counter()
+        for stack, count in list(samples.stacks.items()):
+            # Número de pilas distintas acotado por ruta
+            if stack not in stacks and len(stacks) >= self.max_stacks:
+                stack = TRUNCATED_STACK
+            stacks[stack] += count
+        self.profiled_requests[route] += 1
+        NewRelicMonitor.record_custom_metric('Custom/Profiler/ProfiledRequests', 1)
+        NewRelicMonitor.record_custom_metric('Custom/Profiler/Samples', samples.count)
+        return samples.top_frames(self.top_frames)
+
+    def collapsed(self, route: Optional[str] = None) -> str:
+        """Aggregated stacks in collapsed format, with the route as root frame"""
+        lines = []
+        for name, stacks in sorted(self.routes.items()):
+            if route is not None and name != route:
+                continue
+            for stack, count in stacks.most_common():
+                lines.append(f"{name};{';'.join(stack)} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def reset(self):
+        self.routes.clear()
+        self.profiled_requests.clear()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if not self._active:
+                continue
+            try:
+                self._sample()
+            except Exception as e:
+                logger.warning("Profiler sample failed: %s", e)
+
+    def _sample(self):
+        loop_frame = sys._current_frames().get(self._loop_thread)
+        current = asyncio.current_task(self._loop)
+        for task, samples in list(self._active.items()):
+            if task.done():
+                continue
+            coro = task.get_coro()
+            if task is current and loop_frame is not None:
+                stack = _running_stack(loop_frame, getattr(coro, "cr_frame", None))
+            else:
+                stack = _suspended_stack(coro)
+            if stack:
+                samples.stacks[stack] += 1
+                samples.count += 1
+
+
+request_profiler = RequestProfiler()
+
+
+def start_request_profiler():
+    """Start the sampler if PROFILER_ENABLED (called from the lifespan)"""
+    if settings.profiler_enabled:
+        request_profiler.start()
+        logger.info(
+            "Request profiler sampling at %s Hz (threshold %s ms)",
+            settings.profiler_hz, settings.profiler_threshold_ms
+        )
+
+
+def stop_request_profiler():
+    request_profiler.stop()
+
+
+def profile_attributes(top_frames: List[Tuple[str, float]], forced: bool) -> Dict[str, str]:
+    """Custom attributes for the transaction of a profiled request"""
+    attributes = {"profile.reason": "header" if forced else "threshold"}
+    for rank, (label, share) in enumerate(top_frames, start=1):
+        # Los atributos de NewRelic se truncan a 255 caracteres
+        attributes[f"profile.frame.{rank}"] = f"{share:.0%} {label}"[:255]
+    return attributes
@@ -0,0 +1,126 @@
+"""
+Primitivas de resiliencia para llamadas salientes.
+
+- CircuitBreaker: se abre tras N fallos consecutivos, rechaza llamadas durante
+  `recovery_time` y luego deja pasar un número limitado de sondas (half-open).
+- backoff_delay: backoff exponencial con "full jitter".
+- hedged: lanza una segunda petición si la primera tarda más que `delay` y se
+  queda con la primera respuesta correcta.
+
+Todo se usa desde el event loop de un worker, sin locks.
+"""
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.utils.newrelic_monitor import NewRelicMonitor
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with half-open probing"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_time: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.half_open_max_calls = half_open_max_calls
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed (0 when not open)"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.recovery_time - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may go out now (reserves a probe when half-open)"""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                NewRelicMonitor.record_custom_metric(f'Custom/CircuitBreaker/{self.name}/Rejected', 1)
+                return False
+            self._transition(HALF_OPEN)
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_max_calls:
+                NewRelicMonitor.record_custom_metric(f'Custom/CircuitBreaker/{self.name}/Rejected', 1)
+                return False
+            self._probes += 1
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        if self.state != CLOSED:
+            self._transition(CLOSED)
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == OPEN:
+            # Llamadas que salieron antes de abrir el circuito
+            return
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._transition(OPEN)
+
+    def _transition(self, state: str):
+        if state == self.state:
+            return
+        self.state = state
+        self._probes = 0
+        NewRelicMonitor.record_custom_metric(f'Custom/CircuitBreaker/{self.name}/{state.title().replace("_", "")}', 1)
+        NewRelicMonitor.add_custom_attribute(f'circuit_{self.name}', state)
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "retry_after": round(self.retry_after(), 3)}
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """Full jitter: uniform in [0, min(maximum, base * 2**attempt)]"""
+    return random.uniform(0, min(maximum, base * 2 ** attempt))
+
+
+async def hedged(call: Callable[[], Awaitable[T]], delay: Optional[float], on_hedge=None) -> T:
+    """Run `call()`; if it has not finished after `delay`, race a second one.
+
+    The first successful result wins and the other attempt is cancelled. If
+    both fail, the last error is raised. `delay` None or <= 0 disables hedging.
+    """
+    if not delay or delay <= 0:
+        return await call()
+
+    first = asyncio.ensure_future(call())
+    pending = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        if on_hedge is not None:
+            on_hedge()
+        pending = {first, asyncio.ensure_future(call())}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        # También si nos cancelan (p. ej. al agotar el deadline)
+        for task in pending:
+            task.cancel()
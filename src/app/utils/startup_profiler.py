@@ -0,0 +1,105 @@
+"""
+Perfil del arranque: coste de importación por paquete y duración de cada
+fase del lifespan.
+
+El temporizador de imports envuelve `builtins.__import__` solo durante el
+arranque; se retira al terminar, así que no añade coste a las peticiones.
+Este módulo no importa nada pesado para poder instalarse antes que el resto.
+"""
+import builtins
+import os
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+class StartupProfiler:
+    """Import self-time per top-level package and per-phase startup timings"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.imports: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self._stack: List[float] = []
+        self._original_import = None
+
+    def install_import_timer(self):
+        """Start timing imports (disabled with STARTUP_PROFILING=False)"""
+        if self._original_import is not None:
+            return
+        if os.getenv("STARTUP_PROFILING", "True").lower() != "true":
+            return
+        original_import = builtins.__import__
+        self._original_import = original_import
+        stack = self._stack
+        imports = self.imports
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            # Solo se mide la primera importación absoluta de cada módulo
+            if level or name in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                imports[name] = imports.get(name, 0.0) + elapsed - children
+
+        builtins.__import__ = timed_import
+
+    def uninstall_import_timer(self):
+        if self._original_import is None:
+            return
+        if getattr(builtins.__import__, "__name__", "") == "timed_import":
+            builtins.__import__ = self._original_import
+        self._original_import = None
+
+    @contextmanager
+    def phase(self, name: str):
+        """Measure a startup phase (usable inside the async lifespan)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def finish(self):
+        """Mark the end of startup and stop timing imports"""
+        self.finished_at = time.perf_counter()
+        self.uninstall_import_timer()
+
+    def imports_by_package(self, limit: int = 15) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for name, seconds in self.imports.items():
+            package = name.partition(".")[0]
+            totals[package] = totals.get(package, 0.0) + seconds
+        ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)
+        return dict(ranked[:limit])
+
+    def report(self) -> dict:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        return {
+            "total_seconds": round(end - self.started_at, 4),
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "imports": {name: round(seconds, 4) for name, seconds in self.imports_by_package().items()},
+        }
+
+    def emit_metrics(self):
+        """Registrar el informe como métricas Custom/Startup/*"""
+        from app.utils.newrelic_monitor import NewRelicMonitor
+
+        report = self.report()
+        NewRelicMonitor.record_custom_metric('Custom/Startup/Total', report["total_seconds"])
+        for name, seconds in report["phases"].items():
+            NewRelicMonitor.record_custom_metric(f'Custom/Startup/Phase/{name}', seconds)
+        for name, seconds in report["imports"].items():
+            NewRelicMonitor.record_custom_metric(f'Custom/Startup/Import/{name}', seconds)
+
+
+startup_profiler = StartupProfiler()
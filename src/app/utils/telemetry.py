@@ -0,0 +1,104 @@
+"""
+Agregación en proceso de métricas personalizadas para NewRelic.
+
+Las métricas se acumulan por worker en un diccionario (count, total, min, max,
+sum_of_squares) y una tarea en segundo plano las envía al agente en bloque.
+"""
+import asyncio
+from typing import Dict, List, Optional
+
+from app.config.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Índices de la lista de estadísticas de cada métrica
+_COUNT, _TOTAL, _MIN, _MAX, _SUM_OF_SQUARES = range(5)
+
+
+class MetricAggregator:
+    """Per-worker metric summaries, drained in bulk by the flusher.
+
+    There is no lock: `record` runs on the event loop and `drain` swaps the
+    whole dictionary, so the hot path is a dictionary lookup and update.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, List[float]] = {}
+
+    def record(self, name: str, value: float):
+        stats = self._metrics.get(name)
+        if stats is None:
+            self._metrics[name] = [1, value, value, value, value * value]
+            return
+        stats[_COUNT] += 1
+        stats[_TOTAL] += value
+        if value < stats[_MIN]:
+            stats[_MIN] = value
+        if value > stats[_MAX]:
+            stats[_MAX] = value
+        stats[_SUM_OF_SQUARES] += value * value
+
+    def drain(self) -> Dict[str, dict]:
+        """Return the accumulated summaries and start a new interval"""
+        metrics, self._metrics = self._metrics, {}
+        return {
+            name: {
+                "count": stats[_COUNT],
+                "total": stats[_TOTAL],
+                "min": stats[_MIN],
+                "max": stats[_MAX],
+                "sum_of_squares": stats[_SUM_OF_SQUARES],
+            }
+            for name, stats in metrics.items()
+        }
+
+
+metric_aggregator = MetricAggregator()
+
+
+def flush_metrics() -> int:
+    """Send the accumulated summaries to the agent; returns how many"""
+    metrics = metric_aggregator.drain()
+    if not metrics:
+        return 0
+    try:
+        import newrelic.agent
+
+        newrelic.agent.record_custom_metrics(
+            metrics.items(),
+            application=newrelic.agent.application()
+        )
+    except Exception as e:
+        logger.warning(f"Failed to flush {len(metrics)} metrics: {e}")
+    return len(metrics)
+
+
+async def _flush_loop(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        flush_metrics()
+
+
+_flush_task: Optional[asyncio.Task] = None
+
+
+def start_telemetry(interval: float = settings.telemetry_flush_interval):
+    """Start the background flusher (called from the application lifespan)"""
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop(interval), name="telemetry-flush")
+        logger.info(f"Telemetry flusher started (every {interval}s)")
+
+
+async def stop_telemetry():
+    """Stop the flusher and send whatever is still pending"""
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        try:
+            await _flush_task
+        except asyncio.CancelledError:
+            pass
+        _flush_task = None
+    flush_metrics()
@@ -0,0 +1,14 @@
+"""
+Worker de gunicorn para server.py.
+
+Vive en un módulo importable: gunicorn resuelve `worker_class` por nombre y,
+si la clase estuviera en el script lanzado con `python server.py`, lo
+importaría otra vez como un módulo `server` distinto, con sus propios globals.
+"""
+from uvicorn.workers import UvicornWorker
+
+
+class AppUvicornWorker(UvicornWorker):
+    """Uvicorn worker: uvloop/httptools when available, mandatory lifespan"""
+
+    CONFIG_KWARGS = {"loop": "auto", "http": "auto", "lifespan": "on"}
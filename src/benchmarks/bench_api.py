@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la API en proceso (ASGI) con NewRelic activado y desactivado.
+
+Cada modo se ejecuta en un subproceso para que el agente se inicialice (o no)
+desde cero. La API externa se sustituye por un servidor local (stub_server).
+
+Uso (desde src/):
+    python -m benchmarks.bench_api --save-baseline
+    python -m benchmarks.bench_api --threshold 0.25
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "baseline.json"
+MODES = ("off", "on")
+
+# Licencia ficticia: con FASTAPI_ENV=test el agente corre con monitor_mode=false
+BENCH_LICENSE_KEY = "0" * 40
+
+
+def _scenarios():
+    counter = itertools.count()
+
+    def new_user():
+        n = next(counter)
+        suffix = uuid.uuid4().hex[:8]
+        return {"username": f"bench{n}_{suffix}", "email": f"bench{n}_{suffix}@example.com"}
+
+    return {
+        "health": ("GET", "/api/v1/health", None),
+        "data": ("GET", "/api/v1/data", None),
+        "users_list": ("GET", "/api/v1/users?limit=50", None),
+        "users_create": ("POST", "/api/v1/users", new_user),
+        "user_lookup": ("GET", "/api/v1/users/1", None),
+        "slow_operation": ("GET", "/api/v1/slow-operation", None),
+    }
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _total_checkouts() -> int:
+    from app.models.database import get_pool_checkout_counts
+
+    return sum(get_pool_checkout_counts().values())
+
+
+async def _run_scenario(client, headers, method, path, body_factory, requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            body = body_factory() if body_factory else None
+            start = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    checkouts_before = _total_checkouts()
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    checkouts = _total_checkouts() - checkouts_before
+
+    # Pasada separada para asignaciones: tracemalloc distorsiona la latencia
+    alloc_requests = max(1, min(50, requests // 4))
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    for _ in range(alloc_requests):
+        body = body_factory() if body_factory else None
+        await client.request(method, path, json=body, headers=headers)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "rps": round(requests / elapsed, 1),
+        "db_checkouts_per_request": round(checkouts / requests, 3),
+        "alloc_peak_kb": round((peak - before) / 1024, 1),
+        "alloc_retained_bytes_per_request": round((after - before) / alloc_requests),
+    }
+
+
+async def _run_worker(args) -> dict:
+    import httpx
+    from main import app
+    from app.services.auth_service import token_verifier
+
+    headers = {"X-Token": token_verifier.issue("benchmark")}
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, (method, path, body_factory) in _scenarios().items():
+                if args.scenarios and name not in args.scenarios:
+                    continue
+                # Calentamiento: conexiones, cachés y rutas compiladas
+                for _ in range(5):
+                    body = body_factory() if body_factory else None
+                    await client.request(method, path, json=body, headers=headers)
+                results[name] = await _run_scenario(
+                    client, headers, method, path, body_factory, args.requests, args.concurrency
+                )
+    return results
+
+
+def worker_main(args):
+    """Ejecutar los escenarios en este proceso e imprimir el resultado en JSON"""
+    from benchmarks.stub_server import StubServer
+
+    with StubServer() as stub:
+        os.environ["EXTERNAL_API_BASE_URL"] = stub.base_url
+        results = asyncio.run(_run_worker(args))
+    print(json.dumps(results))
+
+
+def _spawn_mode(mode: str, args) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "NEWRELIC_ENABLED": "True" if mode == "on" else "False",
+        "FASTAPI_ENV": "test",
+        "DATABASE_URL": f"sqlite:///{Path(tempfile.mkdtemp(prefix='bench-')) / 'bench.db'}",
+        "SLOW_OPERATION_DURATION": str(args.slow_operation_duration),
+        "HTTP_CACHE_TTL": str(args.http_cache_ttl),
+    })
+    env.setdefault("NEW_RELIC_LICENSE_KEY", BENCH_LICENSE_KEY)
+    env.setdefault("NEW_RELIC_LOG_LEVEL", "error")
+
+    command = [
+        sys.executable, "-m", "benchmarks.bench_api", "--worker",
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+    ]
+    if args.scenarios:
+        command += ["--scenarios", *args.scenarios]
+
+    completed = subprocess.run(command, cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"Benchmark worker for mode '{mode}' failed")
+    # La última línea es el JSON; el resto son logs de la aplicación
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """Devolver las regresiones de `current` respecto a `baseline`"""
+    regressions = []
+    for mode, scenarios in current.items():
+        for name, result in scenarios.items():
+            reference = baseline.get(mode, {}).get(name)
+            if not reference:
+                continue
+            for metric in ("p50_ms", "p99_ms"):
+                delta = result[metric] - reference[metric]
+                if delta > min_delta_ms and result[metric] > reference[metric] * (1 + threshold):
+                    regressions.append(f"{mode}/{name} {metric}: {reference[metric]} -> {result[metric]}")
+            if result["rps"] < reference["rps"] * (1 - threshold):
+                regressions.append(f"{mode}/{name} rps: {reference['rps']} -> {result['rps']}")
+    return regressions
+
+
+def _print_report(results: dict):
+    header = (
+        f"{'scenario':<16}{'mode':<6}{'p50 ms':>10}{'p99 ms':>10}{'rps':>10}"
+        f"{'alloc KB':>10}{'db/req':>8}{'errors':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name in next(iter(results.values())):
+        for mode in results:
+            r = results[mode][name]
+            print(f"{name:<16}{mode:<6}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['rps']:>10}"
+                  f"{r['alloc_peak_kb']:>10}{r.get('db_checkouts_per_request', '-'):>8}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API latency/throughput benchmark")
+    parser.add_argument("--requests", type=int, default=300, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenarios", nargs="*", help="subset of scenarios to run")
+    parser.add_argument("--modes", nargs="*", choices=MODES, default=list(MODES))
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="ignore latency deltas below this")
+    parser.add_argument("--slow-operation-duration", type=float, default=0.01)
+    parser.add_argument("--http-cache-ttl", type=float, default=30)
+    parser.add_argument("--output", type=Path, help="write the results JSON to this file")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    results = {mode: _spawn_mode(mode, args) for mode in args.modes}
+    _print_report(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(results, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if args.baseline.exists():
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold, args.min_delta_ms)
+        if regressions:
+            print("\n❌ Regressions beyond threshold:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions against baseline")
+    else:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to create one")
+
+
+if __name__ == "__main__":
+    main()
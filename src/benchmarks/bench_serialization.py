@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización de listas de usuarios (bytes/s).
+
+Compara la ruta por defecto de FastAPI (validación del response_model +
+JSONResponse) con FastJSONResponse sobre filas ya validadas, con orjson y con
+el fallback de la stdlib. No levanta la aplicación ni toca la BD.
+
+Uso (desde src/):
+    python -m benchmarks.bench_serialization --rows 1000 --repeat 50
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.models.schemas import UserResponse
+from app.services.user_service import UserService
+from app.utils import json_response
+from app.utils.json_response import FastJSONResponse
+
+
+def _make_users(rows: int):
+    # Objetos con atributos, como los que devuelve el ORM
+    created_at = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        SimpleNamespace(
+            id=i,
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            created_at=created_at + timedelta(seconds=i, microseconds=i),
+        )
+        for i in range(1, rows + 1)
+    ]
+
+
+def _fastapi_default(users):
+    field = create_response_field(
+        name="Response_get_users", type_=list[UserResponse], mode="serialization"
+    )
+
+    loop = asyncio.new_event_loop()
+
+    def run() -> bytes:
+        content = loop.run_until_complete(serialize_response(field=field, response_content=users))
+        return JSONResponse(content).body
+
+    return run
+
+
+def _fast_response(users, dumps):
+    class Response(FastJSONResponse):
+        def render(self, content):
+            return dumps(content)
+
+    def run() -> bytes:
+        return Response([UserService.to_response_row(user) for user in users]).body
+
+    return run
+
+
+def _measure(run, repeat: int) -> dict:
+    body = run()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        run()
+    elapsed = time.perf_counter() - started
+    return {
+        "bytes": len(body),
+        "ms_per_response": elapsed / repeat * 1000,
+        "mb_per_second": len(body) * repeat / elapsed / 1_000_000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="Usuarios por respuesta")
+    parser.add_argument("--repeat", type=int, default=50, help="Respuestas por variante")
+    args = parser.parse_args()
+
+    users = _make_users(args.rows)
+    variants = {"fastapi_default": _fastapi_default(users)}
+    if json_response.orjson is not None:
+        variants["fast_orjson"] = _fast_response(users, json_response.orjson_dumps)
+    variants["fast_stdlib"] = _fast_response(users, json_response.stdlib_dumps)
+
+    results = {name: _measure(run, args.repeat) for name, run in variants.items()}
+    baseline = results["fastapi_default"]["mb_per_second"]
+
+    print(f"{args.rows} users per response, {args.repeat} responses per variant")
+    print(f"{'variant':<18}{'bytes':>10}{'ms/resp':>10}{'MB/s':>10}{'speedup':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:<18}{result['bytes']:>10}{result['ms_per_response']:>10.2f}"
+            f"{result['mb_per_second']:>10.1f}{result['mb_per_second'] / baseline:>9.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,37 +2,83 @@
 """
 Main entry point for the FastAPI NewRelic Demo Application
 """
-import time
+# Medir el coste de importación antes de cargar el resto de módulos (se retira al
+# final de este módulo y se reinstala durante el lifespan)
+from app.utils.startup_profiler import startup_profiler
+startup_profiler.install_import_timer()
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
 from contextlib import asynccontextmanager
 
 # Importar configuración centralizada
 from app.config.config import settings
-from app.config.newrelic_config import NEWRELIC_ENABLED
-from app.models.database import init_db
-from app.api.endpoints import health, data, users, slow_operation
-from app.utils.logger import setup_logger
+from app.config.newrelic_config import NewRelicConfig
+from app.models.database import init_db, close_db
+from app.services.http_client import start_http_client, close_http_client
+from app.services.executor import start_executors, shutdown_executors
+from app.services.job_service import start_job_manager, close_job_manager
+from app.services.health_monitor import health_monitor
+from app.services.metrics_exporter import start_metrics_exporter, stop_metrics_exporter
+from app.services.user_cache import start_user_cache, close_user_cache
+from app.services.write_queue import start_write_queue, close_write_queue
+from app.api.endpoints import health, data, jobs, metrics, profiler, users, slow_operation
+from app.middleware.compression_middleware import CompressionMiddleware
+from app.middleware.concurrency_limit_middleware import ConcurrencyLimitMiddleware
+from app.middleware.newrelic_middleware import NewRelicMiddleware
+from app.utils.http_cache import PrecomputedResponse
+from app.utils.json_response import FastJSONResponse
+from app.utils.logger import get_log_stats, setup_logger
 from app.utils.newrelic_monitor import NewRelicMonitor, set_newrelic_status
+from app.utils.loop_monitor import start_loop_lag_monitor, stop_loop_lag_monitor
+from app.utils.request_profiler import start_request_profiler, stop_request_profiler
+from app.utils.telemetry import start_telemetry, stop_telemetry
 
 logger = setup_logger(__name__)
 
-# Configurar estado de NewRelic
-set_newrelic_status(NEWRELIC_ENABLED)
-
 # Lifespan manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup
-    init_db()
+    # Startup: el agente, la BD y el cliente HTTP se inicializan aquí, no al importar.
+    # También se miden sus imports perezosos (httpx, agente...); el temporizador se retira siempre
+    startup_profiler.install_import_timer()
+    try:
+        with startup_profiler.phase("newrelic"):
+            # Con server.py ya se inicializó en el post_fork del worker
+            if not NewRelicMonitor.is_enabled():
+                set_newrelic_status(NewRelicConfig.initialize_newrelic())
+            NewRelicConfig.reload_config_status()
+        with startup_profiler.phase("database"):
+            await init_db()
+            start_write_queue()
+        with startup_profiler.phase("user_cache"):
+            await start_user_cache()
+        with startup_profiler.phase("http_client"):
+            await start_http_client()
+        with startup_profiler.phase("executors"):
+            start_executors()
+            start_job_manager()
+        with startup_profiler.phase("telemetry"):
+            start_telemetry()
+            start_metrics_exporter()
+            start_request_profiler()
+            start_loop_lag_monitor()
+        with startup_profiler.phase("health_monitor"):
+            await health_monitor.start()
+        with startup_profiler.phase("precomputed_responses"):
+            refresh_precomputed_responses()
+    finally:
+        startup_profiler.finish()
+    startup_profiler.emit_metrics()
+    app.state.startup_report = startup_profiler.report()
     logger.info(f"🚀 Application started in {settings.fastapi_env} mode")
+    logger.info(f"⏱️ Startup report: {app.state.startup_report}")
 
     # Mostrar estado de NewRelic
-    from app.config.newrelic_config import NewRelicConfig
     status = NewRelicConfig.get_config_status()
 
-    if NEWRELIC_ENABLED:
+    if NewRelicMonitor.is_enabled():
         if status['initialized_by_entrypoint']:
             logger.info("✅ NewRelic monitoring is ACTIVE (initialized by entrypoint)")
         else:
@@ -44,6 +90,19 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown
+    await health_monitor.stop()
+    await close_http_client()
+    await stop_metrics_exporter()
+    stop_request_profiler()
+    await stop_loop_lag_monitor()
+    close_user_cache()
+    for key, value in get_log_stats().items():
+        NewRelicMonitor.record_custom_metric(f'Custom/Logging/{key.capitalize()}', value)
+    await stop_telemetry()
+    await close_job_manager()
+    await shutdown_executors()
+    await close_write_queue()
+    await close_db()
     logger.info("🛑 Application shutting down")
 
 # Create FastAPI application
@@ -51,12 +110,17 @@ app = FastAPI(
     title=settings.project_name,
     version=settings.project_version,
     description="Una API de demostración con FastAPI y NewRelic integrado",
-    docs_url="/docs",
-    redoc_url="/redoc",
-    openapi_url="/openapi.json",
+    # Documentación servida desde respuestas precalculadas (ver más abajo)
+    docs_url=None,
+    redoc_url=None,
+    openapi_url=None,
+    # orjson (o stdlib) para todas las respuestas JSON
+    default_response_class=FastJSONResponse,
     lifespan=lifespan
 )
 
+OPENAPI_URL = "/openapi.json"
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -66,6 +130,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión gzip/brotli negociada (dentro de NewRelic: su tiempo cuenta en la latencia)
+if settings.compression_enabled:
+    app.add_middleware(CompressionMiddleware)
+
+# Limitador de concurrencia adaptativo: rechaza con 503 antes de encolar
+# (dentro de NewRelic para que los rechazos cuenten en las métricas)
+if settings.limiter_enabled:
+    app.add_middleware(ConcurrencyLimitMiddleware)
+
+# Middleware ASGI puro de NewRelic (el último añadido es el más externo)
+app.add_middleware(NewRelicMiddleware)
+
 # Include routers
 app.include_router(
     health.router,
@@ -87,76 +163,91 @@ app.include_router(
     prefix=settings.api_v1_prefix,
     tags=["monitoring"]
 )
+app.include_router(
+    jobs.router,
+    prefix=settings.api_v1_prefix,
+    tags=["jobs"]
+)
+# /metrics en la raíz, como espera Prometheus
+app.include_router(
+    metrics.router,
+    tags=["monitoring"]
+)
+# Perfil de peticiones lentas (sólo con PROFILER_ENABLED)
+app.include_router(
+    profiler.router,
+    tags=["monitoring"]
+)
 
-@app.middleware("http")
-async def newrelic_middleware(request: Request, call_next):
-    """Middleware para monitoreo de NewRelic"""
-    start_time = time.time()
-
-    try:
-        response = await call_next(request)
-        process_time = time.time() - start_time
-
-        # Solo registrar métricas si NewRelic está activo
-        if NEWRELIC_ENABLED:
-            NewRelicMonitor.record_custom_metric('Custom/RequestCount', 1)
-            NewRelicMonitor.record_custom_metric('Custom/ResponseTime', process_time)
-            NewRelicMonitor.add_custom_attribute('response_status', str(response.status_code))
-            NewRelicMonitor.add_custom_attribute('request_path', request.url.path)
-            NewRelicMonitor.add_custom_attribute('request_method', request.method)
-
-        logger.debug(f"Request processed: {request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
-
-        return response
-
-    except Exception as e:
-        process_time = time.time() - start_time
-        logger.error(f"Request failed: {request.method} {request.url.path} - Error: {e}")
-
-        # Registrar error solo si NewRelic está activo
-        if NEWRELIC_ENABLED:
-            NewRelicMonitor.notice_error(e, {
-                'request_path': request.url.path,
-                'request_method': request.method,
-                'processing_time': str(process_time)
-            })
-            NewRelicMonitor.record_custom_metric('Custom/RequestError', 1)
-
-        return JSONResponse(
-            status_code=500,
-            content={"detail": "Internal server error"}
-        )
+# Respuestas precalculadas (bytes + ETag) para los endpoints más consultados
+_precomputed: dict = {}
 
-@app.get("/", include_in_schema=False)
-async def root():
-    """Root endpoint"""
-    from app.config.newrelic_config import NewRelicConfig
+def refresh_precomputed_responses():
+    """Serializar root, OpenAPI y documentación (el lifespan ya recalculó el estado de NewRelic)"""
     status = NewRelicConfig.get_config_status()
 
-    newrelic_status = "active" if NEWRELIC_ENABLED else "inactive"
-    return {
+    _precomputed["root"] = PrecomputedResponse.from_json({
         "message": "FastAPI NewRelic Demo API",
         "status": "running",
         "version": settings.project_version,
         "documentation": "/docs",
         "environment": settings.fastapi_env,
-        "newrelic_status": newrelic_status,
+        "newrelic_status": "active" if NewRelicMonitor.is_enabled() else "inactive",
         "newrelic_app_name": status['app_name'],
         "newrelic_license_configured": status['license_configured'],
         "newrelic_initialized_by": "entrypoint" if status['initialized_by_entrypoint'] else "application"
-    }
+    })
+    _precomputed["openapi"] = PrecomputedResponse.from_json(app.openapi())
+    _precomputed["docs"] = PrecomputedResponse(
+        get_swagger_ui_html(openapi_url=OPENAPI_URL, title=f"{app.title} - Swagger UI").body,
+        media_type="text/html"
+    )
+    _precomputed["redoc"] = PrecomputedResponse(
+        get_redoc_html(openapi_url=OPENAPI_URL, title=f"{app.title} - ReDoc").body,
+        media_type="text/html"
+    )
+
+def _serve_precomputed(name: str, request: Request):
+    if name not in _precomputed:
+        refresh_precomputed_responses()
+    return _precomputed[name].response(request)
+
+@app.get("/", include_in_schema=False)
+async def root(request: Request):
+    """Root endpoint"""
+    return _serve_precomputed("root", request)
+
+@app.get(OPENAPI_URL, include_in_schema=False)
+async def openapi_document(request: Request):
+    """OpenAPI schema"""
+    return _serve_precomputed("openapi", request)
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_ui(request: Request):
+    """Swagger UI"""
+    return _serve_precomputed("docs", request)
+
+@app.get("/redoc", include_in_schema=False)
+async def redoc(request: Request):
+    """ReDoc"""
+    return _serve_precomputed("redoc", request)
 
 @app.get("/health", include_in_schema=False)
 async def health_check():
     """Simple health check"""
     return {"status": "healthy"}
 
+# Fin de los imports del módulo: quien importe `main` sin ejecutar el lifespan
+# (tests, benchmarks, herramientas) no se queda con `__import__` envuelto
+startup_profiler.uninstall_import_timer()
+
 if __name__ == "__main__":
+    # Servidor de desarrollo; en producción usar server.py (multi-worker)
     import uvicorn
     uvicorn.run(
         "main:app",
         host=settings.fastapi_host,
         port=settings.fastapi_port,
-        reload=settings.fastapi_debug,
+        reload=settings.fastapi_debug and settings.fastapi_env == "development",
         log_level="info"
     )
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Production launcher: gunicorn master with uvicorn workers.
+
+    python server.py
+    newrelic-admin run-program python server.py   # imagen base con NewRelic
+
+- Número de workers desde WEB_CONCURRENCY (por defecto, número de CPUs).
+- La aplicación se precarga en el master antes del fork; importar la app no
+  inicializa el agente de NewRelic, que se inicializa en cada worker después
+  del fork (hook post_fork).
+- uvloop/httptools se usan automáticamente si están instalados.
+- /metrics suma los histogramas de todos los workers a través de snapshots en
+  METRICS_DIR (por defecto un directorio nuevo en /dev/shm por arranque).
+- El estado de los jobs asíncronos se comparte igual en JOBS_DIR, así que el
+  polling de un job puede llegar a cualquier worker.
+- Reinicio gradual de workers sin downtime: kill -HUP <pid del master>.
+  Para desplegar código nuevo con la app precargada: kill -USR2 <pid> (nuevo
+  master) y después kill -QUIT <pid antiguo>.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gunicorn.app.base import BaseApplication
+
+from app.config.config import settings
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def post_fork(server, worker):
+    """Inicializar NewRelic una vez por worker, ya en el proceso hijo"""
+    from app.config.newrelic_config import NewRelicConfig
+    from app.utils.newrelic_monitor import set_newrelic_status
+
+    # initialize_newrelic marca el agente como inicializado en este worker
+    enabled = NewRelicConfig.initialize_newrelic()
+    set_newrelic_status(enabled)
+    if enabled:
+        import newrelic.agent
+        # Activar la aplicación en este worker (no bloquea si startup_timeout=0)
+        newrelic.agent.register_application()
+    NewRelicConfig.reload_config_status()
+
+
+def child_exit(server, worker):
+    """En el master: acumular el snapshot de métricas del worker terminado"""
+    from app.services.metrics_exporter import retire_worker_snapshot
+
+    retire_worker_snapshot(worker.pid)
+
+
+def worker_exit(server, worker):
+    """Enviar los datos pendientes del agente antes de que el worker termine"""
+    from app.utils.newrelic_monitor import NewRelicMonitor
+
+    if NewRelicMonitor.is_enabled():
+        import newrelic.agent
+        newrelic.agent.shutdown_agent(timeout=settings.server_graceful_timeout)
+
+
+class ProductionServer(BaseApplication):
+    """Embedded gunicorn application that preloads `main:app`"""
+
+    def __init__(self, options: dict):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import asyncio
+        from app.models.database import close_db, init_db
+        from main import app
+
+        # Crear las tablas una sola vez en el master y no heredar conexiones abiertas
+        async def prepare_database():
+            await init_db()
+            await close_db()
+
+        asyncio.run(prepare_database())
+        return app
+
+
+def get_server_options() -> dict:
+    """Opciones de gunicorn derivadas de Settings"""
+    return {
+        "bind": f"{settings.fastapi_host}:{settings.fastapi_port}",
+        "workers": settings.web_concurrency,
+        "worker_class": "app.workers.AppUvicornWorker",
+        "preload_app": True,
+        "timeout": settings.server_timeout,
+        "graceful_timeout": settings.server_graceful_timeout,
+        "keepalive": settings.server_keepalive,
+        "backlog": settings.server_backlog,
+        "max_requests": settings.server_max_requests,
+        "max_requests_jitter": settings.server_max_requests_jitter,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit,
+        "child_exit": child_exit,
+        "accesslog": "-" if settings.fastapi_debug else None,
+        "errorlog": "-",
+    }
+
+
+def setup_metrics_dir():
+    """Directorio compartido para los snapshots de métricas de los workers"""
+    import tempfile
+    from app.services.metrics_exporter import prepare_metrics_dir
+
+    if not settings.metrics_dir:
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        settings.metrics_dir = tempfile.mkdtemp(prefix="fastapi-metrics-", dir=base)
+    # Los workers heredan settings (y el entorno) del master tras el fork
+    os.environ["METRICS_DIR"] = settings.metrics_dir
+    prepare_metrics_dir(settings.metrics_dir)
+
+
+def setup_jobs_dir():
+    """Directorio compartido con el estado de los jobs (cualquier worker responde)"""
+    import tempfile
+    from app.services.job_service import prepare_jobs_dir
+
+    if not settings.jobs_dir:
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else None
+        settings.jobs_dir = tempfile.mkdtemp(prefix="fastapi-jobs-", dir=base)
+    os.environ["JOBS_DIR"] = settings.jobs_dir
+    prepare_jobs_dir(settings.jobs_dir)
+
+
+def main():
+    setup_metrics_dir()
+    setup_jobs_dir()
+    options = get_server_options()
+    logger.info(
+        f"🚀 Starting production server on {options['bind']} with {options['workers']} workers"
+    )
+    ProductionServer(options).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import os
+import pytest
+import tempfile
+
+# Base de datos aislada para los tests (antes de importar la configuración)
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='fastapi-tests-'), 'test.db')}"
+)
+
+
+@pytest.fixture
+def external_api(monkeypatch):
+    """Shared HTTP client answered in-process: set `external_api["handler"]`"""
+    import httpx
+    from app.services import http_client
+
+    state = {"handler": lambda request: httpx.Response(200, json={"id": 1, "title": "stub post"})}
+    client = http_client.HttpClient(
+        base_url="http://upstream.test",
+        retry_base_delay=0.001,
+        transport=httpx.MockTransport(lambda request: state["handler"](request))
+    )
+    monkeypatch.setattr(http_client, "_http_client", client)
+    state["client"] = client
+    return state
@@ -1,24 +1,100 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
 from main import app
+from app.models.database import get_pool_checkout_counts
+from app.services.auth_service import auth_failure_limiter, token_verifier
 
-client = TestClient(app)
+AUTH_HEADERS = {"X-Token": token_verifier.issue("tests")}
 
-def test_health_check():
+@pytest.fixture(scope="module")
+def client():
+    # Usar el context manager para ejecutar el lifespan (DB, cliente HTTP)
+    with TestClient(app) as test_client:
+        yield test_client
+
+def test_health_check(client):
     """Test health check endpoint"""
     response = client.get("/api/v1/health")
     assert response.status_code == 200
     data = response.json()
     assert data["status"] == "healthy"
 
-def test_get_data():
+def test_get_data(client, external_api):
     """Test data endpoint"""
-    response = client.get("/api/v1/data", headers={"X-Token": "fake-super-secret-token"})
+    response = client.get("/api/v1/data", headers=AUTH_HEADERS)
     assert response.status_code == 200
     data = response.json()
-    assert "success" in data
+    assert data["success"] is True
+    assert data["data"]["title_upper"] == "STUB POST"
+    assert data["metadata"]["source"] == "external_api"
+
+def test_get_data_upstream_down(client, external_api):
+    """Test that upstream failures are not reported as success"""
+    import httpx
+
+    external_api["handler"] = lambda request: httpx.Response(503)
+    response = client.get("/api/v1/data", headers=AUTH_HEADERS)
+    assert response.status_code == 503
+    assert "retry-after" in response.headers
+
+def test_get_data_batch_partial_success(client, external_api):
+    """Batch items fail individually without failing the response"""
+    import asyncio
+    import httpx
+
+    state = {"active": 0, "peak": 0}
+
+    async def handler(request):
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(0.01)
+            item_id = int(request.url.path.rsplit("/", 1)[1])
+            if item_id == 3:
+                return httpx.Response(404)
+            return httpx.Response(200, json={"id": item_id, "title": f"post {item_id}"})
+        finally:
+            state["active"] -= 1
+
+    external_api["handler"] = handler
+    response = client.get("/api/v1/data/batch?ids=4,3,2&ids=1&ids=2&concurrency=2", headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is False
+    assert (data["succeeded"], data["failed"]) == (3, 1)
+    assert [item["id"] for item in data["results"]] == [4, 3, 2, 1]
+    assert data["results"][0]["data"]["title_upper"] == "POST 4"
+    assert data["results"][1]["status"] == "error"
+    assert state["peak"] == 2
+
+def test_get_data_batch_deadline_streams_partial_results(client, external_api):
+    """Items that miss the deadline are reported as timeouts in the stream"""
+    import asyncio
+    import httpx
+
+    async def handler(request):
+        if request.url.path.endswith("/2"):
+            await asyncio.sleep(5)
+        return httpx.Response(200, json={"id": 1, "title": "fast"})
+
+    external_api["handler"] = handler
+    response = client.get(
+        "/api/v1/data/batch?ids=1,2&deadline=0.2&format=ndjson", headers=AUTH_HEADERS
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [(line["id"], line["status"]) for line in lines[:2]] == [(1, "ok"), (2, "timeout")]
+    assert lines[-1]["done"] is True and lines[-1]["failed"] == 1
+
+def test_get_data_batch_validates_ids(client, external_api):
+    """Test 422 for non-numeric ids and for too many ids"""
+    assert client.get("/api/v1/data/batch?ids=1,x", headers=AUTH_HEADERS).status_code == 422
+    too_many = ",".join(str(i) for i in range(1000))
+    assert client.get(f"/api/v1/data/batch?ids={too_many}", headers=AUTH_HEADERS).status_code == 422
 
-def test_create_user():
+def test_create_user(client):
     """Test user creation"""
     user_data = {
         "username": "testuser",
@@ -27,15 +103,219 @@ def test_create_user():
     response = client.post(
         "/api/v1/users",
         json=user_data,
-        headers={"X-Token": "fake-super-secret-token"}
+        headers=AUTH_HEADERS
     )
     assert response.status_code == 201
     data = response.json()
     assert data["success"] == True
 
-def test_slow_operation():
+def test_create_duplicate_user(client):
+    """Test that a duplicated username or email is rejected"""
+    response = client.post(
+        "/api/v1/users",
+        json={"username": "testuser", "email": "another@example.com"},
+        headers=AUTH_HEADERS
+    )
+    assert response.status_code == 400
+
+def test_get_user_lookups(client):
+    """Test lookups by id, username and email (cached after creation)"""
+    headers = AUTH_HEADERS
+    created = client.post(
+        "/api/v1/users",
+        json={"username": "lookupuser", "email": "lookup@example.com"},
+        headers=headers
+    ).json()["user"]
+
+    for path in (
+        f"/api/v1/users/{created['id']}",
+        "/api/v1/users/by-username/lookupuser",
+        "/api/v1/users/by-email/lookup@example.com",
+    ):
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        assert response.json() == created
+
+    response = client.get("/api/v1/users/by-username/missing-user", headers=headers)
+    assert response.status_code == 404
+
+def test_slow_operation(client):
     """Test slow operation endpoint"""
-    response = client.get("/api/v1/slow-operation", headers={"X-Token": "fake-super-secret-token"})
+    response = client.get("/api/v1/slow-operation", headers=AUTH_HEADERS)
     assert response.status_code == 200
     data = response.json()
     assert data["success"] == True
+
+def test_get_users(client):
+    """Test users listing"""
+    response = client.get("/api/v1/users", headers=AUTH_HEADERS)
+    assert response.status_code == 200
+    usernames = [user["username"] for user in response.json()]
+    assert "testuser" in usernames
+
+def test_get_users_keyset_pagination(client):
+    """Test cursor pagination and NDJSON streaming of users"""
+    headers = AUTH_HEADERS
+    for i in range(3):
+        client.post("/api/v1/users", json={"username": f"page{i}", "email": f"page{i}@example.com"}, headers=headers)
+
+    first = client.get("/api/v1/users", params={"limit": 2}, headers=headers)
+    assert first.status_code == 200
+    assert len(first.json()) == 2
+    cursor = first.headers["X-Next-Cursor"]
+    assert int(first.headers["X-Total-Count-Estimate"]) >= 4
+
+    second = client.get("/api/v1/users", params={"limit": 2, "cursor": cursor}, headers=headers)
+    assert second.json()[0]["id"] > int(cursor)
+
+    stream = client.get("/api/v1/users", params={"format": "ndjson"}, headers=headers)
+    assert stream.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in stream.text.splitlines()]
+    assert len(lines) >= 4
+    assert [user["id"] for user in lines] == sorted(user["id"] for user in lines)
+
+def test_bulk_create_users(client):
+    """Test bulk user creation with per-item results"""
+    headers = AUTH_HEADERS
+    payload = [
+        {"username": "bulk1", "email": "bulk1@example.com"},
+        {"username": "bulk2", "email": "bulk2@example.com"},
+        {"username": "bulk1", "email": "other@example.com"},
+        {"username": "testuser", "email": "bulk3@example.com"},
+        {"username": "bulk4", "email": "not-an-email"},
+    ]
+    response = client.post("/api/v1/users/bulk", json=payload, headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 2
+    assert [result["status"] for result in data["results"]] == [
+        "created", "created", "duplicate", "conflict", "invalid"
+    ]
+
+    ndjson = b'{"username": "bulk5", "email": "bulk5@example.com"}\n{broken\n'
+    response = client.post(
+        "/api/v1/users/bulk",
+        content=ndjson,
+        headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert [result["status"] for result in response.json()["results"]] == ["created", "invalid"]
+
+def test_bulk_create_users_rejects_oversized_body_before_parsing(client, monkeypatch):
+    """Test 413 from Content-Length and from the streamed byte budget"""
+    from app.config.config import settings
+
+    monkeypatch.setattr(settings, "users_bulk_max_bytes", 100)
+    body = json.dumps([{"username": f"big{n}", "email": f"big{n}@example.com"} for n in range(5)])
+    response = client.post("/api/v1/users/bulk", content=body, headers={**AUTH_HEADERS, "Content-Type": "application/json"})
+    assert response.status_code == 413
+
+    def chunks():
+        yield body[:60].encode()
+        yield body[60:].encode()
+
+    response = client.post("/api/v1/users/bulk", content=chunks(), headers={**AUTH_HEADERS, "Content-Type": "application/json"})
+    assert response.status_code == 413
+
+def test_liveness_and_readiness(client):
+    """Test split health probes without auth header"""
+    response = client.get("/api/v1/health/live")
+    assert response.status_code == 200
+    assert response.json()["status"] == "alive"
+
+    response = client.get("/api/v1/health/ready")
+    data = response.json()
+    assert data["checks"]["database"]["status"] == "ok"
+    assert response.status_code == (200 if data["status"] == "ready" else 503)
+
+def test_root_and_openapi_are_precomputed(client):
+    """Test ETag / 304 handling for root and OpenAPI document"""
+    for path in ("/", "/openapi.json"):
+        response = client.get(path)
+        assert response.status_code == 200
+        etag = response.headers["ETag"]
+        cached = client.get(path, headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+    assert "/api/v1/users" in client.get("/openapi.json").json()["paths"]
+    assert client.get("/").json()["message"] == "FastAPI NewRelic Demo API"
+    assert client.get("/docs").status_code == 200
+
+def test_startup_report_exposed_after_lifespan(client):
+    """Test that the lifespan stores the startup report"""
+    report = app.state.startup_report
+    assert set(report["phases"]) >= {"newrelic", "database", "http_client"}
+
+def test_users_conditional_get(client):
+    """Test that an unchanged users page answers 304 to If-None-Match"""
+    headers = AUTH_HEADERS
+    first = client.get("/api/v1/users?limit=5", headers=headers)
+    etag = first.headers["etag"]
+
+    response = client.get("/api/v1/users?limit=5", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    client.post("/api/v1/users", json={"username": "etaguser", "email": "etag@example.com"}, headers=headers)
+    response = client.get("/api/v1/users?limit=5", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+def test_invalid_tokens_are_rejected_and_rate_limited(client):
+    """Test 401 for bad tokens and 429 after too many failures"""
+    expired = token_verifier.issue("tests", ttl=-3600)
+    forged = AUTH_HEADERS["X-Token"][:-2] + "xx"
+    for token in ("not-a-token", expired, forged):
+        response = client.get("/api/v1/users", headers={"X-Token": token})
+        assert response.status_code == 401
+
+    limiter = auth_failure_limiter
+    original_max = limiter.max_failures
+    limiter.max_failures = 3
+    try:
+        response = client.get("/api/v1/users", headers={"X-Token": "not-a-token"})
+        assert response.status_code == 429
+        assert "retry-after" in response.headers
+        # Otros clientes tras la misma IP con un token válido no se ven afectados
+        assert client.get("/api/v1/users", headers=AUTH_HEADERS).status_code == 200
+    finally:
+        limiter.max_failures = original_max
+        limiter._failures.clear()
+
+def test_client_address_uses_forwarded_for_only_from_trusted_proxies(monkeypatch):
+    """Test that X-Forwarded-For is honoured only when the peer is a trusted proxy"""
+    from starlette.requests import Request
+    from app.dependencies import dependencies
+
+    def request(peer, forwarded=None):
+        headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+        return Request({"type": "http", "client": (peer, 1234), "headers": headers})
+
+    monkeypatch.setattr(dependencies, "TRUSTED_PROXIES", frozenset({"10.0.0.1", "10.0.0.2"}))
+    assert dependencies.client_address(request("10.0.0.1", "1.2.3.4, 10.0.0.2")) == "1.2.3.4"
+    # El cliente puede falsear la parte izquierda, no la que añade el proxy
+    assert dependencies.client_address(request("10.0.0.1", "6.6.6.6, 1.2.3.4")) == "1.2.3.4"
+    assert dependencies.client_address(request("5.5.5.5", "1.2.3.4")) == "5.5.5.5"
+    assert dependencies.client_address(request("10.0.0.1")) == "10.0.0.1"
+
+def _request_checkouts() -> dict:
+    # Sin los del health monitor, que refresca en segundo plano
+    counts = get_pool_checkout_counts()
+    counts.pop("background", None)
+    return counts
+
+def test_routes_without_db_work_do_not_check_out_connections(client, external_api):
+    """Test that auth-only routes and cached lookups never touch the pool"""
+    user = client.post(
+        "/api/v1/users",
+        json={"username": "pooluser", "email": "pool@example.com"},
+        headers=AUTH_HEADERS
+    ).json()["user"]
+    before = _request_checkouts()
+
+    client.get("/api/v1/data", headers=AUTH_HEADERS)
+    client.get(f"/api/v1/users/{user['id']}", headers=AUTH_HEADERS)
+    assert _request_checkouts() == before
+
+    client.get("/api/v1/users?limit=1", headers=AUTH_HEADERS)
+    after = _request_checkouts()
+    assert after["/api/v1/users"] == before.get("/api/v1/users", 0) + 1
@@ -0,0 +1,45 @@
+import time
+import pytest
+from app.services.auth_service import (
+    FailureLimiter,
+    InvalidTokenError,
+    TokenVerifier,
+    _b64url_encode,
+)
+
+def test_token_verification_is_cached_until_expiry():
+    """Test that a verified token is served from the cache with a TTL bounded by exp"""
+    verifier = TokenVerifier(secret="test-secret", leeway=0, cache_ttl=300)
+    token = verifier.issue("alice", ttl=60, role="admin")
+
+    claims, outcome = verifier.verify(token)
+    assert (claims["sub"], claims["role"], outcome) == ("alice", "admin", "miss")
+    assert verifier.verify(token)[1] == "hit"
+
+    expires_at, _ = next(iter(verifier.cache._data.values()))
+    assert expires_at - time.monotonic() <= 60
+
+def test_token_verification_rejects_bad_tokens():
+    """Test wrong key, unsigned (alg=none) and expired tokens"""
+    verifier = TokenVerifier(secret="test-secret", leeway=0)
+    other = TokenVerifier(secret="other-secret")
+
+    header = _b64url_encode(b'{"alg":"none","typ":"JWT"}')
+    payload = verifier.issue("bob").split(".")[1]
+    for token in (
+        other.issue("bob"),
+        f"{header}.{payload}.",
+        verifier.issue("bob", ttl=-1),
+        "a.b",
+    ):
+        with pytest.raises(InvalidTokenError):
+            verifier.verify(token)
+
+def test_failure_limiter_blocks_after_max_failures():
+    """Test that a client is blocked only after reaching the failure limit"""
+    limiter = FailureLimiter(max_failures=2, window=60)
+    limiter.record_failure("10.0.0.1")
+    assert limiter.retry_after("10.0.0.1") is None
+    limiter.record_failure("10.0.0.1")
+    assert 0 < limiter.retry_after("10.0.0.1") <= 60
+    assert limiter.retry_after("10.0.0.2") is None
@@ -0,0 +1,53 @@
+import asyncio
+from app.utils.bloom import BloomFilter
+from app.utils.cache import TTLCache
+
+def test_ttl_cache_lru_eviction():
+    """Test that the least recently used entry is evicted"""
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+def test_ttl_cache_expiration():
+    """Test that expired entries are not returned"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, ttl=-1)
+    cache.set("b", 2, ttl=0.0001)
+    asyncio.run(asyncio.sleep(0.01))
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+
+def test_ttl_cache_coalesces_concurrent_loads():
+    """Test that concurrent misses share a single load"""
+    cache = TTLCache(maxsize=10, ttl=60)
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+
+    async def run():
+        results = await asyncio.gather(*(cache.lookup("k", loader) for _ in range(5)))
+        outcomes = [outcome for _, outcome in results]
+        assert outcomes.count("miss") == 1
+        assert outcomes.count("coalesced") == 4
+        _, outcome = await cache.lookup("k", loader)
+        assert outcome == "hit"
+
+    asyncio.run(run())
+    assert calls == 1
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test that added values are always reported and most others are not"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    bloom.update(f"user{i}" for i in range(1000))
+    assert all(f"user{i}" in bloom for i in range(1000))
+    false_positives = sum(f"other{i}" in bloom for i in range(1000))
+    assert false_positives < 50
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware.concurrency_limit_middleware import (
+    AdaptiveConcurrencyLimiter,
+    ConcurrencyLimitMiddleware,
+    parse_priorities,
+)
+from app.utils.loop_monitor import EventLoopLagMonitor
+
+PRIORITIES = "/health=exempt,POST /users=critical,/users=normal,/slow=low"
+
+
+def test_priority_rules_prefer_method_and_longest_prefix():
+    rules = parse_priorities("/api=normal,POST /api/users=critical,/api/slow=low")
+    assert rules[0] == ("POST", "/api/users", "critical")
+
+    middleware = ConcurrencyLimitMiddleware(None, priorities=PRIORITIES)
+    assert middleware.classify("POST", "/users") == "critical"
+    assert middleware.classify("GET", "/users/1") == "normal"
+    assert middleware.classify("GET", "/slow") == "low"
+    assert middleware.classify("GET", "/other") == "normal"
+
+
+def test_low_priority_is_shed_first():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=10, shares={"critical": 1.0, "normal": 0.8, "low": 0.5})
+    assert all(limiter.try_acquire("low") for _ in range(5))
+    assert not limiter.try_acquire("low")
+    assert all(limiter.try_acquire("normal") for _ in range(3))
+    assert not limiter.try_acquire("normal")
+    assert all(limiter.try_acquire("critical") for _ in range(2))
+    assert not limiter.try_acquire("critical")
+    assert limiter.shed == {"low": 1, "normal": 1, "critical": 1}
+
+
+def test_aimd_adapts_to_congestion():
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=20, min_limit=5, backoff=0.5, max_lag=0.05, decrease_interval=0
+    )
+    # Aumento aditivo mientras el límite se usa y no hay congestión
+    for _ in range(20):
+        limiter.try_acquire("normal")
+    for _ in range(5):
+        limiter.release("GET /items", 0.01, lag=0.0)
+    assert limiter.limit > 20
+
+    # Retraso del event loop: disminución multiplicativa hasta el mínimo
+    limit = limiter.limit
+    limiter.release("GET /items", 0.01, lag=0.2)
+    assert limiter.limit == limit * 0.5
+    for _ in range(5):
+        limiter.try_acquire("normal")
+        limiter.release("GET /items", 0.01, lag=0.2)
+    assert limiter.limit == 5
+
+
+def test_latency_above_route_baseline_is_congestion():
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=10, min_limit=1, latency_tolerance=2.0, decrease_interval=0
+    )
+    # Límite en uso: más de la mitad ocupada por peticiones en curso
+    for _ in range(8):
+        limiter.try_acquire("normal")
+    for _ in range(30):
+        limiter.try_acquire("normal")
+        limiter.release("GET /items", 0.01, lag=0.0)
+    limit = limiter.limit
+    limiter.try_acquire("normal")
+    limiter.release("GET /items", 0.1, lag=0.0)
+    assert limiter.limit < limit
+    # Otra ruta más lenta tiene su propia referencia
+    limiter.try_acquire("normal")
+    limiter.release("GET /reports", 0.5, lag=0.0)
+    assert limiter.limit < limit
+
+
+def test_middleware_sheds_without_queueing():
+    release = asyncio.Event()
+
+    async def slow(request):
+        await release.wait()
+        return PlainTextResponse("done")
+
+    async def health(request):
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[Route("/slow", slow), Route("/health", health)])
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, shares={"low": 0.5})
+    wrapped = ConcurrencyLimitMiddleware(app, limiter=limiter, priorities=PRIORITIES)
+
+    async def run():
+        transport = httpx.ASGITransport(app=wrapped)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            pending = [asyncio.create_task(client.get("/slow")) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            health_status = (await client.get("/health")).status_code
+            release.set()
+            statuses = [response.status_code for response in await asyncio.gather(*pending)]
+            return health_status, statuses
+
+    health_status, statuses = asyncio.run(run())
+    assert health_status == 200
+    assert sorted(statuses) == [200, 200, 503]
+    assert limiter.inflight == 0
+
+
+def test_loop_lag_monitor_detects_blocking():
+    monitor = EventLoopLagMonitor(interval=0.01, report_interval=60)
+
+    async def run():
+        monitor.start()
+        await asyncio.sleep(0.03)
+        time.sleep(0.1)  # Bloquea el event loop a propósito
+        await asyncio.sleep(0.03)
+        max_lag = monitor.max_lag
+        await monitor.stop()
+        return max_lag
+
+    assert asyncio.run(run()) >= 0.08
+    # El informe final del stop() empieza un intervalo nuevo
+    assert monitor.max_lag == 0.0
+
+
+def test_loop_lag_report_percentiles():
+    monitor = EventLoopLagMonitor()
+    for lag in [0.0] * 98 + [0.2, 0.2]:
+        monitor.observe(lag)
+    summary = monitor.report()
+    assert summary["p50"] == 0.0
+    assert summary["p99"] >= 0.2
+    assert summary["max"] == 0.2
+
+
+def test_limit_is_stable_under_light_load():
+    """Slow responses at low concurrency are not treated as congestion"""
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=100, min_limit=10, latency_tolerance=2.0, decrease_interval=0
+    )
+    for index in range(600):
+        limiter.try_acquire("normal")
+        # Un 10% de fallos de caché, diez veces más lentos
+        limiter.release("GET /items", 0.1 if index % 10 == 0 else 0.01, lag=0.0)
+    limiter.try_acquire("normal")
+    limiter.release("GET /items", 0.01, lag=0.2)
+    assert limiter.limit == 100
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import pytest
+from app.services.executor import ExecutorManager, ExecutorSaturatedError, parse_routes
+
+def test_parse_routes():
+    """Test routing table parsing"""
+    assert parse_routes("slow_operation=process, report=thread") == {
+        "slow_operation": "process",
+        "report": "thread"
+    }
+    with pytest.raises(ValueError):
+        parse_routes("slow_operation=gpu")
+
+def test_executor_rejects_when_saturated():
+    """Test backpressure once workers and queue are full"""
+    manager = ExecutorManager(thread_workers=1, process_workers=1, max_queue=0, retry_after=3, routes={})
+    release = threading.Event()
+
+    async def run():
+        first = asyncio.create_task(manager.run("slow_operation", release.wait))
+        await asyncio.sleep(0.01)
+        with pytest.raises(ExecutorSaturatedError) as exc_info:
+            await manager.run("slow_operation", release.wait)
+        assert exc_info.value.retry_after == 3
+        release.set()
+        assert await first is True
+
+    try:
+        asyncio.run(run())
+    finally:
+        manager.shutdown()
+
+def test_cancelled_caller_keeps_slot_until_work_finishes():
+    """Test that a slot is released by the finished work, not by a cancelled caller"""
+    manager = ExecutorManager(thread_workers=1, process_workers=1, max_queue=0, routes={})
+    pool = manager.pool_for("slow_operation")
+    release = threading.Event()
+
+    async def run():
+        caller = asyncio.create_task(manager.run("slow_operation", release.wait))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        await asyncio.sleep(0.01)
+        # El hilo sigue ocupado: el hueco no se ha liberado
+        assert pool.inflight == 1
+        with pytest.raises(ExecutorSaturatedError):
+            await manager.run("slow_operation", release.wait)
+        release.set()
+        for _ in range(100):
+            if pool.inflight == 0:
+                break
+            await asyncio.sleep(0.01)
+        assert pool.inflight == 0
+
+    try:
+        asyncio.run(run())
+    finally:
+        manager.shutdown()
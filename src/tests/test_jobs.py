@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from app.config.config import settings
+from app.services.auth_service import token_verifier
+from app.services.job_service import FAILED, SUCCEEDED, JobManager, JobRejectedError, parse_limits
+
+AUTH_HEADERS = {"X-Token": token_verifier.issue("tests")}
+
+
+def test_parse_limits():
+    assert parse_limits("slow_operation=8, report=2") == {"slow_operation": 8, "report": 2}
+    with pytest.raises(ValueError):
+        parse_limits("slow_operation=0")
+
+
+def test_concurrency_limit_per_type_and_ttl_eviction():
+    async def run():
+        manager = JobManager(limits={"work": 2}, max_pending=3, result_ttl=0.05)
+        running, peak = 0, 0
+        release = asyncio.Event()
+
+        async def work():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await release.wait()
+            running -= 1
+            return "ok"
+
+        jobs = [manager.submit("work", work) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        # 2 en ejecución y 1 en cola; max_pending=3 admite sólo 2 más en cola
+        assert [job.status for job in jobs].count("running") == 2
+        with pytest.raises(JobRejectedError):
+            for _ in range(3):
+                manager.submit("work", work)
+
+        release.set()
+        await asyncio.gather(*(manager.wait(job, 1) for job in jobs))
+        assert peak == 2
+        assert all(job.status == SUCCEEDED and job.result == "ok" for job in jobs)
+
+        async def broken():
+            raise RuntimeError("boom")
+
+        failed = manager.submit("broken", broken)
+        await manager.wait(failed, 1)
+        assert failed.status == FAILED and failed.error == "boom"
+
+        await asyncio.sleep(0.06)
+        assert manager.get(jobs[0].id) is None
+        await manager.shutdown()
+
+    asyncio.run(run())
+
+
+def test_slow_operation_job_api(monkeypatch):
+    monkeypatch.setattr(settings, "slow_operation_duration", 0.05)
+    with TestClient(app) as client:
+        response = client.post("/api/v1/slow-operation/jobs", headers=AUTH_HEADERS)
+        assert response.status_code == 202
+        job = response.json()
+        assert job["status"] in ("queued", "running")
+        assert response.headers["location"] == f"/api/v1/jobs/{job['job_id']}"
+
+        # Otro sujeto no ve el job
+        other = {"X-Token": token_verifier.issue("someone-else")}
+        assert client.get(response.headers["location"], headers=other).status_code == 404
+
+        with client.stream("GET", f"{response.headers['location']}/events", headers=AUTH_HEADERS) as events:
+            assert events.headers["content-type"].startswith("text/event-stream")
+            body = "".join(events.iter_text())
+        assert body.startswith("event: status\n")
+        assert "event: complete\n" in body
+
+        result = client.get(response.headers["location"], params={"wait": 1}, headers=AUTH_HEADERS).json()
+        assert result["status"] == "succeeded"
+        assert result["result"]["processing_time"] >= 0.05
+
+
+def test_jobs_are_visible_from_other_workers(tmp_path):
+    """A job submitted on one worker can be polled and awaited from another"""
+    async def run():
+        creator = JobManager(directory=str(tmp_path), poll_interval=0.01, result_ttl=0.2)
+        other = JobManager(directory=str(tmp_path), poll_interval=0.01, result_ttl=0.2)
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return {"answer": 42}
+
+        job = creator.submit("work", work, owner="alice")
+        remote = other.get(job.id, owner="alice")
+        assert remote is not None and remote is not job
+        assert remote.status in ("queued", "running")
+        assert other.get(job.id, owner="mallory") is None
+        assert other.get("../../etc/passwd") is None
+        assert not await other.wait(remote, 0.05)
+
+        release.set()
+        assert await other.wait(remote, 1)
+        assert remote.status == SUCCEEDED and remote.result == {"answer": 42}
+
+        # Caducado: ningún worker lo devuelve y el fichero se borra
+        await asyncio.sleep(0.25)
+        assert other.get(job.id) is None
+        assert not list(tmp_path.glob("*.json"))
+        await creator.shutdown()
+
+    asyncio.run(run())
@@ -0,0 +1,14 @@
+from datetime import datetime
+from app.models.schemas import UserResponse
+from app.utils import json_response
+
+def test_json_backends_match_pydantic_output():
+    """Test that both backends serialize models and datetimes like pydantic"""
+    user = UserResponse(
+        id=1, username="json", email="json@example.com",
+        created_at=datetime(2024, 1, 2, 3, 4, 5, 6)
+    )
+    expected = f"[{user.model_dump_json()}]".encode()
+    assert json_response.stdlib_dumps([user]) == expected
+    if json_response.orjson is not None:
+        assert json_response.orjson_dumps([user]) == expected
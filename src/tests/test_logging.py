@@ -0,0 +1,61 @@
+import json
+import sys
+import logging
+from app.utils.logger import HotPathFilter, JsonFormatter, parse_sample_rates
+
+def _record(name="app.test", level=logging.INFO, msg="Hot path %s", args=(1,), exc_info=None):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+def test_hot_path_filter_sampling_and_rate_limit():
+    """Test per-logger sampling and per-template rate limiting"""
+    rates = parse_sample_rates("app.api=0, app.api.endpoints.users=1")
+    assert rates == {"app.api": 0.0, "app.api.endpoints.users": 1.0}
+
+    hot_filter = HotPathFilter(rates, rate_limit=0.001, burst=3)
+    assert not hot_filter.filter(_record(name="app.api.endpoints.data"))
+    assert hot_filter.filter(_record(name="app.api.endpoints.data", level=logging.WARNING))
+
+    passed = [hot_filter.filter(_record(name="app.api.endpoints.users")) for _ in range(5)]
+    assert passed == [True, True, True, False, False]
+    # Otra plantilla tiene su propio cubo
+    assert hot_filter.filter(_record(name="app.api.endpoints.users", msg="Other %s"))
+
+def test_json_formatter_includes_extra_and_exception():
+    """Test that records become one JSON object with extras and error fields"""
+    try:
+        raise ValueError("bad value")
+    except ValueError:
+        record = _record(level=logging.ERROR, exc_info=sys.exc_info())
+    record.user_id = 7
+    setattr(record, "trace.id", "abc")
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Hot path 1"
+    assert entry["level"] == "ERROR"
+    assert entry["user_id"] == 7
+    assert entry["trace.id"] == "abc"
+    assert entry["error.class"] == "ValueError"
+
+def test_queue_handler_resolves_message_and_exception_eagerly():
+    """Test that args and tracebacks are rendered before the record is enqueued"""
+    import queue
+    from app.utils.logger import NonBlockingQueueHandler
+
+    handler = NonBlockingQueueHandler(queue.Queue())
+    items = [1]
+    try:
+        raise ValueError("bad value")
+    except ValueError:
+        record = _record(level=logging.ERROR, args=(items,), exc_info=sys.exc_info())
+    prepared = handler.prepare(record)
+    items.append(2)
+
+    assert prepared.msg == "Hot path [1]" and prepared.args is None
+    assert prepared.exc_info is None and "ValueError: bad value" in prepared.exc_text
+    entry = json.loads(JsonFormatter().format(prepared))
+    assert entry["message"] == "Hot path [1]"
+    assert entry["error.class"] == "ValueError"
+    assert entry["error.message"] == "bad value"
+    assert "Traceback" in entry["error.stack"]
+    # El formato de texto también incluye el traceback ya renderizado
+    assert "ValueError: bad value" in logging.Formatter().format(prepared)
@@ -0,0 +1,85 @@
+from fastapi.testclient import TestClient
+from main import app
+from app.services import metrics_exporter
+from app.services.auth_service import token_verifier
+from app.utils.histogram import LatencyHistogram, RouteLatencyRegistry, merge_snapshots, render_prometheus
+
+AUTH_HEADERS = {"X-Token": token_verifier.issue("tests")}
+
+
+def test_histogram_percentiles():
+    """Test that percentiles report the upper bound of their bucket"""
+    histogram = LatencyHistogram()
+    for _ in range(98):
+        histogram.observe(0.001)
+    histogram.observe(0.5)
+    histogram.observe(0.5)
+
+    assert histogram.count == 100
+    assert 0.001 <= histogram.percentile(50) < 0.0015
+    assert 0.5 <= histogram.percentile(99) < 0.71
+    # Más allá del último bucket se informa el último límite
+    histogram.observe(1000)
+    assert histogram.percentile(100) < 1000
+
+
+def test_registry_is_bounded():
+    """Test that new series beyond the maximum share an overflow series"""
+    registry = RouteLatencyRegistry(max_series=2)
+    for index in range(5):
+        registry.observe("GET", f"/route/{index}", 200, 0.01)
+
+    assert len(registry.series) == 3
+    assert registry.series[("OTHER", "other", "2xx")].count == 3
+
+
+def test_snapshots_merge_and_render():
+    """Test that worker snapshots merge and render as Prometheus text"""
+    first, second = RouteLatencyRegistry(), RouteLatencyRegistry()
+    first.observe("GET", "/items", 200, 0.01)
+    second.observe("GET", "/items", 201, 0.02)
+    second.observe("GET", "/items", 404, 0.02)
+
+    merged = merge_snapshots([first.snapshot(), second.snapshot()])
+    assert merged[("GET", "/items", "2xx")].count == 2
+
+    text = render_prometheus(merged)
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert 'http_request_duration_seconds_count{method="GET",route="/items",status="2xx"} 2' in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/items",status="4xx",le="+Inf"} 1' in text
+
+
+def test_metrics_endpoint_includes_other_workers(tmp_path, monkeypatch):
+    """Test /metrics after real requests, plus a snapshot left by another worker"""
+    monkeypatch.setattr(metrics_exporter.settings, "metrics_dir", str(tmp_path))
+    other = RouteLatencyRegistry()
+    other.observe("GET", "/api/v1/users", 200, 0.005)
+    metrics_exporter._write_json(tmp_path / "worker-1.json", other.snapshot())
+
+    with TestClient(app) as client:
+        client.get("/api/v1/users", headers=AUTH_HEADERS)
+        before = metrics_exporter.route_latency.series[("GET", "/api/v1/users", "2xx")].count
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert (
+        f'http_request_duration_seconds_count{{method="GET",route="/api/v1/users",status="2xx"}} {before + 1}'
+        in response.text
+    )
+    # /metrics no se mide a sí mismo
+    assert 'route="/metrics"' not in response.text
+
+
+def test_retired_worker_counts_are_kept(tmp_path, monkeypatch):
+    """Test that counts of an exited worker survive in the retired snapshot"""
+    monkeypatch.setattr(metrics_exporter.settings, "metrics_dir", str(tmp_path))
+    registry = RouteLatencyRegistry()
+    registry.observe("POST", "/jobs", 202, 0.01)
+    for pid in (10, 11):
+        metrics_exporter._write_json(tmp_path / f"worker-{pid}.json", registry.snapshot())
+        metrics_exporter.retire_worker_snapshot(pid)
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["retired.json"]
+    merged = merge_snapshots([metrics_exporter._read_json(tmp_path / "retired.json")])
+    assert merged[("POST", "/jobs", "2xx")].count == 2
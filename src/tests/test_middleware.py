@@ -0,0 +1,61 @@
+import gzip
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from app.middleware.compression_middleware import CompressionMiddleware, negotiate_encoding
+from app.middleware.newrelic_middleware import UNMATCHED_ROUTE, get_route_template
+from main import app
+
+def _scope(method: str, path: str) -> dict:
+    return {"type": "http", "method": method, "path": path, "root_path": "", "app": app}
+
+def test_route_template_uses_path_template():
+    """Test that metrics are keyed by route template, not raw path"""
+    assert get_route_template(_scope("GET", "/api/v1/users")) == "/api/v1/users"
+    assert get_route_template(_scope("POST", "/api/v1/users/bulk")) == "/api/v1/users/bulk"
+
+def test_route_template_unmatched_paths_collapse():
+    """Test that unknown paths share a single metric name"""
+    assert get_route_template(_scope("GET", "/no/such/path/123")) == UNMATCHED_ROUTE
+
+def _compression_app() -> FastAPI:
+    compressed_app = FastAPI()
+    compressed_app.add_middleware(CompressionMiddleware, minimum_size=100, offload_size=1000)
+
+    @compressed_app.get("/text")
+    def text(size: int):
+        return PlainTextResponse("x" * size, headers={"ETag": '"abc"'})
+
+    @compressed_app.get("/stream")
+    def stream():
+        return StreamingResponse((b"line\n" * 500 for _ in range(3)), media_type="application/x-ndjson")
+
+    return compressed_app
+
+def test_negotiate_encoding():
+    """Test Accept-Encoding negotiation with q-values"""
+    assert negotiate_encoding("") is None
+    assert negotiate_encoding("gzip") == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, br") in ("br", "gzip")
+    assert negotiate_encoding("br;q=0, gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+
+def test_compression_threshold_and_streaming():
+    """Test that large and streamed bodies are compressed, small ones are not"""
+    client = TestClient(_compression_app())
+    headers = {"Accept-Encoding": "gzip"}
+
+    small = client.get("/text?size=10", headers=headers)
+    assert "content-encoding" not in small.headers
+
+    # Por encima de offload_size: se comprime en un hilo
+    for size in (500, 5000):
+        response = client.get(f"/text?size={size}", headers=headers)
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["etag"] == 'W/"abc"'
+        assert "accept-encoding" in response.headers["vary"].lower()
+        assert response.text == "x" * size
+
+    streamed = client.get("/stream", headers=headers)
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.content == b"line\n" * 1500
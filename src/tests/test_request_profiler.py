@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import httpx
+from fastapi.testclient import TestClient
+
+from main import app
+from app.config.config import settings
+from app.services.auth_service import token_verifier
+from app.utils.request_profiler import AWAITING_FRAME, RequestProfiler, profile_attributes
+
+AUTH_HEADERS = {"X-Token": token_verifier.issue("tests")}
+
+
+def _spin(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_samples_running_and_awaiting_frames():
+    profiler = RequestProfiler(hz=500, threshold=0.05)
+
+    async def handler():
+        samples = profiler.begin({"headers": []})
+        _spin(0.1)
+        await asyncio.sleep(0.1)
+        return profiler.finish(samples, "GET /work", 0.2), samples
+
+    async def run():
+        profiler.start()
+        try:
+            return await asyncio.create_task(handler())
+        finally:
+            profiler.stop()
+
+    top_frames, samples = asyncio.run(run())
+    stacks = list(samples.stacks)
+    assert any(stack[-1].endswith("_spin") for stack in stacks)
+    assert any(stack[-1] == AWAITING_FRAME for stack in stacks)
+    assert {label.rsplit(".", 1)[-1] for label, _ in top_frames} >= {"_spin"}
+    assert profiler.collapsed().startswith("GET /work;")
+
+    attributes = profile_attributes(top_frames, forced=False)
+    assert attributes["profile.reason"] == "threshold"
+    assert "profile.frame.1" in attributes
+
+
+def test_fast_requests_are_discarded():
+    profiler = RequestProfiler(hz=500, threshold=10)
+
+    async def run():
+        profiler.start()
+        try:
+            samples = profiler.begin({"headers": []})
+            await asyncio.sleep(0.05)
+            return profiler.finish(samples, "GET /fast", 0.05)
+        finally:
+            profiler.stop()
+
+    assert asyncio.run(run()) == []
+    assert profiler.collapsed() == ""
+
+
+def test_debug_header_profiles_request(monkeypatch, external_api):
+    async def slow_upstream(request):
+        await asyncio.sleep(0.1)
+        return httpx.Response(200, json={"id": 1, "title": "slow"})
+
+    external_api["handler"] = slow_upstream
+    monkeypatch.setattr(settings, "profiler_enabled", True)
+    with TestClient(app) as client:
+        headers = {**AUTH_HEADERS, settings.profiler_debug_header: "1"}
+        assert client.get("/api/v1/data", headers=headers).status_code == 200
+        response = client.get("/debug/profile", params={"route": "GET /api/v1/data"}, headers=AUTH_HEADERS)
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines and all(line.startswith("GET /api/v1/data;") for line in lines)
+    assert any("get_data" in line and AWAITING_FRAME in line for line in lines)
+
+
+def test_profile_endpoint_disabled():
+    with TestClient(app) as client:
+        assert client.get("/debug/profile", headers=AUTH_HEADERS).status_code == 404
@@ -0,0 +1,179 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.http_client import ExternalServiceError, HttpClient
+from app.utils.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, hedged
+
+
+def _client(handler, **kwargs) -> HttpClient:
+    options = {"retry_base_delay": 0.001, "breaker_failure_threshold": 2, **kwargs}
+    return HttpClient(base_url="http://upstream.test", transport=httpx.MockTransport(handler), **options)
+
+
+def test_circuit_breaker_opens_and_probes():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_time=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    asyncio.run(asyncio.sleep(0.06))
+    # Una sola sonda en half-open
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_hedged_returns_fastest_attempt():
+    delays = iter([0.5, 0.01])
+    started = []
+
+    async def call():
+        delay = next(delays)
+        started.append(delay)
+        await asyncio.sleep(delay)
+        return delay
+
+    async def run():
+        return await asyncio.wait_for(hedged(call, delay=0.02), timeout=0.3)
+
+    assert asyncio.run(run()) == 0.01
+    assert started == [0.5, 0.01]
+
+
+def test_retries_transient_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    client = _client(handler, retry_attempts=3, breaker_failure_threshold=5)
+    assert asyncio.run(client.fetch_json("/posts/1")) == ({"ok": True}, False)
+    assert len(calls) == 3
+
+
+def test_client_errors_are_not_retried():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404)
+
+    client = _client(handler)
+    with pytest.raises(ExternalServiceError):
+        asyncio.run(client.fetch_json("/posts/1"))
+    assert len(calls) == 1
+    assert client.breaker.state == CLOSED
+
+
+def test_open_circuit_serves_stale_copy_without_calling_upstream():
+    state = {"up": True, "calls": 0}
+
+    def handler(request):
+        state["calls"] += 1
+        if state["up"]:
+            return httpx.Response(200, json={"id": 1})
+        raise httpx.ConnectError("down", request=request)
+
+    client = _client(handler, cache_ttl=0, retry_attempts=1)
+
+    async def run():
+        assert await client.fetch_json("/posts/1") == ({"id": 1}, False)
+        state["up"] = False
+        assert await client.fetch_json("/posts/1") == ({"id": 1}, True)
+        assert await client.fetch_json("/posts/1") == ({"id": 1}, True)
+        assert client.breaker.state == OPEN
+        calls = state["calls"]
+        assert await client.fetch_json("/posts/1") == ({"id": 1}, True)
+        assert state["calls"] == calls
+        with pytest.raises(ExternalServiceError) as error:
+            await client.fetch_json("/posts/2")
+        assert error.value.retry_after > 0
+
+    asyncio.run(run())
+
+
+def test_deadline_bounds_slow_upstream():
+    async def handler(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, json={})
+
+    client = _client(handler, deadline=0.1, attempt_timeout=0.05, retry_attempts=5)
+
+    async def run():
+        start = asyncio.get_running_loop().time()
+        with pytest.raises(ExternalServiceError):
+            await client.fetch_json("/posts/1")
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(run()) < 0.3
+
+
+def test_non_json_body_falls_back_to_stale_copy():
+    """A 200 that is not JSON is an upstream failure, not a 500"""
+    state = {"json": True}
+
+    def handler(request):
+        if state["json"]:
+            return httpx.Response(200, json={"id": 1})
+        return httpx.Response(200, text="<html>proxy error</html>")
+
+    client = _client(handler, cache_ttl=0, retry_attempts=1)
+
+    async def run():
+        assert await client.fetch_json("/posts/1") == ({"id": 1}, False)
+        state["json"] = False
+        assert await client.fetch_json("/posts/1") == ({"id": 1}, True)
+        with pytest.raises(ExternalServiceError):
+            await client.fetch_json("/posts/2")
+
+    asyncio.run(run())
+
+
+def test_half_open_probe_is_released_on_decode_error_and_cancellation():
+    """A probe that ends without a normal outcome re-opens the circuit"""
+    state = {"mode": "down"}
+
+    async def handler(request):
+        if state["mode"] == "hang":
+            await asyncio.sleep(1)
+        if state["mode"] == "html":
+            return httpx.Response(200, text="not json")
+        if state["mode"] == "up":
+            return httpx.Response(200, json={"ok": True})
+        raise httpx.ConnectError("down", request=request)
+
+    client = _client(handler, cache_ttl=0, retry_attempts=1, breaker_recovery_time=0.01)
+
+    async def run():
+        for _ in range(2):
+            with pytest.raises(ExternalServiceError):
+                await client.fetch_json("/posts/1")
+        assert client.breaker.state == OPEN
+
+        state["mode"] = "html"
+        await asyncio.sleep(0.02)
+        with pytest.raises(ExternalServiceError):
+            await client.fetch_json("/posts/1")
+        assert client.breaker.state == OPEN
+
+        state["mode"] = "hang"
+        await asyncio.sleep(0.02)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.fetch_json("/posts/1"), timeout=0.05)
+        assert client.breaker.state == OPEN
+
+        state["mode"] = "up"
+        await asyncio.sleep(0.02)
+        assert await client.fetch_json("/posts/1") == ({"ok": True}, False)
+        assert client.breaker.state == CLOSED
+
+    asyncio.run(run())
@@ -0,0 +1,22 @@
+from app.utils.startup_profiler import StartupProfiler
+
+def test_startup_profiler_phases_and_imports():
+    """Test that phases are timed and imports are grouped per package"""
+    profiler = StartupProfiler()
+    profiler.imports = {"sqlalchemy.orm": 0.2, "sqlalchemy": 0.1, "httpx": 0.05}
+    with profiler.phase("database"):
+        pass
+    profiler.finish()
+
+    report = profiler.report()
+    assert "database" in report["phases"]
+    assert report["imports"] == {"sqlalchemy": 0.3, "httpx": 0.05}
+    assert report["total_seconds"] >= report["phases"]["database"]
+
+def test_importing_main_does_not_leave_the_import_timer_installed():
+    """Test that the import wrapper only lives during module import and the lifespan"""
+    import builtins
+    import main
+
+    assert getattr(builtins.__import__, "__name__", "") != "timed_import"
+    assert main.startup_profiler._original_import is None
@@ -0,0 +1,46 @@
+from app.utils import newrelic_monitor
+from app.utils.newrelic_monitor import NewRelicMonitor
+from app.utils.telemetry import MetricAggregator
+
+def test_metric_aggregator_summaries():
+    """Test that values are summarized and drained per interval"""
+    aggregator = MetricAggregator()
+    for value in (0.5, 0.1, 0.3):
+        aggregator.record("Custom/ResponseTime", value)
+    aggregator.record("Custom/RequestCount", 1)
+
+    metrics = aggregator.drain()
+    response_time = metrics["Custom/ResponseTime"]
+    assert response_time["count"] == 3
+    assert response_time["min"] == 0.1
+    assert response_time["max"] == 0.5
+    assert abs(response_time["total"] - 0.9) < 1e-9
+    assert abs(response_time["sum_of_squares"] - 0.35) < 1e-9
+    assert metrics["Custom/RequestCount"]["count"] == 1
+    assert aggregator.drain() == {}
+
+def test_attributes_are_batched_per_request():
+    """Test that attributes are buffered until the batch is flushed"""
+    newrelic_monitor.set_newrelic_status(True)
+    try:
+        token = NewRelicMonitor.begin_attribute_batch()
+        NewRelicMonitor.add_custom_attribute("endpoint", "get_data")
+        NewRelicMonitor.add_custom_attribute("source", "external_api")
+        assert newrelic_monitor._pending_attributes.get() == {
+            "endpoint": "get_data",
+            "source": "external_api"
+        }
+        NewRelicMonitor.flush_attribute_batch(token)
+        assert newrelic_monitor._pending_attributes.get() is None
+    finally:
+        newrelic_monitor.set_newrelic_status(False)
+
+def test_newrelic_initialization_is_tracked_by_the_app(monkeypatch):
+    """Test that the initialized state comes from our own flag or newrelic-admin"""
+    from app.config.newrelic_config import NewRelicConfig
+
+    monkeypatch.delenv("NEW_RELIC_ADMIN_COMMAND", raising=False)
+    monkeypatch.setattr(NewRelicConfig, "_initialized", False)
+    assert not NewRelicConfig.is_newrelic_already_initialized()
+    monkeypatch.setattr(NewRelicConfig, "_initialized", True)
+    assert NewRelicConfig.is_newrelic_already_initialized()
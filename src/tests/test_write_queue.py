@@ -0,0 +1,88 @@
+import asyncio
+
+import httpx
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from main import app
+from app.models.database import get_engine, get_read_engine
+from app.services.auth_service import token_verifier
+from app.services import write_queue as write_queue_module
+from app.services.write_queue import get_write_queue, run_write, start_write_queue
+
+AUTH_HEADERS = {"X-Token": token_verifier.issue("tests")}
+
+
+async def _with_app(scenario):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await scenario(client)
+
+
+def test_sqlite_profile_pragmas():
+    """Test WAL on the writer and a query-only read pool"""
+    async def scenario(client):
+        async with get_engine().connect() as conn:
+            journal_mode = (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar()
+            synchronous = (await conn.exec_driver_sql("PRAGMA synchronous")).scalar()
+        async with get_read_engine().connect() as conn:
+            query_only = (await conn.exec_driver_sql("PRAGMA query_only")).scalar()
+            try:
+                await conn.execute(text("DELETE FROM users"))
+                read_only = False
+            except OperationalError:
+                read_only = True
+        return journal_mode, synchronous, query_only, read_only
+
+    journal_mode, synchronous, query_only, read_only = asyncio.run(_with_app(scenario))
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert query_only == 1 and read_only
+
+
+def test_concurrent_creates_share_commits():
+    """Test that concurrent creates are grouped into fewer commits"""
+    async def scenario(client):
+        write_queue = get_write_queue()
+        batches_before = write_queue.batches
+        users = [{"username": f"group{n}", "email": f"group{n}@example.com"} for n in range(20)]
+        # El mismo usuario dos veces en el mismo lote: sólo falla su SAVEPOINT
+        users.append({"username": "group0", "email": "group0@example.com"})
+        responses = await asyncio.gather(*(
+            client.post("/api/v1/users", json=user, headers=AUTH_HEADERS) for user in users
+        ))
+        return [response.status_code for response in responses], write_queue.batches - batches_before
+
+    statuses, batches = asyncio.run(_with_app(scenario))
+    assert sorted(statuses) == [201] * 20 + [400]
+    assert batches < 20
+
+
+def test_writes_bypass_the_queue_without_sqlite(monkeypatch):
+    """Test that other databases write through their own sessions, not the queue"""
+    from app.config.config import settings
+
+    sqlite_url = settings.database_url
+    monkeypatch.setattr(settings, "database_url", "postgresql://db.example/app")
+    monkeypatch.setattr(write_queue_module, "_write_queue", None)
+    assert start_write_queue() is None
+    monkeypatch.setattr(settings, "database_url", sqlite_url)
+
+    async def insert(session):
+        await session.execute(text(
+            "INSERT INTO users (username, email) VALUES ('direct', 'direct@example.com')"
+        ))
+        return "done"
+
+    async def scenario(client):
+        # El lifespan ya arrancó la cola: se aparta para usar la ruta directa
+        queue, write_queue_module._write_queue = write_queue_module._write_queue, None
+        try:
+            assert await run_write(insert) == "done"
+        finally:
+            write_queue_module._write_queue = queue
+        async with get_read_engine().connect() as conn:
+            return (await conn.execute(text("SELECT count(*) FROM users WHERE username = 'direct'"))).scalar()
+
+    assert asyncio.run(_with_app(scenario)) == 1